@@ -8,6 +8,9 @@ let currentYear = 'all';
 async function loadBestOf() {
     const list = document.getElementById('best-of-list');
 
+    // best-of.json e file degli anni in una richiesta, se pubblicati in bundle
+    await loadBundle('best-of');
+
     // Carica best-of.json principale (2026)
     const data = await loadData('best-of.json');
 
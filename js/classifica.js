@@ -22,6 +22,9 @@ async function loadYearData(year) {
     const leaderboard = document.getElementById('leaderboard');
     currentYear = year;
 
+    // Tutti i file dell'anno in una richiesta, se pubblicati in bundle
+    await loadBundle(`classifica-${year}`);
+
     if (year === 'all') {
         // Carica classifica generale
         classificaData = await loadData('classifica.json');
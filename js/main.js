@@ -1,16 +1,58 @@
 // AperiPoker - Main JS
 
+// Fetch di un file in data/ (dalle pagine o dalla homepage)
+async function fetchData(path, options) {
+    const response = await fetch(`../data/${path}`, options);
+    if (!response.ok) {
+        // Prova senza ../ per la homepage
+        const response2 = await fetch(`data/${path}`, options);
+        if (!response2.ok) throw new Error('File non trovato');
+        return await response2.json();
+    }
+    return await response.json();
+}
+
+// Versione (hash) dei file scaricati dalle pagine: nel sito pubblicato è
+// scritta nella pagina, altrimenti arriva da versions.json (pochi KB, sempre
+// rivalidato), la cui richiesta parte subito insieme al resto della pagina
+let dataVersions = null;
+function loadDataVersions() {
+    if (!dataVersions) {
+        dataVersions = window.DATA_VERSIONS
+            ? Promise.resolve(window.DATA_VERSIONS)
+            : fetchData('versions.json', { cache: 'no-cache' }).then(v => v.files).catch(() => null);
+    }
+    return dataVersions;
+}
+loadDataVersions();
+
+// File già arrivati con un bundle, per nome
+const bundledData = new Map();
+
+// Bundle per pagina (dist/, generati da publish_data.py): più file di dati
+// in una richiesta. Senza bundle tra le versioni non fa niente e le pagine
+// caricano i file uno per uno.
+async function loadBundle(name) {
+    try {
+        const filename = `bundles/${name}.json`;
+        const version = (await loadDataVersions())?.[filename];
+        if (!version) return;
+        const bundle = await fetchData(`${filename}?v=${version}`);
+        for (const [file, data] of Object.entries(bundle.files)) {
+            bundledData.set(file, data);
+        }
+    } catch (error) {
+        console.log(`Bundle non disponibile: ${name}`);
+    }
+}
+
 // Utility per caricare dati JSON
 async function loadData(filename) {
+    if (bundledData.has(filename)) return bundledData.get(filename);
     try {
-        const response = await fetch(`../data/${filename}`);
-        if (!response.ok) {
-            // Prova senza ../ per la homepage
-            const response2 = await fetch(`data/${filename}`);
-            if (!response2.ok) throw new Error('File non trovato');
-            return await response2.json();
-        }
-        return await response.json();
+        // Con l'hash nell'URL un file invariato resta in cache tra un build e l'altro
+        const version = (await loadDataVersions())?.[filename];
+        return await fetchData(version ? `${filename}?v=${version}` : filename);
     } catch (error) {
         console.log(`Dati non ancora disponibili: ${filename}`);
         return null;
@@ -3,6 +3,8 @@
 let currentYear = '2026';
 let currentWeekIndex = 0;
 let pagelleData = null;
+// Settimane già scaricate dagli shard, per file
+const weekCache = new Map();
 
 async function loadPagelle() {
     // Controlla se c'è un anno nell'URL
@@ -25,22 +27,34 @@ async function loadYearPagelle(year) {
     document.getElementById('cumulative-year-label').textContent = year;
     document.getElementById('year-summary-label').textContent = year;
 
-    // Carica dati pagelle per l'anno
-    pagelleData = await loadData(`pagelle/${year}.json`);
+    // Indice e ultima settimana in una richiesta, se pubblicati in bundle
+    await loadBundle(`pagelle-${year}`);
+
+    // Carica l'indice dell'anno (settimane senza pagelle, caricate all'apertura);
+    // senza shard ripiega sul file completo
+    // In una variabile locale: una risposta arrivata dopo il cambio d'anno
+    // non deve sovrascrivere i dati dell'anno selezionato
+    let data = await loadData(`pagelle/shards/${year}/index.json`);
+    if (!data) {
+        data = await loadData(`pagelle/${year}.json`);
+    }
+    if (year !== currentYear) return;
 
     // Fallback a pagelle.json per 2026 se il file per anno non esiste
-    if (!pagelleData && year === '2026') {
-        pagelleData = await loadData('pagelle.json');
-        if (pagelleData) {
+    if (!data && year === '2026') {
+        const legacy = await loadData('pagelle.json');
+        if (year !== currentYear) return;
+        if (legacy) {
             // Converti vecchio formato
-            pagelleData = {
+            data = {
                 year: 2026,
-                weeks: pagelleData.weeks || [],
+                weeks: legacy.weeks || [],
                 cumulative: [],
-                totalWeeks: pagelleData.weeks?.length || 0,
+                totalWeeks: legacy.weeks?.length || 0,
             };
         }
     }
+    pagelleData = data;
 
     if (!pagelleData || !pagelleData.weeks || pagelleData.weeks.length === 0) {
         grid.innerHTML = `
@@ -126,11 +140,12 @@ function updateYearSummary(data) {
         document.getElementById('year-best-performer').textContent = '-';
     }
 
-    // Highest single voto
+    // Highest single voto (dall'indice se c'è, altrimenti dalle pagelle)
     let highestVoto = 0;
     let highestName = '';
     for (const week of data.weeks) {
-        for (const p of week.pagelle) {
+        const candidates = week.pagelle || (week.topVoto ? [week.topVoto] : []);
+        for (const p of candidates) {
             if (p.voto > highestVoto) {
                 highestVoto = p.voto;
                 highestName = p.name;
@@ -141,7 +156,18 @@ function updateYearSummary(data) {
         highestVoto > 0 ? `${highestVoto} (${highestName})` : '-';
 }
 
-function renderCurrentWeek() {
+// Settimana completa: già nel file dell'anno oppure dal suo shard
+async function loadWeek(entry) {
+    if (entry.pagelle) return entry;
+    if (!weekCache.has(entry.file)) {
+        weekCache.set(entry.file, loadData(`pagelle/${entry.file}`));
+    }
+    const week = await weekCache.get(entry.file);
+    if (!week) weekCache.delete(entry.file);
+    return week;
+}
+
+async function renderCurrentWeek() {
     const grid = document.getElementById('pagelle-grid');
     const weekLabel = document.getElementById('current-week');
     const summary = document.getElementById('week-summary');
@@ -151,14 +177,34 @@ function renderCurrentWeek() {
         return;
     }
 
-    const week = pagelleData.weeks[currentWeekIndex];
-    weekLabel.textContent = `Settimana del ${formatDate(week.startDate)}`;
+    const data = pagelleData;
+    const index = currentWeekIndex;
+    const entry = data.weeks[index];
+    weekLabel.textContent = `Settimana del ${formatDate(entry.startDate)}`;
 
     // Update mini stats
-    if (week.stats) {
-        document.getElementById('week-total-msgs').textContent = formatNumber(week.stats.totalMessages);
-        document.getElementById('week-active-members').textContent = week.stats.activeMembers;
-        document.getElementById('week-avg-per-member').textContent = week.stats.avgPerMember?.toFixed(1) || '-';
+    if (entry.stats) {
+        document.getElementById('week-total-msgs').textContent = formatNumber(entry.stats.totalMessages);
+        document.getElementById('week-active-members').textContent = entry.stats.activeMembers;
+        document.getElementById('week-avg-per-member').textContent = entry.stats.avgPerMember?.toFixed(1) || '-';
+    }
+
+    // Aggiorna bottoni
+    document.getElementById('prev-week').disabled = index === 0;
+    document.getElementById('next-week').disabled = index === data.weeks.length - 1;
+
+    if (!entry.pagelle) {
+        grid.innerHTML = '<div class="loading">Caricamento pagelle...</div>';
+    }
+    const week = await loadWeek(entry);
+
+    // Nel frattempo l'utente ha cambiato settimana o anno
+    if (data !== pagelleData || index !== currentWeekIndex) return;
+
+    if (!week) {
+        grid.innerHTML = '<div class="loading">Pagelle della settimana non disponibili.</div>';
+        summary.querySelector('.summary-content').innerHTML = '';
+        return;
     }
 
     // Render pagelle
@@ -201,10 +247,6 @@ function renderCurrentWeek() {
         `;
     }
     summary.querySelector('.summary-content').innerHTML = summaryHtml;
-
-    // Aggiorna bottoni
-    document.getElementById('prev-week').disabled = currentWeekIndex === 0;
-    document.getElementById('next-week').disabled = currentWeekIndex === pagelleData.weeks.length - 1;
 }
 
 // Gestione selezione anno
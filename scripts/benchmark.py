@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Benchmark della pipeline su export sintetici (vedi synth_export.py).
+
+Per ogni dimensione misura tempo (migliore di --repeat esecuzioni) e picco
+di memoria Python (tracemalloc, in un'esecuzione a parte) di:
+    - parse_chat_file: parsing dell'export
+    - analyze_messages: cubo di attività e statistiche di tutta la chat
+    - message_index: partizione per anno e settimana (con il cubo)
+    - generate_year_data: dati di tutti gli anni
+    - generate_pagelle_for_year: pagelle di tutti gli anni
+    - main: parse_whatsapp.py da riga di comando, in una cartella temporanea
+
+I risultati vanno in un file JSON; con --compare si confrontano con un run
+precedente e il comando esce con errore se uno stadio è più lento della
+soglia.
+
+Uso:
+    python benchmark.py [--sizes 10k,100k,1M,10M] [--format us|it|ios] [--repeat N]
+                        [--output FILE] [--compare FILE] [--threshold PCT] [--no-memory] [--clean]
+
+Gli export generati restano in .cache/benchmark/ per i run successivi.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import parse_whatsapp
+from parse_whatsapp import (MessageIndex, analyze_messages, generate_pagelle_for_year, generate_year_data,
+                            parse_chat_file)
+from synth_export import FORMATS, parse_count, write_export
+
+ROOT_DIR = Path(__file__).parent.parent
+CACHE_DIR = ROOT_DIR / '.cache' / 'benchmark'
+RESULTS_FILE = CACHE_DIR / 'results.json'
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = '10k,100k'
+
+
+def export_for(size, fmt, seed=1):
+    """Export sintetico di `size` messaggi, generato solo la prima volta."""
+    path = CACHE_DIR / 'exports' / f'{fmt}-{size}-{seed}.txt'
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        start = time.perf_counter()
+        write_export(tmp, size, fmt, seed)
+        tmp.replace(path)
+        print(f"  generato {path.name} ({path.stat().st_size // 1024} KB, {time.perf_counter() - start:.1f} s)")
+    return path
+
+
+def stages(path):
+    """Stadi da misurare: [(nome, funzione senza argomenti)].
+
+    Gli stadi dopo il parsing lavorano sugli stessi messaggi, parsati qui
+    una volta sola.
+    """
+    messages = parse_chat_file(path)
+    index = MessageIndex(messages)
+    years = index.years
+    all_years_stats = {year: {'totalMessages': index.count(year)} for year in years}
+
+    def year_data():
+        for year in years:
+            generate_year_data(index, year, all_years_stats)
+
+    def pagelle():
+        for year in years:
+            generate_pagelle_for_year(index, year)
+
+    def end_to_end():
+        with tempfile.TemporaryDirectory(prefix='benchmark-') as tmp:
+            data_dir = Path(tmp) / 'data'
+            data_dir.mkdir()
+            argv, data = sys.argv, parse_whatsapp.DATA_DIR
+            sys.argv, parse_whatsapp.DATA_DIR = ['parse_whatsapp.py', str(path)], data_dir
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    parse_whatsapp.main()
+            finally:
+                sys.argv, parse_whatsapp.DATA_DIR = argv, data
+
+    return len(messages), [
+        ('parse_chat_file', lambda: parse_chat_file(path)),
+        ('analyze_messages', lambda: analyze_messages(messages)),
+        ('message_index', lambda: MessageIndex(messages)),
+        ('generate_year_data', year_data),
+        ('generate_pagelle_for_year', pagelle),
+        ('main', end_to_end),
+    ]
+
+
+def measure(func, repeat, memory):
+    """{'seconds': migliore di `repeat`, 'peakMiB': picco tracemalloc (se richiesto)}."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    result = {'seconds': round(best, 4)}
+
+    if memory:
+        # Esecuzione separata: tracemalloc rallenta e falserebbe i tempi
+        tracemalloc.start()
+        try:
+            func()
+            result['peakMiB'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, fmt, repeat, memory):
+    results = []
+    for size in sizes:
+        print(f"\n--- {size} messaggi ({fmt}) ---")
+        path = export_for(size, fmt)
+        parsed, todo = stages(path)
+        timings = {}
+        for name, func in todo:
+            timings[name] = measure(func, repeat, memory)
+            peak = f", picco {timings[name]['peakMiB']} MiB" if 'peakMiB' in timings[name] else ''
+            print(f"  {name:<28} {timings[name]['seconds']:>9.3f} s{peak}")
+        results.append({'size': size, 'format': fmt, 'messages': parsed, 'stages': timings})
+
+    return {
+        'version': RESULTS_VERSION,
+        'createdAt': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': parse_whatsapp.np.__version__ if parse_whatsapp.np is not None else None,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Stampa il confronto con un run precedente; restituisce gli stadi più lenti della soglia."""
+    old = {(r['size'], r['format']): r['stages'] for r in baseline.get('results', [])}
+    regressions = []
+    print(f"\nConfronto con {baseline.get('commit') or '?'} del {baseline.get('createdAt', '?')}:")
+    for result in report['results']:
+        previous = old.get((result['size'], result['format']))
+        if previous is None:
+            continue
+        for name, timing in result['stages'].items():
+            if name not in previous:
+                continue
+            before, after = previous[name]['seconds'], timing['seconds']
+            change = (after - before) * 100 / before if before else 0
+            flag = ''
+            if change > threshold:
+                flag = '  <-- più lento'
+                regressions.append((result['size'], name, change))
+            print(f"  {result['size']:>9} {name:<28} {before:>9.3f} s -> {after:>9.3f} s ({change:+.1f}%){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Misura tempi e memoria della pipeline su export sintetici.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'numero di messaggi separati da virgola, con k/M (default: {DEFAULT_SIZES})')
+    parser.add_argument('--format', choices=FORMATS, default='us', help='dialetto degli export (default: us)')
+    parser.add_argument('--repeat', type=int, default=3, metavar='N', help='esecuzioni per stadio (default: 3)')
+    parser.add_argument('--output', type=Path, default=RESULTS_FILE,
+                        help=f'file JSON dei risultati (default: {RESULTS_FILE.relative_to(ROOT_DIR)})')
+    parser.add_argument('--compare', type=Path, metavar='FILE', help='risultati di un run precedente')
+    parser.add_argument('--threshold', type=float, default=15, metavar='PCT',
+                        help='rallentamento oltre cui uno stadio è una regressione (default: 15%%)')
+    parser.add_argument('--no-memory', action='store_true', help='salta la misura del picco di memoria')
+    parser.add_argument('--clean', action='store_true', help='cancella gli export generati in cache')
+    args = parser.parse_args()
+
+    if args.clean and (CACHE_DIR / 'exports').exists():
+        shutil.rmtree(CACHE_DIR / 'exports')
+    try:
+        sizes = [parse_count(size) for size in args.sizes.split(',') if size.strip()]
+    except ValueError:
+        parser.error(f"--sizes non valido: {args.sizes}")
+    baseline = None
+    if args.compare:
+        # Letto prima di scrivere: --compare può essere lo stesso file di --output
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    report = run(sizes, args.format, max(1, args.repeat), not args.no_memory)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nRisultati salvati in {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} stadi più lenti di oltre il {args.threshold:g}%")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Scrittura degli output del sito solo quando il contenuto cambia.
+
+Ogni file passa da un file temporaneo (o da un buffer) e sostituisce quello
+esistente solo se i byte sono diversi: un file invariato mantiene data di
+modifica, ETag e cache del browser.
+
+Alla fine della build data/build-manifest.json elenca per ogni file di data/
+hash SHA-256 e dimensione (per la build). Il sito legge solo
+data/versions.json, con l'hash abbreviato dei file che le pagine scaricano,
+e lo usa come versione negli URL (es. stats.json?v=...) per poter mettere in
+cache i dati a lungo.
+"""
+
+import hashlib
+import json
+import os
+import re
+from contextlib import contextmanager
+from pathlib import Path
+
+MANIFEST_FILE = 'build-manifest.json'
+MANIFEST_VERSION = 1
+VERSIONS_FILE = 'versions.json'
+
+# File di data/ scaricati dalle pagine (loadData/loadBundle in js/): solo
+# questi finiscono in versions.json, non gli shard di archivio e settimane
+PAGE_FILES = re.compile(
+    r'(stats|classifica|anni-overview|best-of|history|lider|membri|pagelle)\.json'
+    r'|anni/\d{4}\.json|pagelle/\d{4}\.json|pagelle/shards/\d{4}/index\.json|bundles/[^/]+\.json'
+)
+
+# File di lavoro e database, non serviti dal sito
+SKIPPED_SUFFIXES = ('.tmp', '.db', '.db-journal')
+
+# Registro delle scritture per il profilo della build: (percorso, byte,
+# cambiato); None finché track_writes() non lo attiva
+write_log = None
+
+
+def track_writes():
+    """Attiva il registro delle scritture (se non è già attivo) e lo restituisce."""
+    global write_log
+    if write_log is None:
+        write_log = []
+    return write_log
+
+
+def log_write(path, size, changed):
+    if write_log is not None:
+        write_log.append((str(path), size, changed))
+
+
+def write_bytes_if_changed(path, payload):
+    """Scrive `payload` in `path` se diverso dal contenuto attuale; True se scritto."""
+    path = Path(path)
+    try:
+        if path.stat().st_size == len(payload) and path.read_bytes() == payload:
+            log_write(path, len(payload), False)
+            return False
+    except FileNotFoundError:
+        pass
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_bytes(payload)
+    os.replace(tmp, path)
+    log_write(path, len(payload), True)
+    return True
+
+
+def dump_json(path, data, compact=False):
+    """json.dump (indent=2, o compatto) con write_bytes_if_changed."""
+    if compact:
+        text = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    else:
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+    return write_bytes_if_changed(path, text.encode('utf-8'))
+
+
+def same_content(a, b, chunk_size=1 << 20):
+    """True se i due file hanno gli stessi byte."""
+    a, b = Path(a), Path(b)
+    if not b.exists() or a.stat().st_size != b.stat().st_size:
+        return False
+    with open(a, 'rb') as fa, open(b, 'rb') as fb:
+        while True:
+            chunk = fa.read(chunk_size)
+            if chunk != fb.read(chunk_size):
+                return False
+            if not chunk:
+                return True
+
+
+@contextmanager
+def open_output(path):
+    """Come open(path, 'w') per file scritti a pezzi: il file finale viene
+    sostituito a fine scrittura e solo se il contenuto è cambiato."""
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            yield f
+        size = tmp.stat().st_size
+        if same_content(tmp, path):
+            tmp.unlink()
+            log_write(path, size, False)
+        else:
+            os.replace(tmp, path)
+            log_write(path, size, True)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def load_build_manifest(data_dir):
+    path = Path(data_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def page_versions(hashes):
+    """{file: hash abbreviato} dei file scaricati dalle pagine, da {file: sha256}."""
+    return {name: digest[:16] for name, digest in sorted(hashes.items()) if PAGE_FILES.fullmatch(name)}
+
+
+def write_build_manifest(data_dir, exclude=(), generated_at=None):
+    """Hash di tutti i file di data/ (tranne `exclude`) in build-manifest.json.
+
+    Scrive anche versions.json per il sito. Restituisce (manifest, file
+    cambiati rispetto al manifest precedente).
+    """
+    data_dir = Path(data_dir)
+    exclude = set(exclude) | {MANIFEST_FILE, VERSIONS_FILE}
+
+    files = {}
+    for path in sorted(data_dir.rglob('*')):
+        name = path.relative_to(data_dir).as_posix()
+        if not path.is_file() or name in exclude or name.endswith(SKIPPED_SUFFIXES):
+            continue
+        files[name] = {'sha256': file_digest(path), 'bytes': path.stat().st_size}
+
+    old = (load_build_manifest(data_dir) or {}).get('files', {})
+    changed = [name for name, entry in files.items() if old.get(name, {}).get('sha256') != entry['sha256']]
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'totalFiles': len(files),
+        'totalBytes': sum(entry['bytes'] for entry in files.values()),
+        'files': files,
+    }
+    if generated_at is not None:
+        manifest['generatedAt'] = generated_at
+    # Se nessun file è cambiato il manifest resta quello di prima
+    if changed or set(old) != set(files):
+        dump_json(data_dir / MANIFEST_FILE, manifest)
+    dump_json(data_dir / VERSIONS_FILE,
+              {'files': page_versions({name: entry['sha256'] for name, entry in files.items()})}, compact=True)
+    return manifest, changed
@@ -0,0 +1,214 @@
+"""
+Profilo della build di parse_whatsapp.py (--profile).
+
+Per ogni stadio registra tempo reale, tempo CPU del processo, messaggi e
+righe al secondo quando ha senso, byte scritti per ogni file di output (dal
+registro di build_outputs) e, solo se richiesto (--profile-memory), il picco
+di memoria Python (tracemalloc). Gli stadi per anno (anni, pagelle, raw)
+girano anche nei processi del pool e tornano come record da unire al profilo
+principale.
+
+Il report JSON ha i totali per stadio, il dettaglio per anno e, con
+--cprofile, le funzioni più costose; ogni run aggiunge una riga di sintesi a
+history.ndjson accanto al report, per seguire come cresce la build negli
+anni.
+
+tracemalloc e cProfile rallentano la build: con --profile-memory o
+--cprofile i tempi sono gonfiati e il report lo dice (campo 'overhead').
+"""
+
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import build_outputs
+
+PROFILE_FILE = Path(__file__).parent.parent / '.cache' / 'profile' / 'parse_whatsapp.json'
+HISTORY_FILE = 'history.ndjson'
+PROFILE_VERSION = 1
+
+# Campi sommati quando uno stadio compare più volte (una per anno)
+SUMMED_FIELDS = ['wallSeconds', 'cpuSeconds', 'items', 'lines', 'inputBytes',
+                 'filesWritten', 'filesChanged', 'bytesWritten']
+
+
+def count_lines(path, offset=0, chunk_size=1 << 20):
+    """(righe, byte) di un file a partire da `offset`."""
+    lines = size = 0
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            lines += chunk.count(b'\n')
+            size += len(chunk)
+    return lines, size
+
+
+class BuildProfile:
+    """Record per stadio della build; disattivato non misura niente.
+
+    Con `memory` misura anche il picco di memoria per stadio (tracemalloc).
+    """
+
+    def __init__(self, enabled=False, data_dir=None, memory=False):
+        self.enabled = enabled
+        self.memory = enabled and memory
+        self.data_dir = Path(data_dir) if data_dir else None
+        self.stages = []
+        self._open = []
+        if enabled:
+            if self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._writes = build_outputs.track_writes()
+
+    def _fold_peak(self):
+        """Riporta il picco corrente negli stadi aperti (prima di azzerarlo)."""
+        if not self.memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for record in self._open:
+            record['_peak'] = max(record['_peak'], peak)
+
+    def _relative(self, path):
+        path = Path(path)
+        if self.data_dir and path.is_relative_to(self.data_dir):
+            return path.relative_to(self.data_dir).as_posix()
+        return str(path)
+
+    @contextmanager
+    def stage(self, name, year=None):
+        """Misura il blocco come stadio `name`.
+
+        Il record restituito accetta 'items' (messaggi), 'lines' e
+        'inputBytes' per le velocità.
+        """
+        if not self.enabled:
+            yield {}
+            return
+
+        record = {'stage': name}
+        if year is not None:
+            record['year'] = year
+        self._fold_peak()
+        if self.memory:
+            tracemalloc.reset_peak()
+        record['_peak'] = 0
+        first_write = len(self._writes)
+        self._open.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wallSeconds'] = round(time.perf_counter() - wall, 4)
+            record['cpuSeconds'] = round(time.process_time() - cpu, 4)
+            self._fold_peak()
+            self._open.remove(record)
+            peak = record.pop('_peak')
+            if self.memory:
+                record['peakMiB'] = round(peak / 2 ** 20, 1)
+
+            files = {}
+            changed = 0
+            for path, size, was_changed in self._writes[first_write:]:
+                files[self._relative(path)] = size
+                changed += was_changed
+            record['filesWritten'] = len(files)
+            record['filesChanged'] = changed
+            record['bytesWritten'] = sum(files.values())
+            record['files'] = files
+            self.stages.append(record)
+
+    def add(self, records):
+        """Aggiunge i record di un altro profilo (es. da un processo del pool)."""
+        if self.enabled:
+            self.stages.extend(records)
+
+    def totals(self):
+        """Stadi nell'ordine in cui compaiono, con i record per anno sommati."""
+        totals = {}
+        for record in self.stages:
+            total = totals.setdefault(record['stage'], {'runs': 0, 'files': {}})
+            total['runs'] += 1
+            if 'peakMiB' in record:
+                total['peakMiB'] = max(total.get('peakMiB', 0), record['peakMiB'])
+            total['files'].update(record['files'])
+            for field in SUMMED_FIELDS:
+                if field in record:
+                    total[field] = round(total.get(field, 0) + record[field], 4)
+
+        for total in totals.values():
+            seconds = total['wallSeconds']
+            for field, rate in (('items', 'messagesPerSecond'), ('lines', 'linesPerSecond'),
+                                ('inputBytes', 'inputMiBPerSecond'), ('bytesWritten', 'outputMiBPerSecond')):
+                if total.get(field) and seconds:
+                    value = total[field] / seconds
+                    total[rate] = round(value / 2 ** 20 if field in ('inputBytes', 'bytesWritten') else value, 1)
+        return totals
+
+    def by_year(self):
+        """{anno: {stadio: {wallSeconds, cpuSeconds, peakMiB, bytesWritten}}}."""
+        years = {}
+        for record in self.stages:
+            if 'year' in record:
+                years.setdefault(str(record['year']), {})[record['stage']] = {
+                    field: record[field] for field in ('wallSeconds', 'cpuSeconds', 'peakMiB', 'bytesWritten')
+                    if field in record
+                }
+        return dict(sorted(years.items()))
+
+    def report(self, wall_seconds, cprofile=None, top=30, **fields):
+        # Strumenti attivi che rallentano la build, e quindi gonfiano i tempi
+        overhead = [name for name, active in (('tracemalloc', self.memory), ('cProfile', cprofile is not None))
+                    if active]
+        report = {
+            'version': PROFILE_VERSION,
+            'createdAt': datetime.now().isoformat(timespec='seconds'),
+            **fields,
+            'wallSeconds': round(wall_seconds, 3),
+            'overhead': overhead,
+            'stages': self.totals(),
+            'byYear': self.by_year(),
+        }
+        if cprofile is not None:
+            report['hotspots'] = hotspots(cprofile, top)
+        return report
+
+
+def hotspots(cprofile, top=30):
+    """Funzioni con più tempo proprio, dal profilo cProfile."""
+    stats = pstats.Stats(cprofile).stats
+    rows = sorted(stats.items(), key=lambda item: -item[1][2])[:top]
+    return [{
+        'function': f'{Path(filename).name}:{line}({name})',
+        'calls': calls,
+        'ownSeconds': round(own, 4),
+        'cumulativeSeconds': round(cumulative, 4),
+    } for (filename, line, name), (_, calls, own, cumulative, _) in rows]
+
+
+def write_report(path, report):
+    """Scrive il report e ne aggiunge la sintesi a history.ndjson nella stessa cartella."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    summary = {field: report[field] for field in ('createdAt', 'messages', 'lastMessage', 'years', 'jobs',
+                                                  'incremental', 'wallSeconds') if field in report}
+    summary['stages'] = {name: total['wallSeconds'] for name, total in report['stages'].items()}
+    with open(path.parent / HISTORY_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + '\n')
+
+
+def print_summary(report):
+    print(f"{'stadio':<12} {'tempo':>9} {'CPU':>9} {'picco':>10} {'scritti':>10} {'msg/s':>10}")
+    for name, total in report['stages'].items():
+        rate = f"{total['messagesPerSecond']:.0f}" if 'messagesPerSecond' in total else '-'
+        peak = f"{total['peakMiB']:>7.1f} MiB" if 'peakMiB' in total else f"{'-':>10}"
+        print(f"{name:<12} {total['wallSeconds']:>8.3f}s {total['cpuSeconds']:>8.3f}s "
+              f"{peak} {total['bytesWritten'] / 2 ** 20:>6.1f} MiB {rate:>10}")
+    if report.get('overhead'):
+        print(f"Tempi misurati con {' e '.join(report['overhead'])} attivi: più lenti di una build normale")
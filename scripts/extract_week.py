@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 """
 Estrae i messaggi di una singola settimana per analisi.
-Uso: python extract_week.py <week_start_date>
+Uso: python extract_week.py <week_start_date | settimana ISO>
 Es:  python extract_week.py 2025-01-06
+     python extract_week.py 2025-W02
+
+Con l'archivio data/archive/ legge dall'indice settimanale solo il range di
+byte della settimana; altrimenti carica il file raw_messages dell'anno.
 """
 
 import json
@@ -10,17 +14,21 @@ import sys
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+from message_archive import ARCHIVE_DIR, MANIFEST_FILE, resolve_week, iter_week, week_counts
+
+def format_message(msg, max_chars=300):
+    """Riga compatta per i prompt: [MM-GG HH:MM] Nome: testo (su una riga)."""
+    author = msg['author'].split()[0]
+    text = msg['text'][:max_chars].replace('\n', ' ')
+    ts = msg['timestamp'][5:16].replace('T', ' ')
+    return f"[{ts}] {author}: {text}"
+
 def get_week_start(ts):
     dt = datetime.fromisoformat(ts)
     return (dt - timedelta(days=dt.weekday())).strftime('%Y-%m-%d')
 
-def main():
-    if len(sys.argv) < 2:
-        print("Uso: python extract_week.py <week_start_date>")
-        print("Es:  python extract_week.py 2025-01-06")
-        sys.exit(1)
-
-    week_date = sys.argv[1]
+def load_week_from_raw(week_date):
+    """Fallback senza archivio: carica tutto il file e filtra."""
     year = int(week_date[:4])
 
     # Load messages - try year-specific file first, then all
@@ -40,15 +48,40 @@ def main():
     # Filter for this week
     week_msgs = [m for m in messages if get_week_start(m['timestamp']) == week_date]
 
-    if not week_msgs:
-        print(f"Nessun messaggio per la settimana {week_date}")
-        sys.exit(1)
-
     # Count per member
     member_counts = defaultdict(int)
     for msg in week_msgs:
         member_counts[msg['author']] += 1
 
+    return week_msgs, member_counts
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python extract_week.py <week_start_date | settimana ISO>")
+        print("Es:  python extract_week.py 2025-01-06")
+        sys.exit(1)
+
+    week_date = sys.argv[1]
+
+    if (ARCHIVE_DIR / MANIFEST_FILE).exists():
+        # Indice settimanale dell'anno: conteggi già pronti, messaggi con un seek
+        resolved = resolve_week(ARCHIVE_DIR, week_date)
+        if resolved is None:
+            print(f"Nessun messaggio per la settimana {week_date}")
+            sys.exit(1)
+        week_date, entry = resolved
+        week_msgs = list(iter_week(ARCHIVE_DIR, week_date, entry))
+        _, member_counts = week_counts(entry)
+    elif 'W' in week_date:
+        print("Le settimane ISO richiedono l'archivio: esegui prima parse_whatsapp.py")
+        sys.exit(1)
+    else:
+        week_msgs, member_counts = load_week_from_raw(week_date)
+
+    if not week_msgs:
+        print(f"Nessun messaggio per la settimana {week_date}")
+        sys.exit(1)
+
     print(f"SETTIMANA: {week_date}")
     print(f"Messaggi totali: {len(week_msgs)}")
     print(f"Membri attivi: {len(member_counts)}")
@@ -59,10 +92,7 @@ def main():
 
     # Print messages
     for msg in week_msgs:
-        author = msg['author'].split()[0]
-        text = msg['text'][:300].replace('\n', ' ')
-        ts = msg['timestamp'][5:16]
-        print(f"[{ts}] {author}: {text}")
+        print(format_message(msg))
 
 if __name__ == '__main__':
     main()
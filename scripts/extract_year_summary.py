@@ -2,148 +2,258 @@
 """
 Extract a summary of a year's chat messages for Claude analysis.
 Outputs: stats + sample of interesting messages (small enough for context)
+
+Messages are streamed once: the top-scored candidates are kept in bounded
+per-sender heaps and the random "short" picks in a seeded reservoir, so
+memory does not grow with the year and the same data always gives the same
+summary.
+
+Usage:
+    python extract_year_summary.py <year> [sample_size] [--seed N]
+    python extract_year_summary.py --all-years [sample_size] [--seed N] [--jobs N]
+
+Without --seed each year uses its own number as the seed.
 """
 
+import argparse
+import heapq
 import json
+import os
+import random
 import sys
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def extract_year_summary(year: int, sample_size: int = 150) -> dict:
-    """Extract summary from raw_messages_{year}.json"""
-
-    data_dir = Path(__file__).parent.parent / "data"
-    input_file = data_dir / f"raw_messages_{year}.json"
+from message_archive import ARCHIVE_DIR, load_manifest, iter_messages
 
-    if not input_file.exists():
-        return {"error": f"File not found: {input_file}"}
+DATA_DIR = Path(__file__).parent.parent / "data"
+OUTPUT_DIR = DATA_DIR / "summaries"
 
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+# Random shorter messages added after the top-scored ones, for variety
+SHORT_PICKS = 20
 
-    messages = data.get("messages", [])
 
-    # Stats per member
-    member_stats = defaultdict(lambda: {
-        "count": 0,
-        "words": 0,
-        "longest_msg": "",
-        "sample_messages": []
-    })
+class YearSampler:
+    """Streaming accumulator for one year's stats and message sample."""
 
-    # Monthly activity
-    monthly_counts = defaultdict(int)
+    def __init__(self, year: int, sample_size: int = 150, seed: int = None):
+        self.year = year
+        self.sample_size = sample_size
+        # Default seed: the year, so every year gets its own stable sample
+        self.rng = random.Random(year if seed is None else seed)
+        self.total_messages = 0
+        self.member_stats = defaultdict(lambda: {"count": 0, "words": 0, "longest_msg": ""})
+        self.monthly_counts = defaultdict(int)
+        # Per-sender min-heaps of (score, -seq, msg): the final quota is at
+        # most sample_size + 5, so nothing beyond that can ever be picked
+        self.top = defaultdict(list)
+        self.top_limit = sample_size + 5
+        self.short = []
+        self.short_seen = 0
+        self.seq = 0
 
-    # Collect all messages with metadata
-    all_msgs = []
-
-    for msg in messages:
+    def add(self, msg: dict):
+        self.total_messages += 1
         sender = msg.get("author", msg.get("sender", "Unknown"))
         text = msg.get("text", "")
         date = msg.get("timestamp", msg.get("date", ""))[:10]  # YYYY-MM-DD
 
         # Skip empty or very short
         if not text or len(text) < 3:
-            continue
+            return
 
         word_count = len(text.split())
 
-        member_stats[sender]["count"] += 1
-        member_stats[sender]["words"] += word_count
+        stats = self.member_stats[sender]
+        stats["count"] += 1
+        stats["words"] += word_count
 
         # Track longest message per member
-        if len(text) > len(member_stats[sender]["longest_msg"]):
-            member_stats[sender]["longest_msg"] = text[:500]  # Truncate
+        if len(text) > len(stats["longest_msg"]):
+            stats["longest_msg"] = text[:500]  # Truncate
 
         # Monthly tracking
         if date:
-            month = date[:7]  # YYYY-MM
-            monthly_counts[month] += 1
+            self.monthly_counts[date[:7]] += 1  # YYYY-MM
 
-        # Store for sampling (prefer longer, more interesting messages)
+        # Candidates for sampling (prefer longer, more interesting messages)
         score = min(word_count, 50)  # Cap at 50 words to avoid walls of text
-        if word_count >= 5:  # At least 5 words
-            all_msgs.append({
-                "sender": sender,
-                "text": text[:300],  # Truncate long messages
-                "date": date,
-                "score": score
-            })
-
-    # Sample interesting messages - diverse selection
-    # Sort by score (message length up to 50 words)
-    all_msgs.sort(key=lambda x: x["score"], reverse=True)
-
-    # Take top messages but ensure diversity of senders
-    sampled = []
-    sender_counts = defaultdict(int)
-    max_per_sender = sample_size // max(len(member_stats), 1) + 5
-
-    for msg in all_msgs:
-        if len(sampled) >= sample_size:
-            break
-        if sender_counts[msg["sender"]] < max_per_sender:
-            sampled.append({
-                "sender": msg["sender"],
-                "text": msg["text"],
-                "date": msg["date"]
-            })
+        if word_count < 5:  # At least 5 words
+            return
+
+        self.seq += 1
+        entry = (score, -self.seq, {"sender": sender, "text": text[:300], "date": date})
+        heap = self.top[sender]
+        if len(heap) < self.top_limit:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+        # Reservoir sample of the shorter ones (Algorithm R)
+        if score <= 15:
+            self.short_seen += 1
+            if len(self.short) < SHORT_PICKS:
+                self.short.append(entry)
+            else:
+                j = self.rng.randrange(self.short_seen)
+                if j < SHORT_PICKS:
+                    self.short[j] = entry
+
+    def result(self) -> dict:
+        max_per_sender = self.sample_size // max(len(self.member_stats), 1) + 5
+
+        # Highest score first, earliest message first on ties; at most
+        # max_per_sender per sender
+        candidates = []
+        for heap in self.top.values():
+            candidates.extend(heapq.nlargest(max_per_sender, heap))
+        candidates.sort(reverse=True)
+
+        sampled = []
+        picked = set()
+        sender_counts = defaultdict(int)
+        for score, neg_seq, msg in candidates[:self.sample_size]:
+            sampled.append(dict(msg))
+            picked.add(neg_seq)
             sender_counts[msg["sender"]] += 1
 
-    # Also grab some random shorter messages for variety
-    import random
-    short_msgs = [m for m in all_msgs if 5 <= m["score"] <= 15]
-    if short_msgs and len(sampled) < sample_size:
-        random.shuffle(short_msgs)
-        for msg in short_msgs[:20]:
-            if sender_counts[msg["sender"]] < max_per_sender + 3:
-                sampled.append({
-                    "sender": msg["sender"],
-                    "text": msg["text"],
-                    "date": msg["date"]
-                })
-                sender_counts[msg["sender"]] += 1
-
-    # Sort sampled by date
-    sampled.sort(key=lambda x: x["date"])
-
-    # Build summary
-    summary = {
-        "year": year,
-        "totalMessages": len(messages),
-        "memberStats": {
-            name: {
-                "messageCount": stats["count"],
-                "wordCount": stats["words"],
-                "avgWordsPerMessage": round(stats["words"] / stats["count"], 1) if stats["count"] > 0 else 0,
-                "longestMessage": stats["longest_msg"]
-            }
-            for name, stats in member_stats.items()
-        },
-        "monthlyActivity": dict(sorted(monthly_counts.items())),
-        "sampleMessages": sampled
-    }
-
-    return summary
+        # Also grab some random shorter messages for variety
+        if self.short and len(sampled) < self.sample_size:
+            short = sorted(self.short, key=lambda entry: -entry[1])
+            self.rng.shuffle(short)
+            for _, neg_seq, msg in short:
+                if neg_seq not in picked and sender_counts[msg["sender"]] < max_per_sender + 3:
+                    sampled.append(dict(msg))
+                    picked.add(neg_seq)
+                    sender_counts[msg["sender"]] += 1
+
+        # Sort sampled by date
+        sampled.sort(key=lambda x: x["date"])
+
+        return {
+            "year": self.year,
+            "totalMessages": self.total_messages,
+            "memberStats": {
+                name: {
+                    "messageCount": stats["count"],
+                    "wordCount": stats["words"],
+                    "avgWordsPerMessage": round(stats["words"] / stats["count"], 1) if stats["count"] > 0 else 0,
+                    "longestMessage": stats["longest_msg"]
+                }
+                for name, stats in self.member_stats.items()
+            },
+            "monthlyActivity": dict(sorted(self.monthly_counts.items())),
+            "sampleMessages": sampled
+        }
+
+
+def summarize_messages(year: int, messages, sample_size: int = 150, seed: int = None) -> dict:
+    """Summary of an iterable of message dicts from a single year."""
+    sampler = YearSampler(year, sample_size, seed)
+    for msg in messages:
+        sampler.add(msg)
+    return sampler.result()
+
+
+def load_year_messages(year: int):
+    """The year's message dicts from the monthly archive shards, or
+    raw_messages_{year}.json; None if neither exists."""
+    input_file = DATA_DIR / f"raw_messages_{year}.json"
+
+    if load_manifest(ARCHIVE_DIR) is not None:
+        # Stream only the year's shards, line by line
+        return iter_messages(ARCHIVE_DIR, year=year)
+    if input_file.exists():
+        with open(input_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data.get("messages", [])
+    return None
+
+
+def extract_year_summary(year: int, sample_size: int = 150, seed: int = None) -> dict:
+    """Extract summary from the monthly archive shards, or raw_messages_{year}.json"""
+    messages = load_year_messages(year)
+    if messages is None:
+        return {"error": f"File not found: {DATA_DIR / f'raw_messages_{year}.json'}"}
+
+    return summarize_messages(year, messages, sample_size, seed)
+
+
+def message_year(msg: dict) -> int:
+    if "year" in msg:
+        return msg["year"]
+    return int(msg.get("timestamp", msg.get("date", ""))[:4])
+
+
+def extract_all_years(sample_size: int = 150, seed: int = None, jobs: int = None) -> dict:
+    """Summaries of every year: {year: summary}, built in a process pool.
+
+    With the archive each worker streams its own year's shards; otherwise
+    raw_messages_all.json is read once and split by year.
+    """
+    manifest = load_manifest(ARCHIVE_DIR)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        if manifest is not None:
+            years = sorted({int(shard["month"][:4]) for shard in manifest["shards"]})
+            futures = {year: pool.submit(extract_year_summary, year, sample_size, seed) for year in years}
+        else:
+            input_file = DATA_DIR / "raw_messages_all.json"
+            if not input_file.exists():
+                return {}
+            with open(input_file, 'r', encoding='utf-8') as f:
+                messages = json.load(f).get("messages", [])
+            by_year = defaultdict(list)
+            for msg in messages:
+                by_year[message_year(msg)].append(msg)
+            del messages
+            futures = {year: pool.submit(summarize_messages, year, by_year[year], sample_size, seed)
+                       for year in sorted(by_year)}
+        return {year: future.result() for year, future in futures.items()}
+
+
+def write_summary(summary: dict) -> Path:
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    output_file = OUTPUT_DIR / f"summary_{summary['year']}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return output_file
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python extract_year_summary.py <year> [sample_size]")
+    parser = argparse.ArgumentParser(description="Extract year summaries for the analysis agents.")
+    parser.add_argument("year", type=int, nargs="?", help="year to summarize")
+    parser.add_argument("sample_size", type=int, nargs="?", help="sampled messages (default: 150)")
+    parser.add_argument("--all-years", action="store_true", help="summarize every year in one pass")
+    parser.add_argument("--seed", type=int, help="sampling seed (default: the year)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(), help="worker processes for --all-years")
+    args = parser.parse_args()
+
+    if args.all_years:
+        # "--all-years 200": the only positional is the sample size
+        if args.sample_size is not None:
+            parser.error("--all-years takes no year, only the sample size")
+        sample_size = args.year if args.year is not None else 150
+        summaries = extract_all_years(sample_size, args.seed, args.jobs)
+        if not summaries:
+            print(f"No messages found in {ARCHIVE_DIR} or {DATA_DIR / 'raw_messages_all.json'}")
+            sys.exit(1)
+        for year, summary in summaries.items():
+            output_file = write_summary(summary)
+            print(f"Written: {output_file} ({summary['totalMessages']} messages, "
+                  f"{len(summary['sampleMessages'])} sampled)")
+        return
+
+    if args.year is None:
+        parser.print_usage()
         sys.exit(1)
 
-    year = int(sys.argv[1])
-    sample_size = int(sys.argv[2]) if len(sys.argv) > 2 else 150
-
-    summary = extract_year_summary(year, sample_size)
-
-    # Output to file
-    output_dir = Path(__file__).parent.parent / "data" / "summaries"
-    output_dir.mkdir(exist_ok=True)
-    output_file = output_dir / f"summary_{year}.json"
+    summary = extract_year_summary(args.year, args.sample_size or 150, args.seed)
+    if "error" in summary:
+        print(summary["error"])
+        sys.exit(1)
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
+    output_file = write_summary(summary)
 
     print(f"Written: {output_file}")
     print(f"Total messages: {summary['totalMessages']}")
@@ -1,18 +1,57 @@
 #!/usr/bin/env python3
 """
-Identifica le settimane con messaggi per un dato anno.
-Output: lista di numeri settimana ISO con almeno N messaggi.
+Identifica le settimane con messaggi per un dato anno ISO.
+Output: lista di numeri settimana ISO con almeno N messaggi. Le settimane a
+cavallo di capodanno contano per l'anno ISO (es. 2021-01-01 è nella
+settimana 53 del 2020), sia con l'archivio sia senza.
+
+Con l'archivio data/archive/ usa l'indice settimanale dell'anno senza
+leggere i messaggi; altrimenti carica i file raw_messages dell'anno e dei due
+vicini.
 """
 
 import json
+import os
 import sys
 from datetime import datetime
 from collections import defaultdict
 
-def get_iso_week(date_str):
-    """Converte timestamp in numero settimana ISO."""
-    dt = datetime.fromisoformat(date_str)
-    return dt.isocalendar()[1]
+from message_archive import ARCHIVE_DIR, load_week_index, week_counts
+
+def load_raw_messages(year):
+    """Messaggi dei file raw degli anni `year`-1, `year` e `year`+1 (o di raw_messages_all.json)."""
+    if not os.path.exists(f'data/raw_messages_{year}.json'):
+        with open('data/raw_messages_all.json', 'r') as f:
+            return json.load(f)['messages']
+
+    # Le settimane ISO dell'anno possono iniziare a fine dicembre e finire a inizio gennaio
+    messages = []
+    for y in (year - 1, year, year + 1):
+        try:
+            with open(f'data/raw_messages_{y}.json', 'r') as f:
+                messages.extend(json.load(f)['messages'])
+        except FileNotFoundError:
+            pass
+    return messages
+
+def count_weeks_from_raw(year):
+    """Fallback senza archivio: conta i messaggi per settimana dell'anno ISO `year` dai file raw."""
+    weeks = defaultdict(int)
+    total = 0
+    for msg in load_raw_messages(year):
+        iso_year, week, _ = datetime.fromisoformat(msg['timestamp']).isocalendar()
+        if iso_year == year:
+            weeks[week] += 1
+            total += 1
+
+    return weeks, total
+
+def count_weeks_from_index(index):
+    """Conteggi per settimana ISO dall'indice settimanale di un anno ISO."""
+    weeks = {}
+    for entry in index.values():
+        weeks[int(entry['isoWeek'].split('-W')[1])], _ = week_counts(entry)
+    return weeks, sum(weeks.values())
 
 def main():
     if len(sys.argv) < 2:
@@ -23,27 +62,17 @@ def main():
     year = int(sys.argv[1])
     min_messages = int(sys.argv[2]) if len(sys.argv) > 2 else 10
 
-    # Prova file specifico anno, altrimenti usa all
-    try:
-        with open(f'data/raw_messages_{year}.json', 'r') as f:
-            data = json.load(f)
-            messages = data['messages']
-    except FileNotFoundError:
-        with open('data/raw_messages_all.json', 'r') as f:
-            data = json.load(f)
-            messages = [m for m in data['messages'] if m.get('year') == year]
-
-    # Conta messaggi per settimana
-    weeks = defaultdict(int)
-    for msg in messages:
-        week = get_iso_week(msg['timestamp'])
-        weeks[week] += 1
+    index = load_week_index(ARCHIVE_DIR, year)
+    if index is not None:
+        weeks, total_messages = count_weeks_from_index(index)
+    else:
+        weeks, total_messages = count_weeks_from_raw(year)
 
     # Filtra settimane con minimo messaggi
     valid_weeks = sorted([w for w, count in weeks.items() if count >= min_messages])
 
     print(f"Anno {year}: {len(valid_weeks)} settimane con >= {min_messages} messaggi")
-    print(f"Totale messaggi: {len(messages)}")
+    print(f"Totale messaggi: {total_messages}")
     print(f"Settimane: {valid_weeks}")
 
     # Output dettagliato
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Unisce le pagelle settimanali di un anno in data/pagelle/{anno}.json.
+
+Sorgenti, dalla priorità più bassa alla più alta (a parità di settimana
+vince l'ultima):
+    - data/pagelle/{anno}.json già esistente, solo con --base
+    - file parziali data/pagelle/{anno}_weeks_*.json (lista di settimane o
+      {"weeks": [...]})
+    - file degli agenti data/pagelle/{anno}/week-XX.json (una settimana),
+      tranne quelli che pagelle_cache.py dà da rigenerare (messaggi cambiati
+      dopo la generazione), salvo --include-stale
+
+Tutte le varianti di formato note (pagelle/grades, lista o dict per nome,
+weekStart, theme, grade, bestQuotes per persona, nomi abbreviati) vengono
+normalizzate qui. Scrive anche indice e shard per settimana per pagelle.js.
+
+Ogni file letto resta in cache (.cache/pagelle-merge/{anno}.json) con
+mtime, dimensione e hash: rilanciando il merge dopo che un agente ha
+cambiato una settimana si rilegge solo quel file e la classifica cumulativa
+viene aggiornata togliendo la versione vecchia della settimana e
+aggiungendo quella nuova.
+
+Uso:
+    python merge_pagelle.py ANNO [--base] [--remove-partials] [--jobs N] [--no-cache] [--include-stale]
+
+Es. per il 2025 (file principale + parziali 2025_weeks_*.json):
+    python merge_pagelle.py 2025 --base --remove-partials
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from build_outputs import dump_json
+from pagelle_cache import outdated_week_files
+from pagelle_shards import write_pagelle_shards
+
+PAGELLE_DIR = Path(__file__).parent.parent / 'data' / 'pagelle'
+CACHE_DIR = Path(__file__).parent.parent / '.cache' / 'pagelle-merge'
+
+# Da incrementare quando cambia la normalizzazione o il formato della cache
+CACHE_VERSION = 2
+
+# Varianti dei nomi usate dagli agenti e dai vecchi file -> nome completo
+NAME_MAP = {
+    'Adriano': 'Adriano Sergio Lorenzo Facchini',
+    'Adriano 2': 'Adriano Sergio Lorenzo Facchini',
+    'Adrianoooo': 'Adriano Sergio Lorenzo Facchini',
+    'Cosimo': 'Cosimo Nenciòni',
+    'Cosimo Nencioni': 'Cosimo Nenciòni',
+    'Cocco': 'Cosimo Nenciòni',
+    'Giacomo': 'Giacomo Dolfi',
+    'Giacomo Paoletti': 'Giacomo Dolfi',
+    'Giec': 'Giacomo Dolfi',
+    'Fausto': 'Fausto Petrini',
+    'Fausto Tartuferi': 'Fausto Petrini',
+    'Alessio V.': 'Alessio Valentini',
+    'Alessio Valentini Giusto': 'Alessio Valentini',
+    'Alessio M.': 'Alessio Macalùso',
+    'Alessio Mac': 'Alessio Macalùso',
+    'Alessio Macaluso': 'Alessio Macalùso',
+    'Alecs': 'Alessio Macalùso',
+    'Federico': 'Federico Ceccuzzi',
+    'Federico Tartuferi': 'Federico Ceccuzzi',
+    'Fede': 'Federico Ceccuzzi',
+}
+
+
+def normalize_name(name):
+    return NAME_MAP.get(name, name)
+
+
+def normalize_pagella(p, default_voto=None):
+    """Una pagella nel formato di pagelle.js, o None se non è un dict.
+
+    Senza voto resta senza (e fuori dalla media), salvo `default_voto`.
+    """
+    if not isinstance(p, dict):
+        return None
+    voto = p.get('voto', p.get('grade'))
+    if voto is None:
+        voto = default_voto
+    media = p.get('mediaGiornaliera') or 0
+    pagella = {
+        'name': normalize_name(p.get('name', '')),
+        'voto': round(voto, 1) if voto is not None else None,
+        'giudizio': p.get('giudizio', ''),
+        'messaggi': p.get('messaggi', 0),
+        'mediaGiornaliera': round(media, 1),
+        'highlights': p.get('highlights', []),
+    }
+    if 'citazioneTop' in p:
+        pagella['citazioneTop'] = p['citazioneTop']
+    return pagella
+
+
+def normalize_week(week, year=None, legacy=False):
+    """Una settimana di qualunque variante nel formato di pagelle/{anno}.json.
+
+    Nei vecchi file del 2025 (`legacy`, o con le pagelle in 'grades') una
+    pagella senza voto vale 7 d'ufficio, come faceva merge_2025_pagelle.py.
+    """
+    start = week.get('startDate') or week.get('weekStart')
+    if not start and week.get('settimana'):
+        start = datetime.strptime(f"{week.get('anno', year)}-W{int(week['settimana']):02d}-1",
+                                  '%G-W%V-%u').strftime('%Y-%m-%d')
+    end = week.get('endDate') or week.get('weekEnd')
+    if not end and start:
+        end = (datetime.strptime(start, '%Y-%m-%d') + timedelta(days=6)).strftime('%Y-%m-%d')
+
+    # Pagelle come lista, oppure dict nome -> pagella
+    raw = week.get('pagelle') or week.get('grades') or []
+    if isinstance(raw, dict):
+        raw = [dict(data, name=name) for name, data in raw.items() if isinstance(data, dict)]
+    default_voto = 7 if legacy or 'grades' in week else None
+    pagelle = [p for p in (normalize_pagella(p, default_voto) for p in raw) if p is not None]
+
+    # Citazioni della settimana, o quelle messe dentro le singole pagelle
+    quotes = []
+    for q in week.get('bestQuotes', []):
+        if isinstance(q, dict):
+            quotes.append(dict(q, author=normalize_name(q.get('author', ''))))
+        elif q:
+            quotes.append({'quote': q, 'author': ''})
+    for p in raw:
+        if isinstance(p, dict):
+            for q in p.get('bestQuotes', [])[:2]:
+                if q:
+                    quotes.append({'quote': q, 'author': normalize_name(p.get('name', ''))})
+
+    stats = week.get('stats') or {}
+    if not stats.get('totalMessages'):
+        total = sum(p['messaggi'] for p in pagelle)
+        stats = {
+            'totalMessages': total,
+            'activeMembers': len(pagelle),
+            'avgPerMember': round(total / len(pagelle), 1) if pagelle else 0,
+        }
+
+    normalized = {
+        'startDate': start or '',
+        'endDate': end or '',
+        'stats': stats,
+        'riassunto': week.get('riassunto') or week.get('theme') or '',
+        'bestQuotes': quotes[:3],
+        'pagelle': pagelle,
+    }
+    if week.get('awards'):
+        normalized['awards'] = week['awards']
+    return normalized
+
+
+def week_sources(year, base=False, skip=()):
+    """File sorgente dell'anno, dalla priorità più bassa alla più alta (tranne quelli in `skip`)."""
+    sources = []
+    if base and (PAGELLE_DIR / f'{year}.json').exists():
+        sources.append(PAGELLE_DIR / f'{year}.json')
+    sources.extend(sorted(PAGELLE_DIR.glob(f'{year}_weeks_*.json')))
+    sources.extend(path for path in sorted((PAGELLE_DIR / str(year)).glob('week-*.json')) if path not in skip)
+    return sources
+
+
+def read_source(path, year, cached=None):
+    """Settimane normalizzate di un file sorgente.
+
+    `cached` è la voce di cache del file: se mtime e dimensione (o almeno
+    l'hash) coincidono non rilegge il JSON. Restituisce (voce, letto).
+    """
+    stat = path.stat()
+    if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        return cached, False
+
+    payload = path.read_bytes()
+    digest = hashlib.sha256(payload).hexdigest()
+    if cached and cached['sha256'] == digest:
+        return dict(cached, mtime_ns=stat.st_mtime_ns, size=stat.st_size), False
+
+    data = json.loads(payload)
+    weeks = data if isinstance(data, list) else data.get('weeks', [data] if 'pagelle' in data or 'grades' in data else [])
+    # File dell'anno e parziali (formato del 2025), non le settimane degli agenti
+    legacy = path.parent == PAGELLE_DIR
+    return {
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': digest,
+        'weeks': [normalize_week(week, year, legacy) for week in weeks if isinstance(week, dict)],
+    }, True
+
+
+class CumulativeStats:
+    """Classifica cumulativa aggiornabile settimana per settimana.
+
+    Per ogni membro tiene somma dei voti (in centesimi, per non accumulare
+    errori di arrotondamento), conteggio di ogni voto (per migliore e
+    peggiore anche dopo una rimozione), messaggi e primo highlight per
+    settimana (per la signature).
+    """
+
+    def __init__(self, members=None):
+        self.members = members or {}
+
+    def add(self, week, sign=1):
+        for p in week['pagelle']:
+            if not p['name'] or not p['voto'] or p['voto'] <= 0:
+                continue
+            member = self.members.setdefault(p['name'], {
+                'sumVoti': 0, 'voti': {}, 'messaggi': 0, 'settimane': 0, 'highlights': {},
+            })
+            voto = str(p['voto'])
+            member['sumVoti'] += sign * round(p['voto'] * 100)
+            member['voti'][voto] = member['voti'].get(voto, 0) + sign
+            if not member['voti'][voto]:
+                del member['voti'][voto]
+            member['messaggi'] += sign * p['messaggi']
+            member['settimane'] += sign
+            if p['highlights']:
+                if sign > 0:
+                    member['highlights'][week['startDate']] = p['highlights'][0]
+                else:
+                    member['highlights'].pop(week['startDate'], None)
+            if not member['settimane']:
+                del self.members[p['name']]
+
+    def remove(self, week):
+        self.add(week, -1)
+
+    def ranking(self):
+        """Voci di `cumulative` per media voto decrescente."""
+        cumulative = []
+        for name, member in self.members.items():
+            voti = [json.loads(v) for v in member['voti']]
+            highlights = member['highlights']
+            cumulative.append({
+                'name': name,
+                'mediaVoto': round(member['sumVoti'] / member['settimane'] / 100, 2),
+                'bestVoto': max(voti),
+                'worstVoto': min(voti),
+                'settimaneAttive': member['settimane'],
+                'totalMessaggi': member['messaggi'],
+                'signature': highlights[min(highlights)] if highlights else '',
+            })
+        cumulative.sort(key=lambda x: (-x['mediaVoto'], x['name']))
+        return cumulative
+
+
+def load_cache(year):
+    path = CACHE_DIR / f'{year}.json'
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        cache = json.load(f)
+    return cache if cache.get('version') == CACHE_VERSION else None
+
+
+def merge_year(year, base=False, jobs=4, use_cache=True, skip=()):
+    """Unisce le settimane dell'anno e scrive pagelle/{anno}.json e shard.
+
+    Restituisce (dati scritti, file riletti, settimane cambiate).
+    """
+    sources = week_sources(year, base, skip)
+    cache = (load_cache(year) if use_cache else None) or {'files': {}, 'weeks': {}, 'members': {}}
+    key = {path: path.relative_to(PAGELLE_DIR).as_posix() for path in sources}
+
+    # Lettura in parallelo; i file invariati vengono dalla cache
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(lambda path: read_source(path, year, cache['files'].get(key[path])), sources))
+
+    files = {}
+    reread = 0
+    weeks = {}
+    for path, (entry, was_read) in zip(sources, results):
+        files[key[path]] = entry
+        reread += was_read
+        for week in entry['weeks']:
+            if week['startDate']:
+                weeks[week['startDate']] = week
+
+    # Aggiornamento incrementale: si tolgono le settimane sparite o cambiate
+    # e si aggiungono quelle nuove
+    stats = CumulativeStats(cache['members'])
+    old_weeks = cache['weeks']
+    changed = 0
+    for start in set(old_weeks) | set(weeks):
+        old, new = old_weeks.get(start), weeks.get(start)
+        if old == new:
+            continue
+        changed += 1
+        if old is not None:
+            stats.remove(old)
+        if new is not None:
+            stats.add(new)
+
+    weeks = dict(sorted(weeks.items()))
+    output = {
+        'year': year,
+        'weeks': list(weeks.values()),
+        'cumulative': stats.ranking(),
+        'totalWeeks': len(weeks),
+    }
+    dump_json(PAGELLE_DIR / f'{year}.json', output)
+    write_pagelle_shards(PAGELLE_DIR, output)
+
+    if use_cache:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        dump_json(CACHE_DIR / f'{year}.json', {
+            'version': CACHE_VERSION,
+            'files': files,
+            'weeks': weeks,
+            'members': stats.members,
+        }, compact=True)
+
+    return output, reread, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Unisce le pagelle settimanali di un anno.')
+    parser.add_argument('year', type=int, help='anno')
+    parser.add_argument('--base', action='store_true',
+                        help='parte dalle settimane già presenti in pagelle/ANNO.json')
+    parser.add_argument('--remove-partials', action='store_true',
+                        help='cancella i file ANNO_weeks_*.json dopo il merge')
+    parser.add_argument('--jobs', '-j', type=int, default=min(8, os.cpu_count() or 1), metavar='N',
+                        help='file letti in parallelo')
+    parser.add_argument('--no-cache', action='store_true', help='rilegge tutti i file')
+    parser.add_argument('--include-stale', action='store_true',
+                        help='usa anche le settimane degli agenti da rigenerare (vedi pagelle_cache.py)')
+    args = parser.parse_args()
+
+    if args.remove_partials and not args.base:
+        parser.error('--remove-partials richiede --base (altrimenti le settimane dei parziali andrebbero perse)')
+
+    skip = set() if args.include_stale else outdated_week_files(args.year)
+    if skip:
+        print(f"Escluse {len(skip)} settimane da rigenerare: {', '.join(sorted(path.stem for path in skip))}")
+        print(f"  (rilancia l'agente per queste settimane, o pagelle_cache.py {args.year} per ripristinarle)")
+
+    sources = week_sources(args.year, args.base, skip)
+    if not sources:
+        print(f"Nessun file di pagelle trovato per il {args.year} in {PAGELLE_DIR}")
+        sys.exit(1)
+    print(f"Trovati {len(sources)} file per il {args.year}")
+
+    output, reread, changed = merge_year(args.year, args.base, args.jobs, not args.no_cache, skip)
+    print(f"Salvato {PAGELLE_DIR / f'{args.year}.json'} e shards/{args.year}/")
+    print(f"  - {output['totalWeeks']} settimane ({changed} cambiate, {reread} file riletti)")
+    print(f"  - {len(output['cumulative'])} membri nella classifica cumulativa")
+
+    if args.remove_partials:
+        for path in PAGELLE_DIR.glob(f'{args.year}_weeks_*.json'):
+            path.unlink()
+            print(f"Rimosso {path}")
+
+    # Mostra top 3
+    print("\nTop 3 dell'anno:")
+    for i, m in enumerate(output['cumulative'][:3], 1):
+        print(f"  {i}. {m['name']}: {m['mediaVoto']} (best: {m['bestVoto']}, worst: {m['worstVoto']})")
+
+
+if __name__ == '__main__':
+    main()
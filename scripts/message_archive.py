@@ -0,0 +1,260 @@
+"""
+Archivio dei messaggi in shard NDJSON mensili.
+
+Struttura di data/archive/:
+    - messages-YYYY-MM.ndjson: un messaggio per riga (stesso formato dei
+      raw_messages_*.json), in ordine cronologico
+    - messages-YYYY-MM.ndjson.gz: copia compressa dello shard
+    - manifest.json (compatto): per ogni shard conteggi e dimensioni, e gli
+      anni ISO che hanno un indice settimanale
+    - weeks-YYYY.json (compatto): indice delle settimane dell'anno ISO: per
+      ogni lunedì settimana ISO e range di byte negli shard (offset,
+      lunghezza, messaggi e conteggi per membro del range)
+
+Chi legge apre solo gli shard che servono e li scorre riga per riga, oppure
+salta direttamente al range di una settimana leggendo solo l'indice del suo
+anno.
+"""
+
+import gzip
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from build_outputs import dump_json, write_bytes_if_changed
+
+ARCHIVE_DIR = Path(__file__).parent.parent / 'data' / 'archive'
+MANIFEST_FILE = 'manifest.json'
+WEEK_INDEX_FILE = 'weeks-{}.json'
+
+# Da incrementare quando cambia il formato delle voci del manifest
+ARCHIVE_VERSION = 4
+
+
+def shard_name(month):
+    return f'messages-{month}.ndjson'
+
+
+def week_start_key(timestamp):
+    """Lunedì della settimana ('YYYY-MM-DD') per un timestamp ISO."""
+    day = datetime.strptime(timestamp[:10], '%Y-%m-%d')
+    return (day - timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+
+
+def iso_week_key(week_key):
+    """Settimana ISO ('YYYY-Www') del lunedì `week_key`."""
+    iso_year, iso_week, _ = datetime.strptime(week_key, '%Y-%m-%d').isocalendar()
+    return f'{iso_year}-W{iso_week:02d}'
+
+
+def write_shard(archive_dir, month, messages):
+    """Scrive uno shard mensile e il suo .gz; restituisce (voce del manifest, range per settimana)."""
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+    lines = []
+    weeks = []
+    offset = 0
+    week_of_day = {}
+    for msg in messages:
+        data = msg.to_dict()
+        line = (encode(data) + '\n').encode('utf-8')
+        lines.append(line)
+
+        day = data['timestamp'][:10]
+        week = week_of_day.get(day)
+        if week is None:
+            week = week_of_day[day] = week_start_key(day)
+
+        # Range contigui per settimana (di norma uno per settimana nello shard)
+        if not weeks or weeks[-1][0] != week:
+            weeks.append((week, {'month': month, 'offset': offset, 'length': 0, 'messages': 0, 'members': {}}))
+        current = weeks[-1][1]
+        current['length'] += len(line)
+        current['messages'] += 1
+        current['members'][data['author']] = current['members'].get(data['author'], 0) + 1
+        offset += len(line)
+
+    payload = b''.join(lines)
+    name = shard_name(month)
+    write_bytes_if_changed(archive_dir / name, payload)
+
+    # mtime=0: stesso contenuto, stesso .gz
+    compressed = gzip.compress(payload, mtime=0)
+    write_bytes_if_changed(archive_dir / (name + '.gz'), compressed)
+
+    return {
+        'month': month,
+        'file': name,
+        'gzip': name + '.gz',
+        'messages': len(lines),
+        'bytes': len(payload),
+        'gzipBytes': len(compressed),
+    }, weeks
+
+
+def load_manifest(archive_dir=ARCHIVE_DIR):
+    """Manifest dell'archivio, o None se l'archivio non esiste."""
+    path = Path(archive_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_week_index(archive_dir, iso_year):
+    """{lunedì: voce} delle settimane dell'anno ISO, o None se l'archivio non esiste."""
+    archive_dir = Path(archive_dir)
+    if not (archive_dir / MANIFEST_FILE).exists():
+        return None
+    try:
+        with open(archive_dir / WEEK_INDEX_FILE.format(iso_year), 'r', encoding='utf-8') as f:
+            return json.load(f)['weeks']
+    except FileNotFoundError:
+        return {}
+
+
+def write_archive(archive_dir, messages, years=None, generated_at=None):
+    """Scrive gli shard mensili, gli indici settimanali e il manifest.
+
+    `years` limita la riscrittura agli shard di quegli anni; le voci degli
+    altri shard vengono riprese da manifest e indici esistenti. `generated_at`
+    sostituisce l'ora corrente nel manifest.
+    """
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+
+    by_month = {}
+    for msg in messages:
+        month = f'{msg.timestamp.year:04d}-{msg.timestamp.month:02d}'
+        by_month.setdefault(month, []).append(msg)
+
+    # Shard da non riscrivere: voce e range per settimana dal manifest esistente
+    old = {}
+    old_ranges = {}
+    if years is not None:
+        manifest = load_manifest(archive_dir) or {}
+        if manifest.get('version') == ARCHIVE_VERSION:
+            old = {shard['month']: shard for shard in manifest['shards']}
+            for iso_year in manifest['weekYears']:
+                for week, entry in load_week_index(archive_dir, iso_year).items():
+                    for r in entry['ranges']:
+                        old_ranges.setdefault(r['month'], []).append((week, r))
+
+    shards = []
+    ranges = []
+    for month in sorted(by_month):
+        if years is not None and int(month[:4]) not in years and month in old:
+            shards.append(old[month])
+            ranges.extend(old_ranges.get(month, []))
+        else:
+            shard, shard_ranges = write_shard(archive_dir, month, by_month[month])
+            shards.append(shard)
+            ranges.extend(shard_ranges)
+
+    # Shard di mesi che non esistono più (export diverso)
+    for path in archive_dir.glob('messages-*.ndjson*'):
+        if path.name.split('.')[0][len('messages-'):] not in by_month:
+            path.unlink()
+
+    # Indici per anno ISO: per settimana i range di tutti gli shard che la contengono
+    index = {}
+    for week, r in ranges:
+        iso_week = iso_week_key(week)
+        weeks = index.setdefault(int(iso_week[:4]), {})
+        weeks.setdefault(week, {'isoWeek': iso_week, 'ranges': []})['ranges'].append(r)
+    for iso_year, weeks in index.items():
+        dump_json(archive_dir / WEEK_INDEX_FILE.format(iso_year),
+                  {'version': ARCHIVE_VERSION, 'year': iso_year, 'weeks': dict(sorted(weeks.items()))},
+                  compact=True)
+    for path in archive_dir.glob(WEEK_INDEX_FILE.format('*')):
+        if int(path.stem[len('weeks-'):]) not in index:
+            path.unlink()
+
+    manifest = {
+        'version': ARCHIVE_VERSION,
+        'totalMessages': sum(shard['messages'] for shard in shards),
+        'totalBytes': sum(shard['bytes'] for shard in shards),
+        'totalGzipBytes': sum(shard['gzipBytes'] for shard in shards),
+        'shards': shards,
+        'weekYears': sorted(index),
+        'generatedAt': generated_at or datetime.now().isoformat(),
+    }
+    dump_json(archive_dir / MANIFEST_FILE, manifest, compact=True)
+    return manifest
+
+
+def open_shard(archive_dir, month):
+    """Apre uno shard in binario, usando il .gz se manca il file non compresso."""
+    path = Path(archive_dir) / shard_name(month)
+    if path.exists():
+        return open(path, 'rb')
+    return gzip.open(str(path) + '.gz', 'rb')
+
+
+def iter_messages(archive_dir=ARCHIVE_DIR, year=None, months=None):
+    """Messaggi (dict) dell'archivio riga per riga, filtrati per anno o mesi."""
+    manifest = load_manifest(archive_dir)
+    if manifest is None:
+        return
+    for shard in manifest['shards']:
+        month = shard['month']
+        if year is not None and not month.startswith(f'{year}-'):
+            continue
+        if months is not None and month not in months:
+            continue
+        with open_shard(archive_dir, month) as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def read_range(archive_dir, month, offset, length):
+    """Messaggi (dict) in un range di byte di uno shard."""
+    with open_shard(archive_dir, month) as f:
+        f.seek(offset)
+        data = f.read(length)
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+def resolve_week(archive_dir, key):
+    """(lunedì, voce dell'indice) per un lunedì o una settimana ISO ('YYYY-Www'), o None.
+
+    Legge solo l'indice dell'anno ISO della settimana.
+    """
+    if 'W' in key:
+        iso_year = key.split('-W')[0]
+    else:
+        try:
+            iso_year = iso_week_key(key)[:4]
+        except ValueError:
+            return None
+    if not iso_year.isdigit():
+        return None
+    for week, entry in (load_week_index(archive_dir, int(iso_year)) or {}).items():
+        if key in (week, entry['isoWeek']):
+            return week, entry
+    return None
+
+
+def week_counts(entry):
+    """(messaggi, {membro: messaggi}) di una settimana dell'indice, sommando i suoi range."""
+    messages = 0
+    members = {}
+    for r in entry['ranges']:
+        messages += r['messages']
+        for name, count in r['members'].items():
+            members[name] = members.get(name, 0) + count
+    return messages, members
+
+
+def iter_week(archive_dir, week_key, entry=None):
+    """Messaggi (dict) della settimana `week_key` (lunedì o settimana ISO).
+
+    `entry` è la voce dell'indice, se già letta (es. da load_week_index).
+    """
+    if entry is None:
+        resolved = resolve_week(archive_dir, week_key)
+        if resolved is None:
+            return
+        _, entry = resolved
+    for r in entry['ranges']:
+        yield from read_range(archive_dir, r['month'], r['offset'], r['length'])
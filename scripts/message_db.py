@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Archivio SQLite dei messaggi con ricerca full-text (FTS5).
+
+Il database viene scritto da parse_whatsapp.py con --sqlite e si interroga
+da riga di comando senza caricare i JSON in memoria.
+
+Uso:
+    python message_db.py [--db data/messages.db] [--author NOME] [--text PAROLE]
+                         [--year ANNO] [--week LUNEDI|YYYY-Www] [--limit N] [--json]
+
+Esempi:
+    python message_db.py --author Cosimo --text tombino --year 2024
+    python message_db.py --week 2025-01-06
+    python message_db.py --week 2025-W02 --author Fausto
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+DB_FILE = Path(__file__).parent.parent / 'data' / 'messages.db'
+
+# PRAGMA user_version: da incrementare quando cambia lo schema
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE messages (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    week_start TEXT NOT NULL,
+    author TEXT NOT NULL,
+    text TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    weekday INTEGER NOT NULL
+);
+CREATE INDEX idx_messages_year_author ON messages (year, author);
+CREATE INDEX idx_messages_week_author ON messages (week_start, author);
+CREATE INDEX idx_messages_author ON messages (author);
+
+-- Indice full-text sul testo, sincronizzato con la tabella via trigger
+CREATE VIRTUAL TABLE messages_fts USING fts5(
+    text,
+    content='messages',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+'''
+
+
+def connect(path=DB_FILE):
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def create_schema(conn):
+    """Ricrea le tabelle da zero."""
+    conn.executescript('''
+        DROP TRIGGER IF EXISTS messages_ai;
+        DROP TRIGGER IF EXISTS messages_ad;
+        DROP TABLE IF EXISTS messages_fts;
+        DROP TABLE IF EXISTS messages;
+    ''')
+    conn.executescript(SCHEMA)
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def write_database(path, messages, years=None):
+    """Carica i messaggi (record del parser) nel database.
+
+    Con `years` sostituisce solo le righe di quegli anni; senza, o se il
+    database ha uno schema diverso, lo ricostruisce da zero.
+    """
+    conn = connect(path)
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if years is None or version != SCHEMA_VERSION:
+            create_schema(conn)
+            years = None
+        else:
+            conn.executemany('DELETE FROM messages WHERE year = ?', [(y,) for y in sorted(years)])
+
+        week_of_day = {}
+
+        def rows():
+            for msg in messages:
+                if years is not None and msg.year not in years:
+                    continue
+                day = msg.timestamp.date()
+                week_start = week_of_day.get(day)
+                if week_start is None:
+                    week_start = week_of_day[day] = (day - timedelta(days=day.weekday())).isoformat()
+                yield (msg.iso, msg.year, week_start, msg.author, msg.text,
+                       msg.date, msg.time, msg.hour, msg.weekday)
+
+        conn.executemany('''
+            INSERT INTO messages (timestamp, year, week_start, author, text, date, time, hour, weekday)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows())
+        conn.commit()
+        return conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def week_start_for(key):
+    """Lunedì ('YYYY-MM-DD') per un lunedì o una settimana ISO ('YYYY-Www').
+
+    Solleva ValueError per una data o una settimana che non esiste.
+    """
+    if 'W' in key:
+        monday = datetime.strptime(f'{key}-1', '%G-W%V-%u')
+        # strptime accetta anche la W53 degli anni che ne hanno 52
+        if monday.strftime('%G-W%V') != key:
+            raise ValueError(f'settimana ISO inesistente: {key}')
+        return monday.strftime('%Y-%m-%d')
+    return datetime.strptime(key, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+def fts_phrase(text):
+    """Parole cercate tutte insieme, ognuna quotata per l'FTS5."""
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def search(conn, author=None, text=None, year=None, week=None, limit=None):
+    """Messaggi che soddisfano tutti i filtri indicati, in ordine cronologico.
+
+    `author` accetta il nome completo o solo il nome (es. 'Cosimo').
+    """
+    where = []
+    params = []
+    if text:
+        where.append('m.id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)')
+        params.append(fts_phrase(text))
+    if author:
+        where.append("(m.author = ? OR m.author LIKE ? || ' %')")
+        params.extend([author, author])
+    if year:
+        where.append('m.year = ?')
+        params.append(year)
+    if week:
+        where.append('m.week_start = ?')
+        params.append(week_start_for(week))
+
+    sql = 'SELECT m.* FROM messages m'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY m.timestamp, m.id'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+
+    return conn.execute(sql, params).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cerca nei messaggi del database SQLite.')
+    parser.add_argument('--db', type=Path, default=DB_FILE, help='file del database')
+    parser.add_argument('--author', help='autore (nome completo o solo nome)')
+    parser.add_argument('--text', help='parole da cercare nel testo (tutte)')
+    parser.add_argument('--year', type=int, help='anno')
+    parser.add_argument('--week', help='settimana: lunedì YYYY-MM-DD o ISO YYYY-Www')
+    parser.add_argument('--limit', type=int, help='numero massimo di risultati')
+    parser.add_argument('--json', action='store_true', help='output JSON')
+    args = parser.parse_args()
+
+    if args.week:
+        try:
+            week_start_for(args.week)
+        except ValueError:
+            parser.error(f'--week non valida: {args.week} (usa un lunedì YYYY-MM-DD o una settimana ISO YYYY-Www)')
+
+    if not args.db.exists():
+        print(f"Database non trovato: {args.db}")
+        print("Generalo con: python scripts/parse_whatsapp.py <chat.txt> --sqlite")
+        sys.exit(1)
+
+    conn = connect(args.db)
+    rows = search(conn, args.author, args.text, args.year, args.week, args.limit)
+    conn.close()
+
+    if args.json:
+        json.dump([dict(row) for row in rows], sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return
+
+    for row in rows:
+        text = row['text'].replace('\n', ' ')
+        print(f"[{row['timestamp'][:16].replace('T', ' ')}] {row['author']}: {text}")
+    print(f"\n{len(rows)} messaggi")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Impacchetta i messaggi di un anno in blocchi per i prompt degli agenti.
+
+Invece di far leggere agli agenti raw_messages_all.json o un anno intero,
+i messaggi vengono divisi in blocchi di testo sotto un budget di token,
+con settimane intere (o, con --by segmento, conversazioni intere separate da
+pause di almeno --gap minuti) nel formato compatto di extract_week.py:
+
+    [MM-GG HH:MM] Nome: testo
+
+I token sono stimati offline (niente tokenizer): parole spezzate ogni 4
+caratteri, punteggiatura 1, emoji e simboli 2. La stima è prudente per
+l'italiano, quindi il budget reale resta sotto quello chiesto.
+
+I blocchi vanno in .cache/prompts/{anno}/chunk-NN.txt, con index.json che
+per ogni blocco elenca settimane, messaggi, token stimati e hash del
+contenuto. L'indice ricorda anche l'hash di ogni settimana o conversazione:
+se messaggi e parametri non sono cambiati non si ricalcola niente, altrimenti
+le stime delle unità già viste vengono riusate e i blocchi con lo stesso
+contenuto non vengono riscritti (l'agente può saltare quelli con hash
+invariato). Dato che i blocchi si riempiono in ordine, nuovi messaggi a fine
+anno cambiano solo gli ultimi blocchi.
+
+Sorgenti: l'archivio o raw_messages_{anno}.json come extract_year_summary.py,
+oppure direttamente un export WhatsApp con --export (anche uno sintetico di
+synth_export.py, per le prove offline).
+
+Uso:
+    python pack_prompts.py ANNO [ANNO ...] [--budget TOKEN] [--by settimana|segmento]
+                           [--gap MINUTI] [--export FILE] [--out DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from build_outputs import dump_json, write_bytes_if_changed
+from extract_week import format_message
+from extract_year_summary import load_year_messages
+from message_archive import week_start_key
+
+ROOT_DIR = Path(__file__).parent.parent
+OUTPUT_DIR = ROOT_DIR / '.cache' / 'prompts'
+INDEX_FILE = 'index.json'
+# Da incrementare quando cambiano formato delle righe o stima dei token
+PACK_VERSION = 1
+
+DEFAULT_BUDGET = 20000
+DEFAULT_GAP = 120
+UNITS = ['settimana', 'segmento']
+# Riservati all'intestazione del blocco (più 1 per la riga vuota prima di ogni unità)
+HEADER_TOKENS = 40
+
+# Parole (anche accentate e numeri) o singoli simboli
+TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+
+
+def estimate_tokens(line):
+    """Stima dei token di una riga, a capo compreso."""
+    tokens = 1
+    for piece in TOKEN_PATTERN.findall(line):
+        if piece[0].isalnum() or piece[0] == '_':
+            tokens += 1 + (len(piece) - 1) // 4
+        elif ord(piece) > 0x2000:  # emoji e simboli fuori dalla punteggiatura comune
+            tokens += 2
+        else:
+            tokens += 1
+    return tokens
+
+
+def digest(lines):
+    h = hashlib.sha256()
+    for line in lines:
+        h.update(line.encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def split_units(messages, by='settimana', gap=DEFAULT_GAP):
+    """Unità indivisibili (se stanno nel budget): [{'key', 'title', 'lines', 'first', 'last'}].
+
+    `messages` sono dizionari come in raw_messages, in ordine di tempo.
+    """
+    units = []
+    current = None
+    previous = None
+    for msg in messages:
+        ts = msg['timestamp']
+        if by == 'settimana':
+            key = week_start_key(ts)
+            new = current is None or key != current['key']
+        else:
+            t = datetime.fromisoformat(ts)
+            new = previous is None or (t - previous).total_seconds() > gap * 60
+            previous = t
+            key = ts[:16].replace('T', ' ')
+        if new:
+            title = f'## Settimana {key}' if by == 'settimana' else f'## Conversazione {key}'
+            current = {'key': key, 'title': title, 'lines': [], 'first': ts[:10]}
+            units.append(current)
+        current['lines'].append(format_message(msg))
+        current['last'] = ts[:10]
+    return units
+
+
+def measure_units(units, known=None):
+    """Aggiunge hash e token stimati a ogni unità; `known` è {hash: token} di un run precedente."""
+    known = known or {}
+    for unit in units:
+        unit['hash'] = digest([unit['title']] + unit['lines'])
+        unit['tokens'] = known.get(unit['hash'])
+        if unit['tokens'] is None:
+            unit['tokens'] = estimate_tokens(unit['title']) + sum(estimate_tokens(line) for line in unit['lines'])
+    return units
+
+
+def split_oversized(unit, budget):
+    """Parti di un'unità più grande del budget, tagliate tra un messaggio e l'altro."""
+    parts = []
+    part = None
+    for line in unit['lines']:
+        tokens = estimate_tokens(line)
+        if part is None or part['tokens'] + tokens > budget:
+            title = f"{unit['title']} (parte {len(parts) + 1})"
+            part = {'key': unit['key'], 'title': title, 'lines': [], 'first': unit['first'],
+                    'last': unit['last'], 'tokens': estimate_tokens(title), 'partial': True}
+            parts.append(part)
+        part['lines'].append(line)
+        part['tokens'] += tokens
+    return parts
+
+
+def pack(units, budget):
+    """Impacchettamento greedy in ordine: un blocco si chiude quando l'unità successiva non ci sta."""
+    chunks = []
+    current = None
+    for unit in units:
+        room = budget - HEADER_TOKENS - 1
+        pieces = split_oversized(unit, room) if unit['tokens'] > room else [unit]
+        for piece in pieces:
+            if current is None or current['tokens'] + piece['tokens'] + 1 > budget:
+                current = {'units': [], 'tokens': HEADER_TOKENS}
+                chunks.append(current)
+            current['units'].append(piece)
+            current['tokens'] += piece['tokens'] + 1
+    return chunks
+
+
+def chunk_text(year, number, chunk):
+    units = chunk['units']
+    messages = sum(len(unit['lines']) for unit in units)
+    lines = [f"# Chat {year} · blocco {number} · {units[0]['first']} → {units[-1]['last']} · {messages} messaggi"]
+    for unit in units:
+        lines.append('')
+        lines.append(unit['title'])
+        lines.extend(unit['lines'])
+    return '\n'.join(lines) + '\n'
+
+
+def load_index(out_dir):
+    try:
+        with open(out_dir / INDEX_FILE, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get('version') == PACK_VERSION else None
+
+
+def pack_year(year, messages, out_dir, budget=DEFAULT_BUDGET, by='settimana', gap=DEFAULT_GAP):
+    """Scrive i blocchi di un anno in `out_dir`; restituisce (indice, blocchi riscritti o None se invariato)."""
+    out_dir = Path(out_dir)
+    params = {'budget': budget, 'by': by, 'gap': gap if by == 'segmento' else None}
+    units = split_units(messages, by, gap)
+
+    previous = load_index(out_dir)
+    known = {}
+    if previous is not None and previous['params'] == params:
+        known = {unit['hash']: unit['tokens'] for unit in previous['units']}
+    measure_units(units, known)
+    content_hash = digest([json.dumps(params, sort_keys=True)] + [unit['hash'] for unit in units])
+
+    if (previous is not None and previous['contentHash'] == content_hash
+            and all((out_dir / chunk['file']).exists() for chunk in previous['chunks'])):
+        return previous, None
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    chunks = []
+    changed = []
+    for number, chunk in enumerate(pack(units, budget), 1):
+        payload = chunk_text(year, number, chunk).encode('utf-8')
+        name = f'chunk-{number:02d}.txt'
+        if write_bytes_if_changed(out_dir / name, payload):
+            changed.append(name)
+        chunks.append({
+            'file': name,
+            'from': chunk['units'][0]['first'],
+            'to': chunk['units'][-1]['last'],
+            'units': [unit['key'] for unit in chunk['units']],
+            'partial': [unit['key'] for unit in chunk['units'] if unit.get('partial')],
+            'messages': sum(len(unit['lines']) for unit in chunk['units']),
+            'tokens': chunk['tokens'],
+            'sha256': hashlib.sha256(payload).hexdigest(),
+        })
+
+    # Blocchi di un run precedente oltre l'ultimo
+    names = {chunk['file'] for chunk in chunks}
+    for stale in out_dir.glob('chunk-*.txt'):
+        if stale.name not in names:
+            stale.unlink()
+
+    index = {
+        'version': PACK_VERSION,
+        'year': year,
+        'params': params,
+        'contentHash': content_hash,
+        'messages': sum(len(unit['lines']) for unit in units),
+        'tokens': sum(chunk['tokens'] for chunk in chunks),
+        'chunks': chunks,
+        'units': [{'key': unit['key'], 'hash': unit['hash'], 'tokens': unit['tokens']} for unit in units],
+    }
+    dump_json(out_dir / INDEX_FILE, index)
+    return index, changed
+
+
+def export_messages(path, years):
+    """{anno: [messaggi]} da un export WhatsApp, solo per gli anni richiesti."""
+    from parse_whatsapp import parse_chat_file
+
+    by_year = {year: [] for year in years}
+    for msg in parse_chat_file(path):
+        if msg.year in by_year:
+            by_year[msg.year].append(msg.to_dict())
+    return by_year
+
+
+def print_index(index, changed, out_dir):
+    params = index['params']
+    state = 'invariati' if changed is None else f"{len(changed)} riscritti"
+    print(f"Anno {index['year']}: {index['messages']} messaggi, ~{index['tokens']} token in "
+          f"{len(index['chunks'])} blocchi da ≤ {params['budget']} ({params['by']}, {state})")
+    for chunk in index['chunks']:
+        mark = '*' if changed and chunk['file'] in changed else ' '
+        partial = f" (spezzate: {', '.join(chunk['partial'])})" if chunk['partial'] else ''
+        print(f" {mark} {out_dir / chunk['file']}  {chunk['from']} → {chunk['to']}  "
+              f"{len(chunk['units']):>3} unità {chunk['messages']:>5} msg {chunk['tokens']:>6} token{partial}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Divide i messaggi di un anno in blocchi per i prompt degli agenti.')
+    parser.add_argument('years', type=int, nargs='+', metavar='ANNO', help='anni da impacchettare')
+    parser.add_argument('--budget', type=int, default=DEFAULT_BUDGET,
+                        help=f'token stimati massimi per blocco (default: {DEFAULT_BUDGET})')
+    parser.add_argument('--by', choices=UNITS, default='settimana',
+                        help='unità da non spezzare: settimane o conversazioni (default: settimana)')
+    parser.add_argument('--gap', type=int, default=DEFAULT_GAP, metavar='MINUTI',
+                        help=f'pausa che separa due conversazioni con --by segmento (default: {DEFAULT_GAP})')
+    parser.add_argument('--export', type=Path, metavar='FILE', help='legge un export WhatsApp invece di data/')
+    parser.add_argument('--out', type=Path, default=OUTPUT_DIR,
+                        help=f'cartella dei blocchi (default: {OUTPUT_DIR.relative_to(ROOT_DIR)})')
+    args = parser.parse_args()
+
+    if args.budget < 100:
+        parser.error('--budget deve essere almeno 100 token')
+
+    from_export = export_messages(args.export, args.years) if args.export else None
+    missing = False
+    for year in args.years:
+        messages = from_export[year] if from_export is not None else list(load_year_messages(year) or [])
+        if not messages:
+            print(f"Nessun messaggio per il {year}")
+            missing = True
+            continue
+        out_dir = args.out / str(year)
+        index, changed = pack_year(year, messages, out_dir, args.budget, args.by, args.gap)
+        print_index(index, changed, out_dir)
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
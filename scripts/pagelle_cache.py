@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Cache delle pagelle settimanali generate dall'agente pagelle-week.
+
+Ogni settimana ha una chiave: l'hash dei suoi messaggi normalizzati (minuto,
+autore, testo con gli spazi compattati, in ordine) più la versione del
+prompt dell'agente (`<!-- prompt-version: N -->` in
+agents/pagelle-week-agent.md). Un nuovo export della stessa chat, anche da
+un altro telefono, dà la stessa chiave; un messaggio in più o un prompt
+nuovo no.
+
+Per ogni settimana con messaggi il comando confronta la chiave con quella
+registrata in data/pagelle/{anno}/agent-cache.json:
+    - valide: week-XX.json è stato generato per i messaggi attuali
+    - nuove: week-XX.json scritto (o riscritto) dall'agente dopo l'ultimo
+      controllo, registrato con la chiave attuale
+    - riusate: i messaggi sono tornati a una versione già vista (o il file
+      manca) e l'output di allora è in cache: viene ripristinato
+    - da rigenerare: serve un nuovo giro dell'agente
+
+Gli output registrati restano in .cache/pagelle-agent/{chiave}.json, così
+una settimana non va mai generata due volte per gli stessi messaggi.
+merge_pagelle.py salta i week-XX.json da rigenerare.
+
+Uso:
+    python pagelle_cache.py ANNO [--min-messages N] [--dry-run] [--list]
+
+Con --list stampa solo i numeri delle settimane da rigenerare, es.:
+    for w in $(python3 scripts/pagelle_cache.py 2024 --list); do
+        claude "Esegui agents/pagelle-week-agent.md con ANNO=2024 SETTIMANA=$w" &
+    done
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from build_outputs import dump_json, write_bytes_if_changed
+from extract_year_summary import load_year_messages
+from message_archive import ARCHIVE_DIR, iter_week, load_week_index
+
+ROOT_DIR = Path(__file__).parent.parent
+PAGELLE_DIR = ROOT_DIR / 'data' / 'pagelle'
+PROMPT_FILE = ROOT_DIR / 'agents' / 'pagelle-week-agent.md'
+STORE_DIR = ROOT_DIR / '.cache' / 'pagelle-agent'
+LEDGER_FILE = 'agent-cache.json'
+
+# Da incrementare quando cambia la normalizzazione dei messaggi
+CACHE_VERSION = 1
+
+PROMPT_VERSION_PATTERN = re.compile(r'<!--\s*prompt-version:\s*(\S+)\s*-->')
+
+
+def prompt_version(path=PROMPT_FILE):
+    """Versione dichiarata nel prompt dell'agente, o l'hash del file se non c'è."""
+    text = Path(path).read_text(encoding='utf-8')
+    match = PROMPT_VERSION_PATTERN.search(text)
+    if match:
+        return match.group(1)
+    return 'sha256:' + hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+
+
+def week_path(year, week):
+    return PAGELLE_DIR / str(year) / f'week-{week:02d}.json'
+
+
+def year_weeks(year):
+    """{settimana ISO: [messaggi]} delle settimane dell'anno ISO `year`, o None senza dati.
+
+    Con l'archivio le settimane sono intere anche a cavallo di due anni;
+    altrimenti vengono dal file raw dell'anno, come le legge l'agente.
+    """
+    index = load_week_index(ARCHIVE_DIR, year)
+    weeks = {}
+    if index is not None:
+        for week_key, entry in index.items():
+            weeks[int(entry['isoWeek'].split('-W')[1])] = list(iter_week(ARCHIVE_DIR, week_key, entry))
+        return weeks
+
+    messages = load_year_messages(year)
+    if messages is None:
+        return None
+    for msg in messages:
+        iso_year, week, _ = datetime.fromisoformat(msg['timestamp']).isocalendar()
+        if iso_year == year:
+            weeks.setdefault(week, []).append(msg)
+    return weeks
+
+
+def week_key(messages, prompt):
+    """Hash dei messaggi normalizzati della settimana e della versione del prompt."""
+    h = hashlib.sha256(f'{CACHE_VERSION}\n{prompt}\n'.encode('utf-8'))
+    normalized = sorted((m['timestamp'][:16], m['author'], ' '.join(m['text'].split())) for m in messages)
+    for row in normalized:
+        h.update(json.dumps(row, ensure_ascii=False).encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def load_ledger(year):
+    path = PAGELLE_DIR / str(year) / LEDGER_FILE
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            ledger = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return ledger.get('weeks', {}) if ledger.get('version') == CACHE_VERSION else {}
+
+
+def check_year(year, min_messages=10, dry_run=False, prompt=None):
+    """Stato delle settimane dell'anno: {stato: [settimane]}, o None senza messaggi.
+
+    Senza `dry_run` registra gli output nuovi, ripristina quelli riusabili e
+    aggiorna agent-cache.json; con `dry_run` le settimane ripristinabili
+    finiscono in 'riusabili' e non si scrive niente.
+    """
+    weeks = year_weeks(year)
+    if weeks is None:
+        return None
+    prompt = prompt or prompt_version()
+    ledger = load_ledger(year)
+    status = {'valide': [], 'nuove': [], 'riusate': [], 'riusabili': [], 'da rigenerare': []}
+
+    for week, messages in sorted(weeks.items()):
+        key = week_key(messages, prompt)
+        path = week_path(year, week)
+        entry = ledger.get(str(week))
+        stored = STORE_DIR / f'{key}.json'
+
+        if path.exists():
+            payload = path.read_bytes()
+            digest = hashlib.sha256(payload).hexdigest()
+            if entry is None or entry['sha256'] != digest:
+                # Scritto dall'agente dopo l'ultimo controllo: vale per i messaggi attuali
+                status['nuove'].append(week)
+            elif entry['key'] == key:
+                status['valide'].append(week)
+            else:
+                payload = None
+            if payload is not None:
+                if not dry_run:
+                    # Anche le valide: la cache locale può mancare (es. dopo un clone)
+                    STORE_DIR.mkdir(parents=True, exist_ok=True)
+                    write_bytes_if_changed(stored, payload)
+                    ledger[str(week)] = {'key': key, 'sha256': digest, 'messages': len(messages)}
+                continue
+
+        if stored.exists():
+            if dry_run:
+                status['riusabili'].append(week)
+                continue
+            payload = stored.read_bytes()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_bytes_if_changed(path, payload)
+            ledger[str(week)] = {'key': key, 'sha256': hashlib.sha256(payload).hexdigest(),
+                                 'messages': len(messages)}
+            status['riusate'].append(week)
+        elif path.exists() or len(messages) >= min_messages:
+            status['da rigenerare'].append(week)
+
+    if not dry_run:
+        path = PAGELLE_DIR / str(year) / LEDGER_FILE
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dump_json(path, {
+            'version': CACHE_VERSION,
+            'promptVersion': prompt,
+            'weeks': dict(sorted(ledger.items(), key=lambda item: int(item[0]))),
+        })
+    return status
+
+
+def outdated_week_files(year):
+    """week-XX.json dell'anno che non corrispondono più ai messaggi (per merge_pagelle.py).
+
+    Senza messaggi o senza agent-cache.json non esclude niente.
+    """
+    if not load_ledger(year):
+        return set()
+    status = check_year(year, dry_run=True)
+    if status is None:
+        return set()
+    paths = [week_path(year, week) for week in status['da rigenerare'] + status['riusabili']]
+    return {path for path in paths if path.exists()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Settimane di pagelle dell'agente da rigenerare o riusare.")
+    parser.add_argument('year', type=int, help='anno')
+    parser.add_argument('--min-messages', type=int, default=10, metavar='N',
+                        help='settimane senza pagelle con meno messaggi non vanno generate (default: 10)')
+    parser.add_argument('--dry-run', action='store_true', help='mostra lo stato senza scrivere niente')
+    parser.add_argument('--list', action='store_true', help='stampa solo le settimane da rigenerare')
+    args = parser.parse_args()
+
+    status = check_year(args.year, args.min_messages, args.dry_run)
+    if status is None:
+        print(f"Nessun messaggio per il {args.year}: esegui prima parse_whatsapp.py", file=sys.stderr)
+        sys.exit(1)
+
+    if args.list:
+        print(' '.join(str(week) for week in status['da rigenerare']))
+        return
+
+    print(f"Pagelle {args.year} (prompt {prompt_version()}):")
+    for name, weeks in status.items():
+        if weeks or name in ('valide', 'da rigenerare'):
+            print(f"  {name:<14} {len(weeks):>3}  {weeks}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Voti delle pagelle automatiche e backtest delle formule.
+
+I voti di più settimane si calcolano in un colpo solo su una matrice
+(settimane × membri) di messaggi, dove 0 vuol dire membro assente. Ogni
+strategia trasforma la matrice in voti grezzi, poi limitati a 4-10 e
+arrotondati a un decimale:
+    - relative: rispetto al più attivo della settimana (la formula storica)
+    - zscore: scarto dalla media della settimana in deviazioni standard
+    - percentile: posizione nella classifica della settimana
+
+Il backtest ricalcola con ogni strategia i voti di tutti gli anni a partire
+dai messaggi in data/pagelle/{anno}.json e confronta medie e classifiche
+cumulative con quelle pubblicate, senza rilanciare il parser.
+
+Uso (backtest):
+    python pagelle_scoring.py [--strategies relative,zscore,percentile] [--year ANNO]
+
+Senza numpy è disponibile solo la strategia relative (e niente backtest).
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # solo la strategia di default, riga per riga
+    np = None
+
+PAGELLE_DIR = Path(__file__).parent.parent / 'data' / 'pagelle'
+
+DEFAULT_STRATEGY = 'relative'
+
+# Strategie: nome -> funzione(matrice conteggi float, maschera presenti) -> voti grezzi
+STRATEGIES = {}
+
+
+def strategy(name):
+    """Registra una strategia di voto."""
+    def register(func):
+        STRATEGIES[name] = func
+        return func
+    return register
+
+
+@strategy('relative')
+def relative(counts, active):
+    """Media = 6, sopra la metà del più attivo 7+, il più attivo 8+ con bonus per volume."""
+    top = counts.max(axis=1, keepdims=True)
+    ratio = np.divide(counts, top, out=np.zeros_like(counts), where=top > 0)
+    return np.select(
+        [counts == top, ratio > 0.5, ratio > 0.2],
+        [8.0 + (counts / 50) * 0.5, 7.0 + ratio, 6.0 + ratio * 2],
+        5.0 + ratio * 5,
+    )
+
+
+@strategy('zscore')
+def zscore(counts, active):
+    """6.5 alla media della settimana, ±1.5 per deviazione standard."""
+    n = active.sum(axis=1, keepdims=True)
+    mean = np.divide(counts.sum(axis=1, keepdims=True), n, out=np.zeros((len(counts), 1)), where=n > 0)
+    var = np.divide((((counts - mean) * active) ** 2).sum(axis=1, keepdims=True), n,
+                    out=np.zeros((len(counts), 1)), where=n > 0)
+    std = np.sqrt(var)
+    z = np.divide(counts - mean, std, out=np.zeros_like(counts), where=std > 0)
+    return 6.5 + 1.5 * z
+
+
+@strategy('percentile')
+def percentile(counts, active):
+    """Da 5 (ultimo della settimana) a 9 (primo); a pari messaggi pari voto."""
+    pairs = active[:, None, :]
+    less = ((counts[:, None, :] < counts[:, :, None]) & pairs).sum(axis=2)
+    equal = ((counts[:, None, :] == counts[:, :, None]) & pairs).sum(axis=2)
+    n = active.sum(axis=1, keepdims=True)
+    rank = np.divide(less + (equal - 1) / 2, n - 1, out=np.ones_like(counts), where=n > 1)
+    return 5.0 + 4.0 * rank
+
+
+def relative_voto(count, top):
+    """La strategia relative per un solo membro (senza numpy)."""
+    ratio = count / top
+    if count == top:
+        return 8.0 + (count / 50) * 0.5
+    if ratio > 0.5:
+        return 7.0 + ratio
+    if ratio > 0.2:
+        return 6.0 + ratio * 2
+    return 5.0 + ratio * 5
+
+
+def score_counts(counts, name=DEFAULT_STRATEGY):
+    """Voti (4-10, un decimale) per righe di messaggi per membro.
+
+    `counts` è una lista di righe (o un array) settimane × membri; dove il
+    conteggio è 0 il voto è NaN (None senza numpy).
+    """
+    if np is None:
+        if name != DEFAULT_STRATEGY:
+            raise ValueError(f"la strategia {name} richiede numpy")
+        voti = []
+        for row in counts:
+            top = max(row, default=0)
+            voti.append([round(min(10, max(4, relative_voto(c, top))), 1) if c else None for c in row])
+        return voti
+
+    counts = np.asarray(counts, dtype=float)
+    if counts.size == 0:
+        return np.full(counts.shape, np.nan)
+    active = counts > 0
+    raw = np.clip(STRATEGIES[name](counts, active), 4, 10)
+    # round() di Python per arrotondare come sempre (np.round sbaglia qualche x.x5)
+    voti = np.array([round(v, 1) for v in raw.ravel().tolist()]).reshape(raw.shape)
+    voti[~active] = np.nan
+    return voti
+
+
+# --- Backtest ---
+
+def load_weeks(years=None):
+    """Settimane di pagelle/{anno}.json: (anni, righe, membri, conteggi, voti pubblicati).
+
+    Le pagelle senza numero di messaggi (alcuni file degli agenti) sono
+    ignorate.
+    """
+    paths = sorted(PAGELLE_DIR.glob('[0-9][0-9][0-9][0-9].json'))
+    members = {}
+    rows = []
+    for path in paths:
+        year = int(path.stem)
+        if years and year not in years:
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for week in data.get('weeks', []):
+            row = {}
+            for p in week.get('pagelle', []):
+                if p.get('messaggi'):
+                    members.setdefault(p['name'], len(members))
+                    row[p['name']] = (p['messaggi'], p.get('voto') or 0)
+            if row:
+                rows.append((year, row))
+
+    counts = np.zeros((len(rows), len(members)))
+    published = np.full((len(rows), len(members)), np.nan)
+    for i, (_, row) in enumerate(rows):
+        for name, (count, voto) in row.items():
+            counts[i, members[name]] = count
+            published[i, members[name]] = voto
+    return np.array([year for year, _ in rows]), list(members), counts, published
+
+
+def cumulative(voti, names):
+    """Classifica cumulativa [(nome, media)] per media voto decrescente."""
+    present = ~np.isnan(voti)
+    weeks = present.sum(axis=0)
+    totals = np.where(present, voti, 0).sum(axis=0)
+    ranking = [(names[j], round(totals[j] / weeks[j], 2)) for j in range(len(names)) if weeks[j]]
+    ranking.sort(key=lambda x: -x[1])
+    return ranking
+
+
+def rank_correlation(a, b):
+    """Spearman tra due classifiche degli stessi membri (1 = identiche)."""
+    n = len(a)
+    if n < 2:
+        return 1.0
+    pos = {name: i for i, (name, _) in enumerate(b)}
+    d2 = sum((i - pos[name]) ** 2 for i, (name, _) in enumerate(a))
+    return 1 - 6 * d2 / (n * (n * n - 1))
+
+
+def backtest(strategies, years=None):
+    """Per ogni strategia e anno: classifica, correlazione con quella pubblicata, scarto medio delle medie."""
+    year_of_row, names, counts, published = load_weeks(years)
+    results = {}
+    for name in strategies:
+        voti = score_counts(counts, name)
+        per_year = {}
+        for year in sorted(set(year_of_row.tolist())):
+            rows = year_of_row == year
+            current = cumulative(published[rows], names)
+            ranking = cumulative(voti[rows], names)
+            medie = dict(ranking)
+            per_year[year] = {
+                'ranking': ranking,
+                'current': current,
+                'correlation': rank_correlation(current, ranking),
+                'delta': sum(abs(medie[n] - m) for n, m in current) / len(current),
+            }
+        results[name] = per_year
+    return results, counts.shape
+
+
+def print_backtest(results, shape, elapsed, detail_year=None):
+    weeks, members = shape
+    years = sorted({year for per_year in results.values() for year in per_year})
+    print(f"Backtest su {len(years)} anni, {weeks} settimane, {members} membri ({elapsed:.2f} s)\n")
+    print(f"{'strategia':<12} {'corr. classifica':>16} {'Δ media voto':>13} {'MVP cambiati':>13}")
+    for name, per_year in results.items():
+        corr = sum(r['correlation'] for r in per_year.values()) / len(per_year)
+        delta = sum(r['delta'] for r in per_year.values()) / len(per_year)
+        mvp = sum(r['ranking'][0][0] != r['current'][0][0] for r in per_year.values())
+        print(f"{name:<12} {corr:>16.3f} {delta:>13.2f} {f'{mvp}/{len(per_year)}':>13}")
+
+    print(f"\n{'anno':<6}" + ''.join(f" {name:>24}" for name in results))
+    for year in years:
+        cells = []
+        for per_year in results.values():
+            top_name, top_media = per_year[year]['ranking'][0]
+            cells.append(f"{top_name.split()[0]} {top_media:.2f} (ρ {per_year[year]['correlation']:.2f})")
+        print(f"{year:<6}" + ''.join(f" {cell:>24}" for cell in cells))
+
+    if detail_year in years:
+        current = results[next(iter(results))][detail_year]['current']
+        print(f"\nClassifica cumulativa {detail_year} (media e posizione):")
+        print(f"{'membro':<24} {'pubblicata':>12}" + ''.join(f" {name:>12}" for name in results))
+        positions = {name: {n: (i, m) for i, (n, m) in enumerate(per_year[detail_year]['ranking'], 1)}
+                     for name, per_year in results.items()}
+        for i, (member, media) in enumerate(current, 1):
+            cells = [f"{positions[name][member][1]:.2f} ({positions[name][member][0]})" for name in results]
+            print(f"{member[:24]:<24} {f'{media:.2f} ({i})':>12}" + ''.join(f" {cell:>12}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Confronta le strategie di voto delle pagelle su tutti gli anni.')
+    parser.add_argument('--strategies', default=','.join(STRATEGIES),
+                        help=f'strategie separate da virgola (default: {",".join(STRATEGIES)})')
+    parser.add_argument('--year', type=int, help="mostra la classifica cumulativa di quest'anno per ogni strategia")
+    args = parser.parse_args()
+
+    if np is None:
+        print("Il backtest richiede numpy (pip install numpy)")
+        sys.exit(1)
+    strategies = [name.strip() for name in args.strategies.split(',') if name.strip()]
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"strategie sconosciute: {', '.join(unknown)} (disponibili: {', '.join(STRATEGIES)})")
+    if not any(PAGELLE_DIR.glob('[0-9][0-9][0-9][0-9].json')):
+        print(f"Nessun file di pagelle in {PAGELLE_DIR}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results, shape = backtest(strategies)
+    print_backtest(results, shape, time.perf_counter() - start, args.year)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Pagelle divise per settimana, per il caricamento progressivo di pagelle.js.
+
+Accanto a data/pagelle/{anno}.json, in data/pagelle/shards/{anno}/:
+    - index.json: elenco settimane (date, stats, awards, voto più alto e
+      file dello shard) e classifica cumulativa, quanto basta per il
+      riepilogo dell'anno
+    - {lunedì}.json: la settimana completa (pagelle, riassunto, citazioni)
+
+La pagina carica l'indice e scarica una settimana solo quando viene aperta.
+"""
+
+from pathlib import Path
+
+from build_outputs import dump_json
+
+SHARDS_DIR = 'shards'
+INDEX_FILE = 'index.json'
+
+
+def top_voto(week):
+    """Voto più alto della settimana come {'name', 'voto'} (None se non ce ne sono)."""
+    best = None
+    for pagella in week.get('pagelle', []):
+        voto = pagella.get('voto') or 0
+        if voto > 0 and (best is None or voto > best['voto']):
+            best = {'name': pagella.get('name', ''), 'voto': voto}
+    return best
+
+
+def write_pagelle_shards(pagelle_dir, data):
+    """Scrive indice e shard settimanali dei dati di pagelle/{anno}.json.
+
+    Gli shard di settimane che non ci sono più vengono rimossi; restituisce
+    l'indice scritto.
+    """
+    year_dir = Path(pagelle_dir) / SHARDS_DIR / str(data['year'])
+    year_dir.mkdir(parents=True, exist_ok=True)
+
+    weeks = []
+    written = set()
+    for n, week in enumerate(data.get('weeks', []), 1):
+        # Un file per lunedì; numerazione solo se la data manca o si ripete
+        name = f"{week.get('startDate') or f'week-{n:02d}'}.json"
+        if name in written:
+            name = f'{name[:-len(".json")]}-{n:02d}.json'
+        written.add(name)
+
+        dump_json(year_dir / name, week)
+
+        entry = {'startDate': week.get('startDate', '')}
+        if 'endDate' in week:
+            entry['endDate'] = week['endDate']
+        entry['file'] = f"{SHARDS_DIR}/{data['year']}/{name}"
+        entry['stats'] = week.get('stats', {})
+        entry['topVoto'] = top_voto(week)
+        if 'awards' in week:
+            entry['awards'] = week['awards']
+        weeks.append(entry)
+
+    for path in year_dir.glob('*.json'):
+        if path.name != INDEX_FILE and path.name not in written:
+            path.unlink()
+
+    index = {
+        'year': data['year'],
+        'weeks': weeks,
+        'cumulative': data.get('cumulative', []),
+        'totalWeeks': data.get('totalWeeks', len(weeks)),
+    }
+    if 'generatedAt' in data:
+        index['generatedAt'] = data['generatedAt']
+
+    dump_json(year_dir / INDEX_FILE, index)
+    return index
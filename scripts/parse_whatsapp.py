@@ -4,33 +4,131 @@ Parser per export chat WhatsApp.
 Legge un file .txt esportato da WhatsApp e genera file JSON per il sito.
 
 Uso:
-    python parse_whatsapp.py <path_to_chat.txt>
+    python parse_whatsapp.py <path_to_chat.txt> [altri export ...] [--incremental] [--jobs N] [--compact]
+                             [--sqlite [DB]] [--reproducible] [--scoring relative|zscore|percentile]
+                             [--profile [FILE]] [--profile-memory] [--cprofile] [--dedup-window MINUTI]
+
+Il formato dell'export (Android US con AM/PM, Android italiano 24h, iOS con
+parentesi quadre) viene riconosciuto dalle prime righe del file.
+
+Con più export della stessa chat (da telefoni diversi, anche in formati
+diversi, o vecchi export che coprono periodi che i nuovi hanno perso) i file
+vengono letti in streaming e uniti in ordine di tempo; i messaggi presenti in
+più export (stesso minuto, autore e testo) compaiono una volta sola. Per il
+confronto si tengono solo i messaggi degli ultimi --dedup-window minuti.
+
+Con --incremental riparte dal checkpoint salvato in data/parse_checkpoint.json:
+se il file è lo stesso export con nuovi messaggi in coda, parsa solo la coda
+e rigenera solo gli anni toccati dai nuovi messaggi. Delle pagelle vengono
+ricalcolate solo le settimane cambiate: il checkpoint conserva per ogni
+settimana numero di messaggi e giorni trascorsi e per ogni membro le somme dei
+voti, e la classifica cumulativa viene aggiornata invece che ricostruita.
+
+Con --profile salva in .cache/profile/ un report JSON con tempo, CPU e byte
+scritti per ogni stadio della build (vedi build_profile.py); --profile-memory
+aggiunge il picco di memoria e --cprofile le funzioni più costose, entrambi a
+costo di tempi più lenti.
+
+I file vengono riscritti solo se il contenuto cambia. Con --reproducible i
+campi generatedAt/parsedAt/lastUpdate prendono il timestamp dell'ultimo
+messaggio dei dati di ciascun file invece dell'ora corrente: la stessa chat
+produce gli stessi byte e un anno chiuso non cambia più.
 
 Output:
     - data/stats.json: Statistiche generali (da 2026)
     - data/classifica.json: Classifica per attività (da 2026)
     - data/anni/*.json: Statistiche per ogni anno (2019-2026)
     - data/pagelle/*.json: Pagelle settimanali per ogni anno
+    - data/pagelle/shards/: Indice e una pagella per settimana (caricamento progressivo)
     - data/raw_messages_*.json: Messaggi per anno
+    - data/activity-cube.json: Messaggi e parole per autore, mese, giorno e ora
+    - data/archive/: Messaggi in shard NDJSON mensili (+ .gz) con manifest e indici settimanali per anno
+    - data/messages.db: Database SQLite con ricerca full-text (con --sqlite)
+    - data/build-manifest.json: Hash SHA-256 e dimensione di ogni file di data/
 """
 
 import re
 import json
 import sys
+import argparse
+import cProfile
+import hashlib
+import heapq
+import time
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque, namedtuple
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
 import calendar
-
-# Pattern per messaggi WhatsApp
-# Formato: M/D/YY, H:MM AM/PM - Nome: messaggio
-PATTERNS = [
-    # Formato americano con AM/PM: 1/17/26, 9:08 AM - Nome: messaggio
-    re.compile(r'^(\d{1,2}/\d{1,2}/\d{2,4}),?\s+(\d{1,2}:\d{2})\s*(AM|PM)?\s*[-–]\s*([^:]+):\s*(.*)$', re.IGNORECASE),
-    # Formato senza AM/PM
-    re.compile(r'^(\d{1,2}/\d{1,2}/\d{2,4}),?\s+(\d{1,2}:\d{2})\s*[-–]\s*([^:]+):\s*(.*)$'),
+from concurrent.futures import ProcessPoolExecutor
+
+from message_archive import write_archive
+from message_db import DB_FILE, write_database
+from pagelle_scoring import DEFAULT_STRATEGY, STRATEGIES, score_counts
+from pagelle_shards import write_pagelle_shards
+from build_outputs import dump_json, file_digest, open_output, write_build_manifest
+from build_profile import PROFILE_FILE, BuildProfile, count_lines, print_summary, write_report
+
+try:
+    import numpy as np
+except ImportError:  # statistiche calcolate in puro Python
+    np = None
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+CHECKPOINT_FILE = 'parse_checkpoint.json'
+CUBE_FILE = 'activity-cube.json'
+
+# Ordini di lettura della data, in ordine di preferenza
+MONTH_FIRST = ['%m/%d/%y', '%m/%d/%Y', '%d/%m/%y', '%d/%m/%Y']
+DAY_FIRST = ['%d/%m/%y', '%d/%m/%Y', '%m/%d/%y', '%m/%d/%Y']
+
+# Dialetto di export: regex dell'intestazione (data, ora e separatore, anche
+# per i messaggi di sistema senza autore), regex del messaggio completo,
+# formati data ammessi (il primo che legge tutto il campione vince) e
+# caratteri con cui inizia un'intestazione
+Dialect = namedtuple('Dialect', ['name', 'header', 'pattern', 'date_formats', 'header_start'])
+
+
+def make_dialect(name, header, date_formats, header_start, flags=0):
+    return Dialect(
+        name,
+        re.compile(header, flags),
+        re.compile(header + r'(?P<author>[^:]+):\s*(?P<text>.*)$', flags),
+        date_formats,
+        header_start,
+    )
+
+
+DIALECTS = [
+    # Android americano con AM/PM: 1/17/26, 9:08 AM - Nome: messaggio
+    make_dialect(
+        'us',
+        r'^(?P<date>\d{1,2}/\d{1,2}/\d{2,4}),?\s+(?P<time>\d{1,2}:\d{2})\s*(?P<ampm>AM|PM)\s*[-–]\s*',
+        MONTH_FIRST,
+        '0123456789',
+        re.IGNORECASE,
+    ),
+    # Android italiano 24h: 17/01/26, 21:08 - Nome: messaggio
+    make_dialect(
+        'it',
+        r'^(?P<date>\d{1,2}/\d{1,2}/\d{2,4}),?\s+(?P<time>\d{1,2}:\d{2})\s*[-–]\s*',
+        DAY_FIRST,
+        '0123456789',
+    ),
+    # iOS: [17/01/26, 21:08:15] Nome: messaggio (eventuale LRM iniziale)
+    make_dialect(
+        'ios',
+        r'^\u200e?\[(?P<date>\d{1,2}/\d{1,2}/\d{2,4}),?\s+(?P<time>\d{1,2}:\d{2}(?::\d{2})?)(?:\s*(?P<ampm>AM|PM))?\]\s*',
+        DAY_FIRST,
+        '[\u200e',
+        re.IGNORECASE,
+    ),
 ]
 
+# Caratteri iniziali di un'intestazione quando il dialetto non è noto
+ANY_HEADER_START = ''.join(sorted(set(''.join(d.header_start for d in DIALECTS))))
+
 # Normalizzazione nomi (nickname -> nome completo)
 NAME_MAP = {
     'Alecs': 'Alessio Macalùso',
@@ -79,192 +177,838 @@ SYSTEM_KEYWORDS = [
     '<Media omitted>',
     '<Questo messaggio è stato eliminato>',
     '<Media omessi>',
+    # Segnaposto media degli export iOS
+    'image omitted',
+    'video omitted',
+    'audio omitted',
+    'sticker omitted',
+    'document omitted',
+    '<attached:',
+    'immagine omessa',
+    'video omesso',
+    'audio omesso',
+    'sticker omesso',
+    'documento omesso',
+    '<allegato:',
 ]
 
 
+# Un'unica alternanza compilata al posto di una ricerca per keyword
+SYSTEM_PATTERN = re.compile('|'.join(re.escape(kw.lower()) for kw in SYSTEM_KEYWORDS))
+
+
 def is_system_message(text):
     """Verifica se è un messaggio di sistema."""
-    text_lower = text.lower()
-    return any(kw.lower() in text_lower for kw in SYSTEM_KEYWORDS)
+    return SYSTEM_PATTERN.search(text.lower()) is not None
 
 
-def parse_date(date_str, time_str, ampm=None):
-    """Parsa data e ora in formato datetime."""
-    # Formato americano M/D/YY
-    try:
-        date = datetime.strptime(date_str, '%m/%d/%y')
-        hour, minute = map(int, time_str.split(':'))
-
-        # Gestisci AM/PM
-        if ampm:
-            ampm = ampm.upper()
-            if ampm == 'PM' and hour != 12:
-                hour += 12
-            elif ampm == 'AM' and hour == 12:
-                hour = 0
-
-        return date.replace(hour=hour, minute=minute)
-    except ValueError:
-        pass
+# Formati data provati quando il dialetto non è noto (americano M/D/YY per primo)
+DATE_FORMATS = ['%m/%d/%y', '%d/%m/%y', '%d/%m/%Y', '%m/%d/%Y']
+
+# Righe iniziali del file usate per riconoscere dialetto e formato data
+DIALECT_SAMPLE_LINES = 500
+
+# Per quanto si ricordano i messaggi già visti quando si uniscono più export
+DEDUP_WINDOW = timedelta(minutes=10)
 
-    # Fallback: altri formati
-    for fmt in ['%d/%m/%y', '%d/%m/%Y', '%m/%d/%Y']:
+
+@lru_cache(maxsize=8192)
+def parse_day(date_str, date_format=None):
+    """Giorno di calendario per una data dell'export (memoizzato per stringa).
+
+    Prova prima il formato riconosciuto per il file, poi gli altri.
+    """
+    formats = DATE_FORMATS
+    if date_format:
+        formats = [date_format] + [fmt for fmt in DATE_FORMATS if fmt != date_format]
+    for fmt in formats:
         try:
-            date = datetime.strptime(date_str, fmt)
-            hour, minute = map(int, time_str.split(':'))
-            return date.replace(hour=hour, minute=minute)
+            return datetime.strptime(date_str, fmt)
         except ValueError:
             continue
+    return None
 
+
+def detect_date_format(date_strs, formats=DATE_FORMATS):
+    """Sceglie il primo dei formati che interpreta tutte le date del campione."""
+    for fmt in formats:
+        try:
+            for date_str in date_strs:
+                datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+        return fmt
     return None
 
 
-def parse_message_line(line):
-    """Parsa una singola riga di messaggio."""
-    for pattern in PATTERNS:
-        match = pattern.match(line.strip())
-        if match:
-            groups = match.groups()
+def parse_date(date_str, time_str, ampm=None, date_format=None):
+    """Parsa data e ora in formato datetime."""
+    day = parse_day(date_str, date_format)
+    if day is None:
+        return None
 
-            # Pattern con AM/PM ha 5 gruppi, senza ne ha 4
-            if len(groups) == 5:
-                date_str, time_str, ampm, author, text = groups
-            else:
-                date_str, time_str, author, text = groups
-                ampm = None
+    # H:MM oppure HH:MM:SS (iOS)
+    parts = time_str.split(':')
+    hour = int(parts[0])
+    minute = int(parts[1])
+    second = int(parts[2]) if len(parts) > 2 else 0
+
+    # Gestisci AM/PM
+    if ampm:
+        ampm = ampm.upper()
+        if ampm == 'PM' and hour != 12:
+            hour += 12
+        elif ampm == 'AM' and hour == 12:
+            hour = 0
+
+    try:
+        return day.replace(hour=hour, minute=minute, second=second)
+    except ValueError:
+        return None
+
+
+class Message:
+    """Messaggio parsato: timestamp nativo, autore internato e testo.
+
+    Anno, ora, giorno della settimana e ISO si ricavano dal timestamp quando
+    servono; il dict verboso dei raw_messages si produce solo in scrittura.
+    `date` e `time` sono le stringhe originali dell'export (internate).
+    """
+
+    __slots__ = ('timestamp', 'author', 'text', 'date', 'time')
+
+    def __init__(self, timestamp, author, text, date, time):
+        self.timestamp = timestamp
+        self.author = author
+        self.text = text
+        self.date = date
+        self.time = time
+
+    @property
+    def year(self):
+        return self.timestamp.year
+
+    @property
+    def hour(self):
+        return self.timestamp.hour
+
+    @property
+    def weekday(self):
+        return self.timestamp.weekday()
+
+    @property
+    def iso(self):
+        return self.timestamp.isoformat()
+
+    def to_dict(self):
+        """Formato dei messaggi nei file raw_messages_*.json."""
+        return {
+            'timestamp': self.iso,
+            'year': self.year,
+            'author': self.author,
+            'text': self.text,
+            'date': self.date,
+            'time': self.time,
+            'hour': self.hour,
+            'weekday': self.weekday,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            datetime.fromisoformat(data['timestamp']),
+            sys.intern(data['author']),
+            data['text'],
+            sys.intern(data['date']),
+            sys.intern(data['time']),
+        )
+
+
+def parse_message_line(line, dialect=None, date_format=None):
+    """Parsa una singola riga di messaggio.
+
+    Con un dialetto riconosciuto prova solo la sua regex; altrimenti prova
+    tutti i dialetti in ordine.
+    """
+    line = line.strip()
+
+    # Ogni intestazione inizia con la data (o con '[' su iOS): le righe di
+    # continuazione (la maggior parte di quelle che non sono header) escono subito
+    header_start = dialect.header_start if dialect else ANY_HEADER_START
+    if not line or line[0] not in header_start:
+        return None
+
+    for candidate in (dialect,) if dialect else DIALECTS:
+        match = candidate.pattern.match(line)
+        if match:
+            date_str, time_str, author, text = match.group('date', 'time', 'author', 'text')
+            ampm = match.groupdict().get('ampm')
 
-            # Salta messaggi di sistema
-            if is_system_message(text) or is_system_message(author):
+            # Salta messaggi di sistema (testo e autore in una sola ricerca;
+            # nessuna keyword contiene un a capo)
+            if is_system_message(text + '\n' + author):
                 return None
 
-            timestamp = parse_date(date_str, time_str, ampm)
+            timestamp = parse_date(date_str, time_str, ampm, date_format)
             if not timestamp:
                 continue
 
-            return {
-                'timestamp': timestamp.isoformat(),
-                'year': timestamp.year,
-                'author': normalize_name(author.strip()),
-                'text': text.strip(),
-                'date': date_str,
-                'time': time_str,
-                'hour': timestamp.hour,
-                'weekday': timestamp.weekday(),
-            }
+            return Message(
+                timestamp,
+                sys.intern(normalize_name(author.strip())),
+                text.strip(),
+                sys.intern(date_str),
+                sys.intern(time_str),
+            )
 
     return None
 
 
-def parse_chat_file(filepath):
-    """Parsa un file di chat WhatsApp."""
-    messages = []
-    current_message = None
+def is_header_line(line, dialect=None):
+    """Verifica se la riga apre un nuovo messaggio (anche di sistema)."""
+    line = line.strip()
+    header_start = dialect.header_start if dialect else ANY_HEADER_START
+    if not line or line[0] not in header_start:
+        return False
+    return any(d.header.match(line) for d in ((dialect,) if dialect else DIALECTS))
 
-    with open(filepath, 'r', encoding='utf-8') as f:
-        for line in f:
-            parsed = parse_message_line(line)
 
-            if parsed:
-                # Nuovo messaggio
-                if current_message:
-                    messages.append(current_message)
-                current_message = parsed
-            elif current_message and line.strip():
-                # Continuazione del messaggio precedente (multilinea)
-                current_message['text'] += '\n' + line.strip()
+def swap_day_month(date_format):
+    """Lo stesso formato con giorno e mese scambiati ('%d/%m/%y' <-> '%m/%d/%y')."""
+    return date_format.replace('%m', '%M').replace('%d', '%m').replace('%M', '%d')
 
-    # Aggiungi l'ultimo messaggio
+
+def settle_date_order(f, dialect, date_format):
+    """Ordine giorno/mese quando il campione si legge in entrambi i modi.
+
+    Continua a leggere le intestazioni da dove è arrivato il campione finché
+    una data (es. con un numero > 12) si legge in un solo ordine; se non ne
+    trova, il mese prima del giorno come nel parsing storico.
+    """
+    swapped = swap_day_month(date_format)
+    for raw in f:
+        line = raw.decode('utf-8', errors='replace').strip()
+        if not line or line[0] not in dialect.header_start:
+            continue
+        match = dialect.header.match(line)
+        if not match:
+            continue
+        reads = [fmt for fmt in (date_format, swapped) if detect_date_format([match.group('date')], [fmt])]
+        if len(reads) == 1:
+            return reads[0]
+    return date_format if date_format.index('%m') < date_format.index('%d') else swapped
+
+
+def sniff_dialect(f):
+    """Riconosce dialetto e formato data dalle prime righe del file.
+
+    Se le date del campione si leggono sia giorno/mese sia mese/giorno (tutti
+    i giorni fino al 12) l'ordine si decide più avanti nel file, vedi
+    settle_date_order. Restituisce (dialetto, formato data), oppure
+    (None, None) se nessun dialetto riconosce il campione: in quel caso ogni
+    riga prova tutti i dialetti e tutti i formati data.
+    """
+    f.seek(0)
+    date_strs = defaultdict(list)
+    for _, raw in zip(range(DIALECT_SAMPLE_LINES), f):
+        line = raw.decode('utf-8', errors='replace').strip()
+        for dialect in DIALECTS:
+            match = dialect.pattern.match(line)
+            if match:
+                date_strs[dialect.name].append(match.group('date'))
+                break
+
+    if not date_strs:
+        return None, None
+
+    # Il dialetto con più intestazioni riconosciute (a parità, il primo)
+    dialect = max(DIALECTS, key=lambda d: len(date_strs[d.name]))
+    sample = date_strs[dialect.name]
+    date_format = detect_date_format(sample, dialect.date_formats)
+    if date_format and detect_date_format(sample, [swap_day_month(date_format)]):
+        date_format = settle_date_order(f, dialect, date_format)
+    return dialect, date_format
+
+
+def iter_chat_stream(f, offset=0, sniffed=None):
+    """Messaggi di un file di chat aperto in binario, a partire da un offset in byte.
+
+    Genera (messaggio, offset della sua riga di intestazione) man mano che
+    ogni messaggio è completo (alla riga di intestazione successiva), senza
+    tenere in memoria il resto del file. `sniffed` è il risultato di
+    sniff_dialect (calcolato qui se assente).
+    """
+    dialect, date_format = sniffed or sniff_dialect(f)
+
+    current_message = None
+    current_header = offset
+    pos = offset
+
+    f.seek(offset)
+    for raw in f:
+        line = raw.decode('utf-8')
+        parsed = parse_message_line(line, dialect, date_format)
+
+        if parsed:
+            # Nuovo messaggio
+            if current_message:
+                yield current_message, current_header
+            current_message = parsed
+            current_header = pos
+        elif is_header_line(line, dialect):
+            # Messaggio di sistema o media: chiude il precedente e si scarta
+            if current_message:
+                yield current_message, current_header
+            current_message = None
+        elif current_message and line.strip():
+            # Continuazione del messaggio precedente (multilinea)
+            current_message.text += '\n' + line.strip()
+
+        pos += len(raw)
+
+    # L'ultimo messaggio
     if current_message:
-        messages.append(current_message)
+        yield current_message, current_header
+
+
+def parse_chat_stream(f, offset=0, sniffed=None):
+    """Parsa un file di chat aperto in binario a partire da un offset in byte.
+
+    Restituisce (messaggi, offset della riga di intestazione dell'ultimo
+    messaggio). L'ultimo messaggio può ancora ricevere righe di continuazione
+    in un export successivo, quindi il checkpoint riparte da lì.
+    """
+    messages = []
+    last_header = offset
+    for message, last_header in iter_chat_stream(f, offset, sniffed):
+        messages.append(message)
+    return messages, last_header
+
 
+def parse_chat_file(filepath):
+    """Parsa un file di chat WhatsApp."""
+    with open(filepath, 'rb') as f:
+        messages, _ = parse_chat_stream(f)
     return messages
 
 
-def analyze_messages(messages):
-    """Analizza i messaggi e genera statistiche."""
-    stats = {
-        'totalMessages': len(messages),
-        'totalMembers': 0,
-        'mostActive': '',
-        'lastUpdate': datetime.now().isoformat(),
-    }
+def iter_chat_file(filepath, sniffed=None):
+    """Messaggi di un export, letti in streaming (il file resta aperto finché si itera)."""
+    with open(filepath, 'rb') as f:
+        for message, _ in iter_chat_stream(f, sniffed=sniffed):
+            yield message
+
+
+def message_key(msg):
+    """Chiave di deduplica: minuto, autore e hash del testo con gli spazi compattati.
+
+    Il minuto e non il secondo perché gli export iOS hanno i secondi e quelli
+    Android no.
+    """
+    text = ' '.join(msg.text.split())
+    return (msg.timestamp.replace(second=0, microsecond=0), msg.author,
+            hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest())
+
+
+def merge_exports(streams, window=DEDUP_WINDOW, stats=None):
+    """Unisce più flussi di messaggi in ordine di timestamp, senza doppioni.
+
+    `streams` sono iterabili di Message, uno per export, ciascuno in ordine
+    di tempo; a pari timestamp vince l'ordine degli export. Un messaggio è un
+    doppione se un altro export ha già dato la stessa chiave (message_key):
+    le copie si contano per export, così due "ok" nello stesso minuto di un
+    export restano due anche se un altro export ne ha uno solo. Le chiavi
+    restano in memoria solo fino a `window` dopo il loro minuto, quindi la
+    memoria dipende dalla finestra e non dalla lunghezza degli export.
+
+    `stats`, se passato, riceve 'read' (messaggi letti per export),
+    'duplicates' e 'peakWindow' (chiavi in memoria al massimo).
+    """
+    if stats is not None:
+        stats.update(read=[0] * len(streams), duplicates=0, peakWindow=0)
+    # chiave -> [copie emesse, {export: copie viste}], con le scadenze in ordine
+    seen = {}
+    expiry = deque()
+    tagged = [zip(repeat(source), stream) for source, stream in enumerate(streams)]
+
+    for source, msg in heapq.merge(*tagged, key=lambda item: item[1].timestamp):
+        key = message_key(msg)
+        minute = key[0]
+        while expiry and expiry[0][0] < minute - window:
+            seen.pop(expiry.popleft()[1], None)
+
+        entry = seen.get(key)
+        if entry is None:
+            entry = seen[key] = [0, {}]
+            expiry.append((minute, key))
+        copies = entry[1][source] = entry[1].get(source, 0) + 1
+        if stats is not None:
+            stats['read'][source] += 1
+            stats['peakWindow'] = max(stats['peakWindow'], len(seen))
+        if copies > entry[0]:
+            entry[0] += 1
+            yield msg
+        elif stats is not None:
+            stats['duplicates'] += 1
+
+
+def hash_prefix(filepath, length):
+    """SHA-256 dei primi `length` byte del file."""
+    h = hashlib.sha256()
+    remaining = length
+    with open(filepath, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            h.update(chunk)
+            remaining -= len(chunk)
+    return h.hexdigest()
+
+
+def load_checkpoint(data_dir):
+    """Carica il checkpoint del parsing incrementale, se esiste."""
+    path = data_dir / CHECKPOINT_FILE
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(data_dir, filepath, messages, offset, pagelle=None):
+    """Salva offset, hash del prefisso e ultimo messaggio per il prossimo run.
 
-    members = defaultdict(lambda: {
-        'messageCount': 0,
-        'wordCount': 0,
-        'emojiCount': 0,
-        'hourlyActivity': defaultdict(int),
-        'dailyActivity': defaultdict(int),
-        'monthlyActivity': defaultdict(int),
-        'firstMessage': None,
-        'lastMessage': None,
-    })
-
-    # Attività aggregata per grafici
-    hourly_total = defaultdict(int)
-    daily_total = defaultdict(int)
-    monthly_total = defaultdict(int)
+    `pagelle` è lo stato per anno delle pagelle (impronte delle settimane e
+    somme per membro) per rigenerare solo le settimane cambiate.
 
+    Con più export uniti `filepath` è la lista dei file e `offset` è None:
+    il checkpoint non vale per il parsing incrementale.
+    """
+    years = defaultdict(int)
     for msg in messages:
-        author = msg['author']
-        member = members[author]
-
-        member['messageCount'] += 1
-        member['wordCount'] += len(msg['text'].split())
-        member['hourlyActivity'][msg['hour']] += 1
-        member['dailyActivity'][msg['weekday']] += 1
-
-        # Attività mensile
-        month_key = msg['timestamp'][:7]  # YYYY-MM
-        member['monthlyActivity'][month_key] += 1
-        monthly_total[month_key] += 1
-
-        # Totali aggregati
-        hourly_total[msg['hour']] += 1
-        daily_total[msg['weekday']] += 1
-
-        # Primo e ultimo messaggio
-        if not member['firstMessage'] or msg['timestamp'] < member['firstMessage']:
-            member['firstMessage'] = msg['timestamp']
-        if not member['lastMessage'] or msg['timestamp'] > member['lastMessage']:
-            member['lastMessage'] = msg['timestamp']
-
-    # Trova il più attivo
-    if members:
-        most_active = max(members.items(), key=lambda x: x[1]['messageCount'])
-        stats['mostActive'] = most_active[0]
-        stats['totalMembers'] = len(members)
-
-    # Prepara classifica
-    classifica = {
-        'members': [
-            {
-                'name': name,
-                'messageCount': data['messageCount'],
-                'wordCount': data['wordCount'],
-                'avgWordsPerMessage': round(data['wordCount'] / data['messageCount'], 1) if data['messageCount'] > 0 else 0,
-                'hourlyActivity': dict(data['hourlyActivity']),
-                'dailyActivity': dict(data['dailyActivity']),
-            }
-            for name, data in sorted(members.items(), key=lambda x: -x[1]['messageCount'])
-        ],
-        'hourlyTotal': dict(hourly_total),
-        'dailyTotal': dict(daily_total),
-        'monthlyTotal': dict(monthly_total),
-        'generatedAt': datetime.now().isoformat(),
-    }
+        years[msg.year] += 1
+
+    merged = offset is None
+    with open(data_dir / CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
+        json.dump({
+            'source': [str(path) for path in filepath] if merged else str(filepath),
+            'offset': offset,
+            'prefixHash': None if merged else hash_prefix(filepath, offset),
+            'lastMessage': messages[-1].to_dict() if messages else None,
+            'years': {str(y): c for y, c in sorted(years.items())},
+            'totalMessages': len(messages),
+            'pagelle': pagelle or {},
+            'savedAt': datetime.now().isoformat(),
+        }, f, indent=2, ensure_ascii=False)
+
+
+def parse_chat_incremental(filepath, data_dir, sniffed=None):
+    """Parsa solo la coda del file a partire dal checkpoint.
+
+    Restituisce (messaggi, offset ultimo header, anni modificati) oppure None se
+    il checkpoint manca o non è più valido (export troncato o modificato, file
+    raw_messages mancanti): in quel caso serve un parsing completo.
+    """
+    checkpoint = load_checkpoint(data_dir)
+    if not checkpoint or not checkpoint.get('lastMessage'):
+        return None
+
+    offset = checkpoint['offset']
+    if offset is None or filepath.stat().st_size < offset:
+        return None
+    if hash_prefix(filepath, offset) != checkpoint['prefixHash']:
+        return None
+
+    # Messaggi già parsati, dai dump per anno del run precedente
+    old_messages = []
+    for year, count in checkpoint['years'].items():
+        raw_file = data_dir / f'raw_messages_{year}.json'
+        if not raw_file.exists():
+            return None
+        with open(raw_file, 'r', encoding='utf-8') as f:
+            year_messages = [Message.from_dict(m) for m in json.load(f)['messages']]
+        if len(year_messages) != count:
+            return None
+        old_messages.extend(year_messages)
+
+    last_message = checkpoint['lastMessage']
+    if not old_messages or old_messages[-1].to_dict() != last_message:
+        return None
 
-    return stats, classifica, dict(members)
+    # Riparte dall'header dell'ultimo messaggio, che può essere cresciuto
+    with open(filepath, 'rb') as f:
+        tail, last_header = parse_chat_stream(f, offset, sniffed)
 
+    if not tail or tail[0].iso != last_message['timestamp'] \
+            or tail[0].author != last_message['author']:
+        return None
 
-def generate_year_data(messages, year, all_years_stats):
+    messages = old_messages[:-1] + tail
+    dirty_years = {m.year for m in tail}
+    return messages, last_header, dirty_years
+
+
+class MessageIndex:
+    """Partizione dei messaggi per anno e per settimana, costruita una volta sola.
+
+    Ogni anno e ogni settimana (lunedì, dentro l'anno) corrispondono a una slice
+    contigua, così i generatori non rifiltrano tutta la chat per ogni anno.
+    """
+
+    def __init__(self, messages):
+        # L'export è in ordine cronologico, quindi di norma anni e settimane
+        # sono già blocchi contigui; se non lo sono (orologi sfasati) si
+        # riordina in modo stabile.
+        week_of_day = {}
+        keys = []
+        for msg in messages:
+            day = msg.timestamp.date()
+            week_key = week_of_day.get(day)
+            if week_key is None:
+                week_key = get_week_start(day).strftime('%Y-%m-%d')
+                week_of_day[day] = week_key
+            keys.append((msg.timestamp.year, week_key))
+
+        # Slice per anno nello stesso ordine del vecchio filtro per anno,
+        # slice per settimana nello stesso ordine del vecchio raggruppamento
+        year_keys = [key[0] for key in keys]
+        self.messages = self._grouped(messages, year_keys)
+        self._week_messages = self._grouped(messages, keys)
+
+        self._years = self._slices(self._grouped(year_keys, year_keys))
+        week_slices = self._slices(self._grouped(keys, keys))
+        self._weeks = defaultdict(dict)
+        for (year, week_key), bounds in week_slices.items():
+            self._weeks[year][week_key] = bounds
+
+        # Cubo di attività: unica aggregazione per tutte le statistiche
+        self.cube = ActivityCube.from_messages(self.messages)
+
+    @staticmethod
+    def _grouped(items, keys):
+        """Ordina items per chiave (stabile) solo se le chiavi non sono già a blocchi."""
+        seen = set()
+        prev = object()
+        for key in keys:
+            if key != prev:
+                if key in seen:
+                    order = sorted(range(len(keys)), key=keys.__getitem__)
+                    return [items[i] for i in order]
+                seen.add(key)
+                prev = key
+        return items
+
+    @staticmethod
+    def _slices(sorted_keys):
+        """Mappa chiave -> (inizio, fine) su una lista di chiavi a blocchi."""
+        bounds = {}
+        for i, key in enumerate(sorted_keys):
+            start = bounds[key][0] if key in bounds else i
+            bounds[key] = (start, i + 1)
+        return bounds
+
+    @property
+    def years(self):
+        return sorted(self._years)
+
+    def count(self, year):
+        start, end = self._years.get(year, (0, 0))
+        return end - start
+
+    def year(self, year):
+        """Messaggi di un anno."""
+        start, end = self._years.get(year, (0, 0))
+        return self.messages[start:end]
+
+    def weeks(self, year):
+        """Coppie (lunedì 'YYYY-MM-DD', messaggi) dell'anno, in ordine di settimana."""
+        weeks = self._weeks.get(year, {})
+        return [(key, self._week_messages[start:end]) for key, (start, end) in sorted(weeks.items())]
+
+
+class MessageColumns:
+    """Rappresentazione colonnare (array NumPy) dei campi usati dalle statistiche.
+
+    Ogni colonna ha un elemento per messaggio; serve a costruire il cubo di
+    attività con operazioni vettoriali.
+    """
+
+    def __init__(self, messages):
+        names = {}
+        self.names = []
+        author_ids = []
+        for msg in messages:
+            author_id = names.get(msg.author)
+            if author_id is None:
+                author_id = names[msg.author] = len(self.names)
+                self.names.append(msg.author)
+            author_ids.append(author_id)
+
+        self.messages = messages
+        epoch = np.array([m.timestamp for m in messages], dtype='datetime64[s]')
+        days = epoch.astype('datetime64[D]')
+        self.epoch = epoch.astype(np.int64)
+        self.author = np.array(author_ids, dtype=np.int32)
+        self.hour = ((self.epoch - days.astype('datetime64[s]').astype(np.int64)) // 3600).astype(np.int64)
+        # 1970-01-01 era un giovedì (weekday 3)
+        self.weekday = (days.astype(np.int64) + 3) % 7
+        self.month = epoch.astype('datetime64[M]').astype(np.int64)
+        self.words = np.array([len(m.text.split()) for m in messages], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class ActivityCube:
+    """Cubo di attività: messaggi e parole per (autore, mese, giorno, ora).
+
+    È l'unica aggregazione sui messaggi: stats.json, classifica.json,
+    anni/*.json e i blocchi `members` dei raw_messages sono tutti slice del
+    cubo. Per le slice usa i totali per (mese, autore), con accanto primo e
+    ultimo timestamp.
+    """
+
+    def __init__(self, authors, months, cells, rollup):
+        # Nomi in ordine di primo messaggio e mesi 'YYYY-MM' ordinati
+        self.authors = authors
+        self.months = months
+        # Celle non vuote: righe [autore, mese, giorno, ora, messaggi, parole]
+        self.cells = cells
+        # Per mese: {autore: [messaggi, parole, ore[24], giorni[7], primo, ultimo]}
+        self.rollup = rollup
+
+    @classmethod
+    def from_messages(cls, messages, columns=None):
+        """Costruisce il cubo in un passaggio (vettoriale se c'è NumPy)."""
+        if np is not None and messages:
+            return cls.from_columns(columns or MessageColumns(messages))
+
+        authors = {}
+        cells = {}
+        first_last = {}
+        for msg in messages:
+            timestamp = msg.timestamp
+            author = authors.setdefault(msg.author, len(authors))
+            month = f'{timestamp.year:04d}-{timestamp.month:02d}'
+
+            key = (author, month, timestamp.weekday(), timestamp.hour)
+            cell = cells.get(key)
+            if cell is None:
+                cell = cells[key] = [0, 0]
+            cell[0] += 1
+            cell[1] += len(msg.text.split())
+
+            bounds = first_last.get((author, month))
+            if bounds is None:
+                first_last[(author, month)] = [timestamp, timestamp]
+            elif timestamp < bounds[0]:
+                bounds[0] = timestamp
+            elif timestamp > bounds[1]:
+                bounds[1] = timestamp
+
+        months = sorted({month for _, month in first_last})
+        month_index = {m: i for i, m in enumerate(months)}
+        rows = [
+            [a, month_index[month], weekday, hour, count, words]
+            for (a, month, weekday, hour), (count, words) in sorted(cells.items())
+        ]
+        bounds = [
+            [a, month_index[month], first.isoformat(), last.isoformat()]
+            for (a, month), (first, last) in sorted(first_last.items())
+        ]
+        return cls.from_rows(list(authors), months, rows, bounds)
+
+    @classmethod
+    def from_rows(cls, authors, months, rows, first_last):
+        """Cubo dalle celle e dai [autore, mese, primo, ultimo] (es. da JSON)."""
+        rollup = [{} for _ in months]
+        for a, m, weekday, hour, count, words in rows:
+            totals = rollup[m].get(a)
+            if totals is None:
+                totals = rollup[m][a] = [0, 0, [0] * 24, [0] * 7, None, None]
+            totals[0] += count
+            totals[1] += words
+            totals[2][hour] += count
+            totals[3][weekday] += count
+        for a, m, first, last in first_last:
+            rollup[m][a][4:] = [first, last]
+        return cls(authors, months, rows, rollup)
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Costruisce il cubo denso con bincount sulle colonne."""
+        month_ids, month = np.unique(columns.month, return_inverse=True)
+        month = month.reshape(-1)
+        months = [str(np.datetime64(int(m), 'M')) for m in month_ids.tolist()]
+
+        shape = (len(columns.names), len(months), 7, 24)
+        size = shape[0] * shape[1] * 7 * 24
+        flat = np.ravel_multi_index((columns.author, month, columns.weekday, columns.hour), shape)
+        counts = np.bincount(flat, minlength=size).reshape(shape)
+        words = np.bincount(flat, weights=columns.words, minlength=size).astype(np.int64).reshape(shape)
+
+        nonzero = np.nonzero(counts)
+        cells = np.column_stack(nonzero + (counts[nonzero], words[nonzero]))
+
+        # Primo e ultimo messaggio per (autore, mese): primo elemento di ogni
+        # gruppo ordinato per timestamp crescente / decrescente
+        positions = np.arange(len(columns))
+        group = columns.author * len(months) + month
+
+        def first_per_group(order):
+            sorted_groups = group[order]
+            starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+            return sorted_groups[starts].tolist(), order[starts].tolist()
+
+        groups, first_idx = first_per_group(np.lexsort((positions, columns.epoch, group)))
+        _, last_idx = first_per_group(np.lexsort((positions, -columns.epoch, group)))
+
+        # Totali per (autore, mese) dalle somme sugli assi del cubo
+        message_totals = counts.sum(axis=(2, 3)).tolist()
+        word_totals = words.sum(axis=(2, 3)).tolist()
+        hourly = counts.sum(axis=2).tolist()
+        daily = counts.sum(axis=3).tolist()
+
+        rollup = [{} for _ in months]
+        for g, i, j in zip(groups, first_idx, last_idx):
+            a, m = divmod(g, len(months))
+            rollup[m][a] = [message_totals[a][m], word_totals[a][m], hourly[a][m], daily[a][m],
+                            columns.messages[i].iso, columns.messages[j].iso]
+
+        return cls(columns.names, months, cells, rollup)
+
+    def newest(self, year=None):
+        """Timestamp ISO dell'ultimo messaggio dell'anno (o della chat)."""
+        return max(
+            (totals[5] for month, by_author in zip(self.months, self.rollup)
+             if year is None or month.startswith(f'{year}-')
+             for totals in by_author.values()),
+            default=None,
+        )
+
+    def analyze(self, year=None, generated_at=None):
+        """Statistiche di un anno (o di tutta la chat) come analyze_messages.
+
+        `generated_at` sostituisce l'ora corrente in lastUpdate/generatedAt.
+        """
+        generated_at = generated_at or datetime.now().isoformat()
+        members = {}
+        monthly_total = {}
+        for m, month in enumerate(self.months):
+            if year is not None and not month.startswith(f'{year}-'):
+                continue
+            monthly_total[month] = 0
+            for author, (count, words, hours, days, first, last) in self.rollup[m].items():
+                member = members.get(author)
+                if member is None:
+                    member = members[author] = {
+                        'messageCount': 0,
+                        'wordCount': 0,
+                        'emojiCount': 0,
+                        'hourlyActivity': [0] * 24,
+                        'dailyActivity': [0] * 7,
+                        'monthlyActivity': {},
+                        'firstMessage': first,
+                        'lastMessage': last,
+                    }
+                else:
+                    member['firstMessage'] = min(member['firstMessage'], first)
+                    member['lastMessage'] = max(member['lastMessage'], last)
+                member['messageCount'] += count
+                member['wordCount'] += words
+                member['monthlyActivity'][month] = count
+                member['hourlyActivity'] = [x + y for x, y in zip(member['hourlyActivity'], hours)]
+                member['dailyActivity'] = [x + y for x, y in zip(member['dailyActivity'], days)]
+                monthly_total[month] += count
+
+        hourly_total = [sum(column) for column in zip([0] * 24, *(m['hourlyActivity'] for m in members.values()))]
+        daily_total = [sum(column) for column in zip([0] * 7, *(m['dailyActivity'] for m in members.values()))]
+
+        # Membri in ordine di primo messaggio nella slice; istogrammi solo con
+        # le chiavi non vuote, come quando si contava messaggio per messaggio
+        members_data = {}
+        for author in sorted(members, key=lambda a: (members[a]['firstMessage'], a)):
+            member = members[author]
+            member['hourlyActivity'] = {h: c for h, c in enumerate(member['hourlyActivity']) if c}
+            member['dailyActivity'] = {d: c for d, c in enumerate(member['dailyActivity']) if c}
+            members_data[self.authors[author]] = member
+
+        stats = {
+            'totalMessages': sum(monthly_total.values()),
+            'totalMembers': 0,
+            'mostActive': '',
+            'lastUpdate': generated_at,
+        }
+
+        # Trova il più attivo
+        if members_data:
+            most_active = max(members_data.items(), key=lambda x: x[1]['messageCount'])
+            stats['mostActive'] = most_active[0]
+            stats['totalMembers'] = len(members_data)
+
+        # Prepara classifica
+        classifica = {
+            'members': [
+                {
+                    'name': name,
+                    'messageCount': data['messageCount'],
+                    'wordCount': data['wordCount'],
+                    'avgWordsPerMessage': round(data['wordCount'] / data['messageCount'], 1) if data['messageCount'] > 0 else 0,
+                    'hourlyActivity': dict(data['hourlyActivity']),
+                    'dailyActivity': dict(data['dailyActivity']),
+                }
+                for name, data in sorted(members_data.items(), key=lambda x: -x[1]['messageCount'])
+            ],
+            'hourlyTotal': {h: c for h, c in enumerate(hourly_total) if c},
+            'dailyTotal': {d: c for d, c in enumerate(daily_total) if c},
+            'monthlyTotal': monthly_total,
+            'generatedAt': generated_at,
+        }
+
+        return stats, classifica, members_data
+
+    def to_json(self):
+        """Forma compatta: celle come righe [autore, mese, giorno, ora, messaggi, parole]."""
+        cells = self.cells.tolist() if hasattr(self.cells, 'tolist') else self.cells
+        return {
+            'dims': ['author', 'month', 'weekday', 'hour'],
+            'authors': self.authors,
+            'months': self.months,
+            'cells': cells,
+            'firstLast': [
+                [a, m, totals[4], totals[5]]
+                for a in range(len(self.authors))
+                for m, by_author in enumerate(self.rollup)
+                for totals in [by_author.get(a)]
+                if totals is not None
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls.from_rows(data['authors'], data['months'], data['cells'], data['firstLast'])
+
+
+def analyze_messages(messages, cube=None, year=None):
+    """Analizza i messaggi e genera statistiche.
+
+    Le statistiche sono una slice del cubo di attività (costruito qui se non
+    viene passato); `year` limita la slice a un anno.
+    """
+    if cube is None:
+        cube = ActivityCube.from_messages(messages)
+    return cube.analyze(year)
+
+
+def generate_year_data(index, year, all_years_stats, generated_at=None):
     """Genera dati completi per un singolo anno."""
-    year_messages = [m for m in messages if m['year'] == year]
+    generated_at = generated_at or datetime.now().isoformat()
+    year_messages = index.year(year)
 
     if not year_messages:
         return None
 
-    stats, classifica, members_data = analyze_messages(year_messages)
+    stats, classifica, members_data = index.cube.analyze(year, generated_at)
 
     # MVP dell'anno (dati storici forniti)
     mvp_map = {
@@ -342,7 +1086,7 @@ def generate_year_data(messages, year, all_years_stats):
         'dailyActivity': classifica['dailyTotal'],
         'highlights': highlights_map.get(year, ""),
         'bestOf': best_of_by_year.get(year, []),
-        'generatedAt': datetime.now().isoformat(),
+        'generatedAt': generated_at,
     }
 
 
@@ -351,299 +1095,644 @@ def get_week_start(dt):
     return dt - timedelta(days=dt.weekday())
 
 
-def generate_pagelle_for_year(messages, year):
-    """Genera pagelle settimanali per un anno."""
-    year_messages = [m for m in messages if m['year'] == year]
+def score_weeks(weeks, year, now, scoring=DEFAULT_STRATEGY):
+    """Pagelle di più settimane [(lunedì, messaggi)], con i voti calcolati
+    insieme sulla matrice settimane × membri (None per le settimane vuote)."""
+    # Conta messaggi per membro e settimana
+    week_counts = []
+    members = {}
+    for _, week_msgs in weeks:
+        member_counts = defaultdict(int)
+        for msg in week_msgs:
+            member_counts[msg.author] += 1
+        for name in member_counts:
+            members.setdefault(name, len(members))
+        week_counts.append(member_counts)
 
-    if not year_messages:
-        return None
+    counts = [[0] * len(members) for _ in weeks]
+    for row, member_counts in zip(counts, week_counts):
+        for name, count in member_counts.items():
+            row[members[name]] = count
+    voti = score_counts(counts, scoring)
 
-    # Raggruppa messaggi per settimana
-    weeks = defaultdict(list)
-    for msg in year_messages:
-        dt = datetime.fromisoformat(msg['timestamp'])
-        week_start = get_week_start(dt)
-        week_key = week_start.strftime('%Y-%m-%d')
-        weeks[week_key].append(msg)
+    return [
+        build_week(week_key, member_counts, {name: float(row[members[name]]) for name in member_counts}, year, now)
+        for (week_key, _), member_counts, row in zip(weeks, week_counts, voti)
+    ]
 
-    # Ordina settimane
-    sorted_weeks = sorted(weeks.keys())
 
-    # Genera pagelle per ogni settimana
-    pagelle_weeks = []
-    member_cumulative = defaultdict(lambda: {
-        'totalVoti': 0,
-        'votiCount': 0,
-        'totalMessaggi': 0,
-        'bestVoto': 0,
-        'worstVoto': 10,
-        'bestWeek': None,
-        'worstWeek': None,
-    })
-
-    for week_key in sorted_weeks:
-        week_msgs = weeks[week_key]
-        week_start = datetime.strptime(week_key, '%Y-%m-%d')
-        week_end = week_start + timedelta(days=6)
-
-        # Conta messaggi per membro questa settimana
-        member_counts = defaultdict(int)
-        for msg in week_msgs:
-            member_counts[msg['author']] += 1
+def build_week(week_key, member_counts, voti, year, now):
+    """Pagelle di una settimana dai messaggi e dai voti per membro (None se vuota)."""
+    week_start = datetime.strptime(week_key, '%Y-%m-%d')
+    week_end = week_start + timedelta(days=6)
 
-        if not member_counts:
-            continue
+    if not member_counts:
+        return None
 
-        # Calcola statistiche settimana
-        total_week_msgs = sum(member_counts.values())
-        max_msgs = max(member_counts.values())
-        avg_msgs = total_week_msgs / len(member_counts) if member_counts else 0
-        days_in_week = min(7, (datetime.now() - week_start).days + 1) if year == datetime.now().year else 7
-
-        # Genera pagelle per ogni membro attivo
-        week_pagelle = []
-        for name, count in sorted(member_counts.items(), key=lambda x: -x[1]):
-            # Calcola voto basato su attività relativa
-            # Media = 6, sopra media = bonus, top = 8+
-            if max_msgs > 0:
-                relative_activity = count / max_msgs
-                if count == max_msgs:
-                    base_voto = 8.0 + (count / 50) * 0.5  # Bonus per volume
-                elif relative_activity > 0.5:
-                    base_voto = 7.0 + relative_activity
-                elif relative_activity > 0.2:
-                    base_voto = 6.0 + relative_activity * 2
-                else:
-                    base_voto = 5.0 + relative_activity * 5
-            else:
-                base_voto = 6.0
-
-            voto = round(min(10, max(4, base_voto)), 1)
-            media_giornaliera = round(count / days_in_week, 1)
-
-            # Giudizio automatico basato su stats
-            if voto >= 8:
-                giudizio = f"Settimana dominante con {count} messaggi. Protagonista assoluto."
-            elif voto >= 7:
-                giudizio = f"Buona presenza nel gruppo con {count} messaggi. Partecipazione attiva."
-            elif voto >= 6:
-                giudizio = f"Settimana nella media con {count} messaggi. Presente ma non protagonista."
-            elif voto >= 5:
-                giudizio = f"Settimana sottotono con solo {count} messaggi. Si può fare di più."
-            else:
-                giudizio = f"Quasi assente con {count} messaggi. In letargo?"
+    # Calcola statistiche settimana
+    total_week_msgs = sum(member_counts.values())
+    avg_msgs = total_week_msgs / len(member_counts) if member_counts else 0
+    days_in_week = week_days(week_start, year, now)
+
+    # Genera pagelle per ogni membro attivo
+    week_pagelle = []
+    for name, count in sorted(member_counts.items(), key=lambda x: -x[1]):
+        voto = voti[name]
+        media_giornaliera = round(count / days_in_week, 1)
+
+        # Giudizio automatico basato su stats
+        if voto >= 8:
+            giudizio = f"Settimana dominante con {count} messaggi. Protagonista assoluto."
+        elif voto >= 7:
+            giudizio = f"Buona presenza nel gruppo con {count} messaggi. Partecipazione attiva."
+        elif voto >= 6:
+            giudizio = f"Settimana nella media con {count} messaggi. Presente ma non protagonista."
+        elif voto >= 5:
+            giudizio = f"Settimana sottotono con solo {count} messaggi. Si può fare di più."
+        else:
+            giudizio = f"Quasi assente con {count} messaggi. In letargo?"
+
+        week_pagelle.append({
+            'name': name,
+            'voto': voto,
+            'giudizio': giudizio,
+            'messaggi': count,
+            'mediaGiornaliera': media_giornaliera,
+        })
 
-            week_pagelle.append({
-                'name': name,
-                'voto': voto,
-                'giudizio': giudizio,
-                'messaggi': count,
-                'mediaGiornaliera': media_giornaliera,
-            })
+    # Ordina per voto
+    week_pagelle.sort(key=lambda x: -x['voto'])
 
-            # Aggiorna cumulativo
-            cum = member_cumulative[name]
-            cum['totalVoti'] += voto
+    # Awards settimanali
+    mvp = week_pagelle[0]['name'] if week_pagelle else None
+    fantasma = week_pagelle[-1]['name'] if week_pagelle else None
+
+    return {
+        'startDate': week_key,
+        'endDate': week_end.strftime('%Y-%m-%d'),
+        'pagelle': week_pagelle,
+        'riassunto': f"Settimana con {total_week_msgs} messaggi totali. {len(member_counts)} membri attivi.",
+        'awards': {
+            'mvp': mvp,
+            'chiacchierone': mvp,
+            'fantasma': fantasma,
+        },
+        'stats': {
+            'totalMessages': total_week_msgs,
+            'activeMembers': len(member_counts),
+            'avgPerMember': round(avg_msgs, 1),
+        }
+    }
+
+
+def week_days(week_start, year, now):
+    """Giorni trascorsi della settimana (7 se conclusa) per la media giornaliera."""
+    return min(7, (now - week_start).days + 1) if year == now.year else 7
+
+
+def patch_cumulative(members, week_key, old_week, new_week):
+    """Aggiorna le somme per membro sostituendo `old_week` con `new_week`.
+
+    `members`: {nome: {'votiCount', 'totalMessaggi', 'voti': {lunedì: voto}}};
+    una delle due settimane può essere None.
+    """
+    if old_week:
+        for p in old_week['pagelle']:
+            cum = members[p['name']]
+            cum['votiCount'] -= 1
+            cum['totalMessaggi'] -= p['messaggi']
+            del cum['voti'][week_key]
+            if not cum['votiCount']:
+                del members[p['name']]
+    if new_week:
+        # Nell'ordine di conteggio, come li incontrava il calcolo da zero
+        for p in sorted(new_week['pagelle'], key=lambda p: -p['messaggi']):
+            cum = members.setdefault(p['name'], {'votiCount': 0, 'totalMessaggi': 0, 'voti': {}})
             cum['votiCount'] += 1
-            cum['totalMessaggi'] += count
-            if voto > cum['bestVoto']:
-                cum['bestVoto'] = voto
-                cum['bestWeek'] = week_key
-            if voto < cum['worstVoto']:
-                cum['worstVoto'] = voto
-                cum['worstWeek'] = week_key
-
-        # Ordina per voto
-        week_pagelle.sort(key=lambda x: -x['voto'])
-
-        # Awards settimanali
-        mvp = week_pagelle[0]['name'] if week_pagelle else None
-        fantasma = week_pagelle[-1]['name'] if week_pagelle else None
-
-        pagelle_weeks.append({
-            'startDate': week_key,
-            'endDate': week_end.strftime('%Y-%m-%d'),
-            'pagelle': week_pagelle,
-            'riassunto': f"Settimana con {total_week_msgs} messaggi totali. {len(member_counts)} membri attivi.",
-            'awards': {
-                'mvp': mvp,
-                'chiacchierone': mvp,
-                'fantasma': fantasma,
-            },
-            'stats': {
-                'totalMessages': total_week_msgs,
-                'activeMembers': len(member_counts),
-                'avgPerMember': round(avg_msgs, 1),
-            }
-        })
+            cum['totalMessaggi'] += p['messaggi']
+            cum['voti'][week_key] = p['voto']
+
 
-    # Calcola statistiche cumulative
+def cumulative_ranking(members):
+    """Classifica cumulativa dalle somme per membro."""
     cumulative_stats = []
-    for name, cum in member_cumulative.items():
+    for name, cum in members.items():
         if cum['votiCount'] > 0:
+            # Prima settimana col voto migliore / peggiore
+            voti = sorted(cum['voti'].items())
+            # Somma in ordine di settimana, come il calcolo da zero
+            total = sum(voto for _, voto in voti)
+            best_week, best_voto = max(voti, key=lambda x: x[1])
+            worst_week, worst_voto = min(voti, key=lambda x: x[1])
             cumulative_stats.append({
                 'name': name,
-                'mediaVoto': round(cum['totalVoti'] / cum['votiCount'], 2),
+                'mediaVoto': round(total / cum['votiCount'], 2),
                 'totalMessaggi': cum['totalMessaggi'],
                 'settimaneAttive': cum['votiCount'],
-                'bestVoto': cum['bestVoto'],
-                'worstVoto': cum['worstVoto'],
-                'bestWeek': cum['bestWeek'],
-                'worstWeek': cum['worstWeek'],
+                'bestVoto': best_voto,
+                'worstVoto': worst_voto,
+                'bestWeek': best_week,
+                'worstWeek': worst_week,
             })
 
     # Ordina per media voto
     cumulative_stats.sort(key=lambda x: -x['mediaVoto'])
+    return cumulative_stats
+
+
+def generate_pagelle_for_year(index, year, now=None, generated_at=None, previous=None, scoring=DEFAULT_STRATEGY):
+    """Genera pagelle settimanali per un anno.
+
+    `now` è l'ora di riferimento per la settimana in corso (default: adesso).
+    `previous` è (pagelle/{year}.json, stato) del run precedente: le
+    settimane con lo stesso numero di messaggi e gli stessi giorni trascorsi
+    vengono riprese così come sono, le altre ricalcolate, e la classifica
+    cumulativa viene corretta solo per quelle. `scoring` è la strategia di
+    voto (vedi pagelle_scoring.py); se cambia si ricalcola tutto.
+
+    Restituisce (dati pagelle, stato da salvare per il prossimo run,
+    settimane ricalcolate).
+    """
+    now = now or datetime.now()
+    # Messaggi già raggruppati per settimana, in ordine
+    weeks = index.weeks(year)
+
+    if not weeks:
+        return None, None, 0
+
+    old_weeks = {}
+    state = {'weeks': {}, 'members': {}}
+    if previous and previous[1].get('scoring', DEFAULT_STRATEGY) == scoring:
+        old_data, state = previous
+        old_weeks = {week['startDate']: week for week in old_data['weeks']}
+
+    # Impronta: messaggi della settimana e giorni su cui si fa la media
+    fingerprints = {
+        week_key: [len(week_msgs), week_days(datetime.strptime(week_key, '%Y-%m-%d'), year, now)]
+        for week_key, week_msgs in weeks
+    }
+    dirty = [(week_key, week_msgs) for week_key, week_msgs in weeks
+             if week_key not in old_weeks or state['weeks'].get(week_key) != fingerprints[week_key]]
+    scored = dict(zip((week_key for week_key, _ in dirty), score_weeks(dirty, year, now, scoring)))
 
-    return {
+    members = state['members']
+    pagelle_weeks = []
+    for week_key, _ in weeks:
+        old_week = old_weeks.get(week_key)
+        if week_key not in scored:
+            pagelle_weeks.append(old_week)
+            continue
+
+        week = scored[week_key]
+        patch_cumulative(members, week_key, old_week, week)
+        if week:
+            pagelle_weeks.append(week)
+
+    # Settimane che non ci sono più (solo se è cambiato l'export)
+    for week_key, old_week in old_weeks.items():
+        if week_key not in fingerprints:
+            patch_cumulative(members, week_key, old_week, None)
+
+    data = {
         'year': year,
         'weeks': pagelle_weeks,
-        'cumulative': cumulative_stats,
+        'cumulative': cumulative_ranking(members),
         'totalWeeks': len(pagelle_weeks),
-        'generatedAt': datetime.now().isoformat(),
+        'generatedAt': generated_at or now.isoformat(),
     }
+    return data, {'scoring': scoring, 'weeks': fingerprints, 'members': members}, len(dirty)
+
+
+def write_raw_messages(path, messages, fields, compact=False, chunk_size=1000):
+    """Scrive un file raw_messages_*.json senza costruire il payload in memoria.
+
+    L'array `messages` viene serializzato a blocchi di `chunk_size` messaggi
+    direttamente dai record del parser; gli altri `fields` seguono come con
+    json.dump. L'output è identico a json.dump(..., indent=2), oppure senza
+    spazi né indentazione con `compact`.
+    """
+    # Encoder C (senza indent); i dict dei messaggi sono piatti, quindi
+    # l'indentazione si può comporre a mano campo per campo
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+    if compact:
+        def message_json(msg):
+            return encode(msg.to_dict())
+        item_sep = ','
+    else:
+        def message_json(msg):
+            return '    {\n' + ',\n'.join(
+                f'      {encode(k)}: {encode(v)}' for k, v in msg.to_dict().items()
+            ) + '\n    }'
+        item_sep = ',\n'
+
+    with open_output(path) as f:
+        f.write('{"messages":' if compact else '{\n  "messages": ')
+        if not messages:
+            f.write('[]')
+        else:
+            f.write('[' if compact else '[\n')
+            for start in range(0, len(messages), chunk_size):
+                if start:
+                    f.write(item_sep)
+                f.write(item_sep.join(message_json(m) for m in messages[start:start + chunk_size]))
+            f.write(']' if compact else '\n  ]')
+
+        for key, value in fields.items():
+            if compact:
+                f.write(',' + encode(key) + ':' + encode(value))
+            else:
+                text = json.dumps(value, indent=2, ensure_ascii=False)
+                f.write(',\n  ' + encode(key) + ': ' + text.replace('\n', '\n  '))
+        f.write('}' if compact else '\n}')
+
+
+def load_previous_pagelle(path, state):
+    """(pagelle/{year}.json, stato) del run precedente, se il file è ancora
+    quello scritto allora (non sovrascritto per esempio da merge_pagelle.py)."""
+    if not state or not state.get('file') or not path.exists():
+        return None
+    if file_digest(path) != state['file']:
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f), state
+
+
+def process_year(index, year, all_years_stats, data_dir, compact=False, now=None, pagelle_state=None,
+                 scoring=DEFAULT_STRATEGY, profile=False, profile_memory=False):
+    """Genera e salva anni/{year}.json, pagelle/{year}.json (con gli shard) e raw_messages_{year}.json.
+
+    Con `now` (build riproducibile) è l'ora di riferimento della build e i
+    timestamp dei file sono quello dell'ultimo messaggio dell'anno.
+    `pagelle_state` è lo stato delle pagelle dell'anno salvato nel checkpoint,
+    `scoring` la strategia di voto delle pagelle. Con `profile` misura gli
+    stadi anni, pagelle e raw dell'anno (con `profile_memory` anche la memoria).
+
+    Restituisce (voce per anni-overview, voce per pagelle-overview, nuovo
+    stato delle pagelle, righe di log, record del profilo): può girare in un
+    processo separato, quindi non stampa niente.
+    """
+    log = [f"  {year}:"]
+    generated_at = index.cube.newest(year) if now else None
+    profiler = BuildProfile(profile, data_dir, profile_memory)
+    year_messages = index.year(year)
+
+    year_summary = None
+    with profiler.stage('anni', year) as stage:
+        stage['items'] = len(year_messages)
+        year_data = generate_year_data(index, year, all_years_stats, generated_at)
+        if year_data:
+            # Salva file anno
+            dump_json(data_dir / 'anni' / f'{year}.json', year_data)
+            log.append(f"    Salvato: anni/{year}.json ({year_data['stats']['totalMessages']} messaggi)")
+
+            year_summary = {
+                'year': year,
+                'totalMessages': year_data['stats']['totalMessages'],
+                'mvp': year_data['stats']['mvp'],
+                'trend': year_data['stats']['trend'],
+                'highlights': year_data['highlights'],
+            }
+
+    pagelle_entry = None
+    with profiler.stage('pagelle', year) as stage:
+        stage['items'] = len(year_messages)
+        pagelle_path = data_dir / 'pagelle' / f'{year}.json'
+        previous = load_previous_pagelle(pagelle_path, pagelle_state)
+        pagelle_data, pagelle_state, rescored = generate_pagelle_for_year(index, year, now, generated_at, previous,
+                                                                          scoring)
+        if pagelle_data and pagelle_data['weeks']:
+            # Salva pagelle anno
+            dump_json(pagelle_path, pagelle_data)
+            pagelle_state['file'] = file_digest(pagelle_path)
+            log.append(f"    Salvato: pagelle/{year}.json ({pagelle_data['totalWeeks']} settimane, "
+                       f"{rescored} ricalcolate)")
+
+            # Indice e shard per settimana per il caricamento progressivo
+            write_pagelle_shards(data_dir / 'pagelle', pagelle_data)
+            log.append(f"    Salvato: pagelle/shards/{year}/ (indice + {pagelle_data['totalWeeks']} settimane)")
+
+            # Top 3 per media voto
+            top3 = pagelle_data['cumulative'][:3] if pagelle_data['cumulative'] else []
+            pagelle_entry = {
+                'year': year,
+                'totalWeeks': pagelle_data['totalWeeks'],
+                'topPerformers': [{'name': p['name'], 'mediaVoto': p['mediaVoto']} for p in top3],
+            }
+
+    # Salva raw_messages dell'anno
+    with profiler.stage('raw', year) as stage:
+        stage['items'] = len(year_messages)
+        _, _, members_data = index.cube.analyze(year, generated_at)
+        write_raw_messages(data_dir / f'raw_messages_{year}.json', year_messages, {
+            'members': members_data,
+            'year': year,
+            'parsedAt': generated_at or datetime.now().isoformat(),
+        }, compact)
+        log.append(f"    Salvato: raw_messages_{year}.json ({len(year_messages)} messaggi)")
+
+    return year_summary, pagelle_entry, pagelle_state, log, profiler.stages
+
+
+def process_year_job(year_messages, year, all_years_stats, data_dir, compact, now, pagelle_state, scoring, profile,
+                     profile_memory):
+    """process_year in un processo del pool: ricostruisce l'indice del solo anno."""
+    return process_year(MessageIndex(year_messages), year, all_years_stats, data_dir, compact, now, pagelle_state,
+                        scoring, profile, profile_memory)
+
+
+def map_years(index, years, all_years_stats, data_dir, jobs=1, compact=False, now=None, pagelle_states=None,
+              scoring=DEFAULT_STRATEGY, profile=False, profile_memory=False):
+    """Esegue process_year per ogni anno, in parallelo se jobs > 1.
+
+    `pagelle_states` sono gli stati delle pagelle per anno (chiave stringa)
+    del run precedente. I risultati tornano nell'ordine di `years`.
+    """
+    pagelle_states = pagelle_states or {}
+    if jobs <= 1 or len(years) <= 1:
+        return [process_year(index, year, all_years_stats, data_dir, compact, now, pagelle_states.get(str(year)),
+                             scoring, profile, profile_memory)
+                for year in years]
+
+    # Anni più grossi per primi, per bilanciare il pool
+    order = sorted(years, key=index.count, reverse=True)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            year: pool.submit(process_year_job, index.year(year), year, all_years_stats, data_dir, compact, now,
+                              pagelle_states.get(str(year)), scoring, profile, profile_memory)
+            for year in order
+        }
+        return [futures[year].result() for year in years]
+
+
+def load_overview(path):
+    """Carica un file *-overview.json esistente indicizzato per anno."""
+    if not path.exists():
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return {entry['year']: entry for entry in json.load(f).get('years', [])}
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Uso: python parse_whatsapp.py <path_to_chat.txt>")
-        print("\nEsempio:")
-        print("  python parse_whatsapp.py ~/Downloads/Chat_WhatsApp.txt")
+    parser = argparse.ArgumentParser(
+        description='Parser per export chat WhatsApp.',
+        epilog='Esempio: python parse_whatsapp.py ~/Downloads/Chat_WhatsApp.txt',
+    )
+    parser.add_argument('chat_files', type=Path, nargs='+', metavar='chat_file',
+                        help='file .txt esportato da WhatsApp (più export della stessa chat vengono uniti)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='parsa solo i nuovi messaggi a partire dal checkpoint salvato')
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help='numero di processi per generare i file per anno (default: 1)')
+    parser.add_argument('--compact', action='store_true',
+                        help='scrive i raw_messages_*.json senza indentazione')
+    parser.add_argument('--sqlite', nargs='?', type=Path, const=DB_FILE, metavar='DB',
+                        help=f'carica i messaggi anche in un database SQLite con FTS5 (default: {DB_FILE.name})')
+    parser.add_argument('--reproducible', action='store_true',
+                        help="timestamp dei file dall'ultimo messaggio invece che dall'ora corrente")
+    parser.add_argument('--scoring', choices=sorted(STRATEGIES), default=DEFAULT_STRATEGY,
+                        help=f'strategia di voto delle pagelle (default: {DEFAULT_STRATEGY})')
+    parser.add_argument('--profile', nargs='?', type=Path, const=PROFILE_FILE, metavar='FILE',
+                        help='salva tempi, CPU e byte scritti per stadio in un report JSON '
+                             f'(default: {PROFILE_FILE.relative_to(PROFILE_FILE.parents[2])})')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='aggiunge al profilo il picco di memoria per stadio (tracemalloc: tempi più lenti, '
+                             'implica --profile)')
+    parser.add_argument('--cprofile', action='store_true',
+                        help='aggiunge al profilo le funzioni più costose (cProfile, implica --profile)')
+    parser.add_argument('--dedup-window', type=int, default=int(DEDUP_WINDOW.total_seconds() // 60),
+                        metavar='MINUTI', help='con più export, minuti entro cui cercare i messaggi doppi '
+                                               f'(default: {int(DEDUP_WINDOW.total_seconds() // 60)})')
+    args = parser.parse_args()
+
+    chat_files = args.chat_files
+    chat_file = chat_files[0] if len(chat_files) == 1 else None
+
+    for path in chat_files:
+        if not path.exists():
+            print(f"Errore: File non trovato: {path}")
+            sys.exit(1)
+    if np is None and args.scoring != DEFAULT_STRATEGY:
+        print(f"Errore: la strategia {args.scoring} richiede numpy")
         sys.exit(1)
 
-    chat_file = Path(sys.argv[1])
+    # Profilo per stadio (--profile) ed eventualmente per funzione (--cprofile)
+    started = time.perf_counter()
+    if (args.cprofile or args.profile_memory) and args.profile is None:
+        args.profile = PROFILE_FILE
+    profiler = BuildProfile(args.profile is not None, DATA_DIR, args.profile_memory)
+    function_profile = None
+    if args.cprofile:
+        function_profile = cProfile.Profile()
+        function_profile.enable()
 
-    if not chat_file.exists():
-        print(f"Errore: File non trovato: {chat_file}")
-        sys.exit(1)
+    # Crea directory
+    data_dir = DATA_DIR
+    data_dir.mkdir(exist_ok=True)
+    anni_dir = data_dir / 'anni'
+    anni_dir.mkdir(exist_ok=True)
 
-    print(f"Parsing {chat_file}...")
-    messages = parse_chat_file(chat_file)
-    print(f"Trovati {len(messages)} messaggi totali")
+    # Riconosce il formato di ogni export una volta sola
+    sniffs = []
+    for path in chat_files:
+        with open(path, 'rb') as f:
+            sniffs.append(sniff_dialect(f))
+        dialect, date_format = sniffs[-1]
+        name = f" di {path.name}" if chat_file is None else ''
+        if dialect:
+            print(f"Formato export{name}: {dialect.name} (date {date_format or 'miste'})")
+        else:
+            print(f"Formato export{name} non riconosciuto: provo tutti i formati riga per riga")
+    sniffed = sniffs[0]
+
+    # Anni da rigenerare (None = tutti)
+    dirty_years = None
+    result = None
+    # Offset e messaggi del checkpoint, per le velocità del profilo in incrementale
+    previous = (load_checkpoint(data_dir) or {}) if profiler.enabled and args.incremental else {}
+    with profiler.stage('parse') as parse_stage:
+        if args.incremental and chat_file is None:
+            print("Il parsing incrementale vale per un solo export: parsing completo.")
+        elif args.incremental:
+            print(f"Parsing incrementale {chat_file}...")
+            result = parse_chat_incremental(chat_file, data_dir, sniffed)
+            if result is None:
+                print("Checkpoint assente o non valido: parsing completo.")
+
+        if result:
+            messages, last_header, dirty_years = result
+            print(f"Trovati {len(messages)} messaggi totali (anni modificati: {sorted(dirty_years)})")
+        elif chat_file is None:
+            print(f"Unione di {len(chat_files)} export...")
+            merge_stats = {}
+            streams = [iter_chat_file(path, s) for path, s in zip(chat_files, sniffs)]
+            messages = list(merge_exports(streams, timedelta(minutes=args.dedup_window), merge_stats))
+            last_header = None
+            for path, read in zip(chat_files, merge_stats['read']):
+                print(f"  {path.name}: {read} messaggi")
+            print(f"Trovati {len(messages)} messaggi totali ({merge_stats['duplicates']} doppi scartati, "
+                  f"al massimo {merge_stats['peakWindow']} in memoria per il confronto)")
+        else:
+            print(f"Parsing {chat_file}...")
+            with open(chat_file, 'rb') as f:
+                messages, last_header = parse_chat_stream(f, sniffed=sniffed)
+            print(f"Trovati {len(messages)} messaggi totali")
+
+    if profiler.enabled:
+        # Righe e byte letti contati fuori dallo stadio, per non falsarne il tempo
+        offset, parsed_before = (previous.get('offset', 0), previous.get('totalMessages', 1) - 1) if result else (0, 0)
+        parse_stage['items'] = len(messages) - parsed_before
+        parse_stage['lines'] = parse_stage['inputBytes'] = 0
+        for path in chat_files:
+            lines, size = count_lines(path, offset)
+            parse_stage['lines'] += lines
+            parse_stage['inputBytes'] += size
 
     if not messages:
         print("Nessun messaggio trovato. Verifica il formato del file.")
         sys.exit(1)
 
-    # Trova tutti gli anni presenti
-    years = sorted(set(m['year'] for m in messages))
+    # Partiziona i messaggi per anno e settimana (un solo passaggio)
+    with profiler.stage('index') as stage:
+        stage['items'] = len(messages)
+        index = MessageIndex(messages)
+    years = index.years
     print(f"Anni trovati: {years}")
 
-    # Crea directory
-    data_dir = Path(__file__).parent.parent / 'data'
-    data_dir.mkdir(exist_ok=True)
-    anni_dir = data_dir / 'anni'
-    anni_dir.mkdir(exist_ok=True)
+    def is_dirty(year):
+        return dirty_years is None or year in dirty_years
+
+    # Build riproducibile: l'ora di riferimento è quella dell'ultimo messaggio
+    now = None
+    generated_at = None
+    if args.reproducible and index.messages:
+        generated_at = index.cube.newest()
+        now = datetime.fromisoformat(generated_at)
+
+    # Riepiloghi degli anni non modificati, dal run precedente
+    old_years_summary = load_overview(data_dir / 'anni-overview.json') if dirty_years else {}
+    old_pagelle_overview = load_overview(data_dir / 'pagelle-overview.json') if dirty_years else {}
+    # Settimane e somme cumulative delle pagelle del run precedente
+    old_pagelle_states = (load_checkpoint(data_dir) or {}).get('pagelle', {}) if dirty_years is not None else {}
 
     # Calcola stats per ogni anno (per i trend)
     all_years_stats = {}
     for year in years:
-        year_messages = [m for m in messages if m['year'] == year]
-        all_years_stats[year] = {'totalMessages': len(year_messages)}
+        all_years_stats[year] = {'totalMessages': index.count(year)}
 
     print("\n--- Generazione dati per anno ---")
-
-    # Genera JSON per ogni anno
-    years_summary = []
-    for year in years:
-        year_data = generate_year_data(messages, year, all_years_stats)
-        if year_data:
-            # Salva file anno
-            with open(anni_dir / f'{year}.json', 'w', encoding='utf-8') as f:
-                json.dump(year_data, f, indent=2, ensure_ascii=False)
-            print(f"  Salvato: anni/{year}.json ({year_data['stats']['totalMessages']} messaggi)")
-
-            years_summary.append({
-                'year': year,
-                'totalMessages': year_data['stats']['totalMessages'],
-                'mvp': year_data['stats']['mvp'],
-                'trend': year_data['stats']['trend'],
-                'highlights': year_data['highlights'],
-            })
-
-    # Salva overview anni
-    with open(data_dir / 'anni-overview.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            'years': years_summary,
-            'generatedAt': datetime.now().isoformat(),
-        }, f, indent=2, ensure_ascii=False)
-    print(f"Salvato: anni-overview.json")
-
-    # Genera pagelle per ogni anno
-    print("\n--- Generazione pagelle settimanali ---")
     pagelle_dir = data_dir / 'pagelle'
     pagelle_dir.mkdir(exist_ok=True)
 
+    # Anni da rigenerare: quelli modificati, quelli senza riepilogo precedente
+    # e quelli con pagelle calcolate con un'altra strategia
+    def same_scoring(year):
+        state = old_pagelle_states.get(str(year))
+        return state is None or state.get('scoring', DEFAULT_STRATEGY) == args.scoring
+
+    todo = [y for y in years if is_dirty(y) or y not in old_years_summary or not same_scoring(y)]
+    results = dict(zip(todo, map_years(index, todo, all_years_stats, data_dir, args.jobs, args.compact, now,
+                                       old_pagelle_states, args.scoring, profiler.enabled, profiler.memory)))
+
+    # Overview nell'ordine degli anni, qualunque sia l'ordine di completamento
+    years_summary = []
     pagelle_overview = []
+    pagelle_states = {}
     for year in years:
-        pagelle_data = generate_pagelle_for_year(messages, year)
-        if pagelle_data and pagelle_data['weeks']:
-            # Salva pagelle anno
-            with open(pagelle_dir / f'{year}.json', 'w', encoding='utf-8') as f:
-                json.dump(pagelle_data, f, indent=2, ensure_ascii=False)
-            print(f"  Salvato: pagelle/{year}.json ({pagelle_data['totalWeeks']} settimane)")
+        if year not in results:
+            years_summary.append(old_years_summary[year])
+            if year in old_pagelle_overview:
+                pagelle_overview.append(old_pagelle_overview[year])
+            if str(year) in old_pagelle_states:
+                pagelle_states[str(year)] = old_pagelle_states[str(year)]
+            continue
 
-            # Top 3 per media voto
-            top3 = pagelle_data['cumulative'][:3] if pagelle_data['cumulative'] else []
-            pagelle_overview.append({
-                'year': year,
-                'totalWeeks': pagelle_data['totalWeeks'],
-                'topPerformers': [{'name': p['name'], 'mediaVoto': p['mediaVoto']} for p in top3],
-            })
+        year_summary, pagelle_entry, pagelle_state, log, year_profile = results[year]
+        profiler.add(year_profile)
+        if pagelle_state:
+            pagelle_states[str(year)] = pagelle_state
+        for line in log:
+            print(line)
+        if year_summary:
+            years_summary.append(year_summary)
+        if pagelle_entry:
+            pagelle_overview.append(pagelle_entry)
+
+    # Overview di anni e pagelle
+    with profiler.stage('overview'):
+        # Salva overview anni
+        dump_json(data_dir / 'anni-overview.json', {
+            'years': years_summary,
+            'generatedAt': generated_at or datetime.now().isoformat(),
+        })
+        print(f"Salvato: anni-overview.json")
 
-    # Salva pagelle overview
-    with open(data_dir / 'pagelle-overview.json', 'w', encoding='utf-8') as f:
-        json.dump({
+        # Salva pagelle overview
+        dump_json(data_dir / 'pagelle-overview.json', {
             'years': pagelle_overview,
-            'generatedAt': datetime.now().isoformat(),
-        }, f, indent=2, ensure_ascii=False)
-    print(f"Salvato: pagelle-overview.json")
-
-    # Salva raw_messages per tutti gli anni
-    print("\n--- Salvataggio raw_messages per anno ---")
-    for year in years:
-        year_messages = [m for m in messages if m['year'] == year]
-        _, _, members_data = analyze_messages(year_messages)
-        with open(data_dir / f'raw_messages_{year}.json', 'w', encoding='utf-8') as f:
-            json.dump({
-                'messages': year_messages,
-                'members': members_data,
-                'year': year,
-                'parsedAt': datetime.now().isoformat(),
-            }, f, indent=2, ensure_ascii=False)
-        print(f"  Salvato: raw_messages_{year}.json ({len(year_messages)} messaggi)")
+            'generatedAt': generated_at or datetime.now().isoformat(),
+        })
+        print(f"Salvato: pagelle-overview.json")
 
     # Analizza anno corrente per stats e classifica
-    current_year = max(years)
-    messages_current = [m for m in messages if m['year'] == current_year]
-    stats, classifica, _ = analyze_messages(messages_current)
+    with profiler.stage('stats'):
+        current_year = max(years)
+        stats, classifica, _ = index.cube.analyze(current_year, index.cube.newest(current_year) if now else None)
+
+        # Salva stats.json (anno corrente)
+        dump_json(data_dir / 'stats.json', stats)
+        print(f"Salvato: stats.json ({current_year})")
 
-    # Salva stats.json (anno corrente)
-    with open(data_dir / 'stats.json', 'w', encoding='utf-8') as f:
-        json.dump(stats, f, indent=2, ensure_ascii=False)
-    print(f"Salvato: stats.json ({current_year})")
+        # Salva classifica.json (anno corrente)
+        dump_json(data_dir / 'classifica.json', classifica)
+        print(f"Salvato: classifica.json ({current_year})")
 
-    # Salva classifica.json (anno corrente)
-    with open(data_dir / 'classifica.json', 'w', encoding='utf-8') as f:
-        json.dump(classifica, f, indent=2, ensure_ascii=False)
-    print(f"Salvato: classifica.json ({current_year})")
+        # Salva il cubo di attività (base per nuove viste senza rileggere i messaggi)
+        dump_json(data_dir / CUBE_FILE, index.cube.to_json(), compact=True)
+        print(f"Salvato: {CUBE_FILE} ({len(index.cube.authors)} membri, {len(index.cube.months)} mesi)")
 
     # Analizza TUTTA la chat per profili membri e history
-    _, _, members_data_all = analyze_messages(messages)
+    with profiler.stage('raw_all') as stage:
+        stage['items'] = len(messages)
+        _, _, members_data_all = index.cube.analyze(generated_at=generated_at)
 
-    # Salva raw_messages_all.json (per profili e history)
-    with open(data_dir / 'raw_messages_all.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            'messages': messages,
+        # Salva raw_messages_all.json (per profili e history)
+        write_raw_messages(data_dir / 'raw_messages_all.json', messages, {
             'members': members_data_all,
             'totalMessages': len(messages),
             'dateRange': {
-                'from': messages[0]['timestamp'] if messages else None,
-                'to': messages[-1]['timestamp'] if messages else None,
+                'from': messages[0].iso if messages else None,
+                'to': messages[-1].iso if messages else None,
             },
-            'parsedAt': datetime.now().isoformat(),
-        }, f, indent=2, ensure_ascii=False)
-    print(f"Salvato: raw_messages_all.json ({len(messages)} messaggi totali)")
+            'parsedAt': generated_at or datetime.now().isoformat(),
+        }, args.compact)
+        print(f"Salvato: raw_messages_all.json ({len(messages)} messaggi totali)")
+
+    # Archivio NDJSON per mese (in incrementale solo gli shard degli anni modificati)
+    with profiler.stage('archive') as stage:
+        stage['items'] = len(messages)
+        archive = write_archive(data_dir / 'archive', index.messages, dirty_years, generated_at)
+        print(f"Salvato: archive/ ({len(archive['shards'])} shard, "
+              f"{archive['totalBytes'] // 1024} KB, {archive['totalGzipBytes'] // 1024} KB compressi)")
+
+    # Database SQLite per le ricerche (in incrementale solo gli anni modificati)
+    if args.sqlite:
+        with profiler.stage('sqlite') as stage:
+            stage['items'] = len(index.messages)
+            total = write_database(args.sqlite, index.messages, dirty_years)
+            print(f"Salvato: {args.sqlite.name} ({total} messaggi, ricerca con scripts/message_db.py)")
+
+    # Checkpoint per il prossimo parsing incrementale
+    with profiler.stage('manifest'):
+        save_checkpoint(data_dir, chat_file or chat_files, messages, last_header, pagelle_states)
+        if last_header is None:
+            print(f"Salvato: {CHECKPOINT_FILE} (export uniti: niente parsing incrementale)")
+        else:
+            print(f"Salvato: {CHECKPOINT_FILE} (offset {last_header})")
+
+        # Hash del contenuto di data/ (tranne il checkpoint, che serve solo al parser)
+        build_manifest, changed = write_build_manifest(data_dir, [CHECKPOINT_FILE], generated_at or datetime.now().isoformat())
+        print(f"Salvato: build-manifest.json ({len(changed)} file cambiati su {build_manifest['totalFiles']})")
 
     # Riepilogo
     print("\n--- Riepilogo 2026 ---")
@@ -659,6 +1748,26 @@ def main():
         trend_str = f" ({'+' if ys['trend'] and ys['trend'] > 0 else ''}{ys['trend']}%)" if ys['trend'] else ""
         print(f"  {ys['year']}: {ys['totalMessages']} messaggi{trend_str} - MVP: {ys['mvp'].split()[0]}")
 
+    if profiler.enabled:
+        if function_profile is not None:
+            function_profile.disable()
+        report = profiler.report(
+            time.perf_counter() - started, function_profile,
+            messages=len(messages),
+            lastMessage=messages[-1].iso,
+            years=len(years),
+            jobs=args.jobs,
+            incremental=dirty_years is not None,
+        )
+        write_report(args.profile, report)
+        print(f"\n--- Profilo ({report['wallSeconds']:.2f} s) ---")
+        print_summary(report)
+        if function_profile is not None:
+            # Dump completo per snakeviz/pstats accanto al report
+            function_profile.dump_stats(args.profile.with_suffix('.prof'))
+            print(f"Dump cProfile: {args.profile.with_suffix('.prof')}")
+        print(f"Profilo salvato: {args.profile}")
+
 
 if __name__ == '__main__':
     main()
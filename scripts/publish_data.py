@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Prepara il sito statico per la pubblicazione in dist/.
+
+Copia pagine, JS, CSS e immagini; dei file di data/ pubblica solo quelli che
+le pagine scaricano (build_outputs.PAGE_FILES e gli shard settimanali delle
+pagelle), minificati (JSON senza indentazione). Il resto di data/ (messaggi
+raw, archivio, cubo di attività, riepiloghi, file degli agenti) non esce dal
+repository. Ogni file di testo ha accanto le versioni .gz e .br
+precompresse, da servire con gzip_static/brotli_static o equivalenti.
+
+In dist/data/bundles/ mette un bundle per pagina (es. classifica-2025.json
+con anni/2025.json, stats.json e classifica.json) così ogni pagina scarica
+i suoi dati con una richiesta sola; dist/data/build-manifest.json ha gli
+hash dei file pubblicati, bundle compresi. Le versioni dei file che le pagine
+scaricano (vedi build_outputs.PAGE_FILES) sono scritte direttamente in ogni
+pagina HTML, così la prima richiesta di dati non aspetta nessun manifest.
+
+Uso:
+    python publish_data.py [--out DIR] [--top N]
+
+Senza il modulo `brotli` i .br vengono saltati.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+from build_outputs import (MANIFEST_FILE, PAGE_FILES, VERSIONS_FILE, page_versions, write_build_manifest,
+                           write_bytes_if_changed)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = Path(__file__).parent.parent
+DATA_DIR = ROOT_DIR / 'data'
+DIST_DIR = ROOT_DIR / 'dist'
+
+# Parti del sito copiate così come sono (i dati passano dalla minificazione)
+SITE_FILES = ['index.html', 'pages', 'js', 'css', 'img']
+
+# File di data/ pubblicati: quelli scaricati dalle pagine e gli shard
+# settimanali delle pagelle (caricati da pagelle.js a richiesta)
+PUBLIC_FILES = re.compile(rf'{PAGE_FILES.pattern}|pagelle/shards/\d{{4}}/[^/]+\.json')
+# File del sito da non copiare
+PRIVATE_SUFFIXES = ('.tmp', ':Zone.Identifier')
+
+# Script di main.js nelle pagine: le versioni dei dati vanno prima di lui
+MAIN_SCRIPT = re.compile(r'<script src="(?:\.\./)?js/main\.js"></script>')
+
+# Estensioni da precomprimere
+TEXT_SUFFIXES = {'.json', '.html', '.js', '.css', '.svg', '.txt'}
+
+
+def minify(name, payload):
+    """JSON senza spazi; gli altri file restano com'erano."""
+    if not name.endswith('.json'):
+        return payload
+    data = json.loads(payload)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def compress(path, payload, changed):
+    """Scrive .gz e .br accanto a `path`; restituisce le loro dimensioni.
+
+    Se `path` non è cambiato e le versioni compresse ci sono già, non le
+    ricalcola (il brotli al massimo livello è lento sui file grossi).
+    """
+    sizes = {}
+    variants = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+    for suffix, encode in variants:
+        target = path.with_name(path.name + suffix)
+        if changed or not target.exists():
+            write_bytes_if_changed(target, encode(payload))
+        sizes[suffix] = target.stat().st_size
+    return sizes
+
+
+def page_bundles(data):
+    """Bundle per pagina: {nome: [file di data/ che contiene]}.
+
+    `data` sono i file di data/ già caricati, indicizzati per nome relativo.
+    """
+    bundles = {}
+    years = sorted(name[len('anni/'):-len('.json')] for name in data
+                   if name.startswith('anni/') and name.count('/') == 1)
+
+    # classifica.js: l'anno scelto, con stats/classifica per il fallback
+    common = [name for name in ('stats.json', 'classifica.json') if name in data]
+    for year in years:
+        bundles[f'classifica-{year}'] = [f'anni/{year}.json'] + common
+    if common:
+        bundles['classifica-all'] = common
+
+    # best-of.js: best-of.json e i bestOf di tutti gli anni
+    bundles['best-of'] = [name for name in ['best-of.json'] if name in data] + [f'anni/{year}.json' for year in years]
+
+    # pagelle.js: indice dell'anno e la settimana mostrata per prima (l'ultima)
+    for name in data:
+        parts = name.split('/')
+        if len(parts) == 4 and parts[:2] == ['pagelle', 'shards'] and parts[3] == 'index.json':
+            files = [name]
+            weeks = data[name].get('weeks', [])
+            if weeks and f"pagelle/{weeks[-1]['file']}" in data:
+                files.append(f"pagelle/{weeks[-1]['file']}")
+            bundles[f'pagelle-{parts[2]}'] = files
+
+    return {bundle: files for bundle, files in bundles.items() if files}
+
+
+def inline_versions(html, versions):
+    """La pagina con window.DATA_VERSIONS prima di main.js (invariata se main.js non c'è)."""
+    script = f'<script>window.DATA_VERSIONS = {json.dumps(versions, separators=(",", ":"))};</script>\n    '
+    return MAIN_SCRIPT.sub(lambda match: script + match.group(0), html.decode('utf-8'), count=1).encode('utf-8')
+
+
+def format_size(size):
+    if size >= 1024 * 1024:
+        return f'{size / (1024 * 1024):.1f} MB'
+    if size >= 1024:
+        return f'{size / 1024:.1f} KB'
+    return f'{size} B'
+
+
+def publish(out_dir, top=30):
+    """Scrive il sito in `out_dir` e stampa il risparmio per file."""
+    out_dir = Path(out_dir)
+    out_data = out_dir / 'data'
+    out_data.mkdir(parents=True, exist_ok=True)
+    written = set()
+
+    def emit(target, payload):
+        """Scrive un file pubblicato (e le versioni compresse se è testo)."""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        changed = write_bytes_if_changed(target, payload)
+        written.add(target)
+        sizes = {}
+        if target.suffix in TEXT_SUFFIXES:
+            sizes = compress(target, payload, changed)
+            written.update(target.with_name(target.name + suffix) for suffix in sizes)
+        return sizes
+
+    # JS, CSS, immagini; le pagine HTML dopo i dati, per scriverci le versioni
+    pages = []
+    for entry in SITE_FILES:
+        source = ROOT_DIR / entry
+        paths = [source] if source.is_file() else sorted(p for p in source.rglob('*') if p.is_file())
+        for path in paths:
+            if path.name.endswith(PRIVATE_SUFFIXES):
+                continue
+            if path.suffix == '.html':
+                pages.append(path)
+                continue
+            emit(out_dir / path.relative_to(ROOT_DIR), path.read_bytes())
+
+    # Dati scaricati dalle pagine: minificati e precompressi
+    report = []
+    loaded = {}
+    hashes = {}
+    for path in sorted(DATA_DIR.rglob('*.json')):
+        name = path.relative_to(DATA_DIR).as_posix()
+        if not PUBLIC_FILES.fullmatch(name):
+            continue
+        payload = path.read_bytes()
+        minified = minify(name, payload)
+        if name.endswith('.json'):
+            loaded[name] = json.loads(minified)
+        sizes = emit(out_data / name, minified)
+        hashes[name] = hashlib.sha256(minified).hexdigest()
+        report.append((name, len(payload), len(minified), sizes.get('.gz'), sizes.get('.br')))
+
+    # Bundle per pagina
+    for bundle, files in page_bundles(loaded).items():
+        payload = json.dumps(
+            {'bundle': bundle, 'files': {name: loaded[name] for name in files}},
+            ensure_ascii=False, separators=(',', ':'),
+        ).encode('utf-8')
+        sizes = emit(out_data / 'bundles' / f'{bundle}.json', payload)
+        hashes[f'bundles/{bundle}.json'] = hashlib.sha256(payload).hexdigest()
+        report.append((f'bundles/{bundle}.json', None, len(payload), sizes.get('.gz'), sizes.get('.br')))
+
+    # Pagine con le versioni dei dati che scaricano
+    versions = page_versions(hashes)
+    for path in pages:
+        emit(out_dir / path.relative_to(ROOT_DIR), inline_versions(path.read_bytes(), versions))
+
+    # File pubblicati in precedenza che non esistono più (solo nelle parti gestite qui)
+    managed = [out_dir / entry for entry in SITE_FILES] + [out_data]
+    for root in managed:
+        if not root.is_dir():
+            continue
+        for path in sorted(root.rglob('*'), reverse=True):
+            if path.is_file() and path not in written and path not in (out_data / MANIFEST_FILE,
+                                                                         out_data / VERSIONS_FILE):
+                path.unlink()
+            elif path.is_dir() and not any(path.iterdir()):
+                path.rmdir()
+
+    # Manifest degli hash dei file pubblicati (senza le versioni compresse)
+    manifest, changed = write_build_manifest(out_data, exclude=[
+        p.relative_to(out_data).as_posix() for p in written
+        if p.suffix in ('.gz', '.br') and p.is_relative_to(out_data)
+    ])
+
+    print_report(report, top)
+    print(f"\nPubblicato in {out_dir}: {manifest['totalFiles']} file di dati, {len(changed)} cambiati")
+    if brotli is None:
+        print("Modulo brotli non installato: .br non generati (pip install brotli)")
+
+
+def print_report(report, top):
+    """Dimensioni per file (originale, minificato, gzip, brotli) e totali."""
+    def pct(size, base):
+        return f'{100 - size * 100 / base:5.1f}%' if size is not None and base else '    -'
+
+    rows = sorted(report, key=lambda r: -(r[1] or r[2]))
+    shown = rows if not top else rows[:top]
+    print(f"{'file':<44} {'originale':>10} {'minificato':>11} {'gzip':>10} {'brotli':>10} {'risparmio':>9}")
+    for name, original, minified, gz, br in shown:
+        base = original or minified
+        best = min(size for size in (minified, gz, br) if size is not None)
+        print(f"{name:<44} {format_size(original) if original else '-':>10} {format_size(minified):>11} "
+              f"{format_size(gz) if gz else '-':>10} {format_size(br) if br else '-':>10} {pct(best, base):>9}")
+    if len(rows) > len(shown):
+        print(f"... altri {len(rows) - len(shown)} file (--top 0 per vederli tutti)")
+
+    data_rows = [r for r in report if r[1] is not None]
+    original = sum(r[1] for r in data_rows)
+    minified = sum(r[2] for r in data_rows)
+    gz = sum(r[3] or r[2] for r in data_rows)
+    print(f"\nTotale dati: {format_size(original)} -> minificati {format_size(minified)} ({pct(minified, original).strip()}), "
+          f"gzip {format_size(gz)} ({pct(gz, original).strip()})", end='')
+    if brotli is not None:
+        br = sum(r[4] or r[2] for r in data_rows)
+        print(f", brotli {format_size(br)} ({pct(br, original).strip()})", end='')
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prepara il sito con dati minificati e precompressi.')
+    parser.add_argument('--out', type=Path, default=DIST_DIR, help=f'cartella di output (default: {DIST_DIR.name}/)')
+    parser.add_argument('--top', type=int, default=30, metavar='N',
+                        help='file mostrati nel report, dal più grande (0 = tutti)')
+    args = parser.parse_args()
+
+    if not DATA_DIR.exists():
+        print(f"Cartella dati non trovata: {DATA_DIR}")
+        sys.exit(1)
+    if args.out.resolve() in (ROOT_DIR.resolve(), DATA_DIR.resolve()):
+        print("La cartella di output deve essere diversa dal sito sorgente")
+        sys.exit(1)
+
+    publish(args.out, args.top)
+
+
+if __name__ == '__main__':
+    main()
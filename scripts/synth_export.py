@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Genera export WhatsApp sintetici per benchmark e prove del parser.
+
+L'export ha la forma di quelli veri nei tre dialetti riconosciuti da
+parse_whatsapp.py (us, it, ios): nomi e soprannomi di NAME_MAP più qualche
+contatto sconosciuto, attività concentrata di sera e nei weekend, messaggi
+su più righe, messaggi di sistema, media omessi e messaggi eliminati. Con lo
+stesso seed il file è identico byte per byte.
+
+Uso:
+    python synth_export.py N [--format us|it|ios] [--seed S] [--from ANNO] [--to ANNO] [-o FILE]
+
+N accetta i suffissi k e M (es. 100k, 1M, 10M). Senza -o scrive su stdout.
+"""
+
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+
+from parse_whatsapp import NAME_MAP
+
+# Peso di ogni membro (i soprannomi di uno stesso membro si dividono il suo peso)
+MEMBER_WEIGHTS = {
+    'Adriano Sergio Lorenzo Facchini': 30,
+    'Alessio Macalùso': 16,
+    'Cosimo Nenciòni': 14,
+    'Federico Ceccuzzi': 12,
+    'Alessio Valentini': 10,
+    'Giacomo Dolfi': 10,
+    'Fausto Petrini': 8,
+}
+
+# Contatti non in rubrica e membri di passaggio, non normalizzati dal parser
+OTHER_AUTHORS = {'+39 333 123 4567': 1, 'Marco': 1}
+
+# Attività relativa per ora del giorno (0-23) e giorno della settimana (lun-dom)
+HOUR_WEIGHTS = [3, 2, 1, 1, 1, 1, 2, 5, 8, 8, 9, 10, 12, 14, 11, 9, 9, 10, 13, 16, 18, 19, 15, 8]
+WEEKDAY_WEIGHTS = [10, 10, 11, 12, 15, 14, 9]
+
+WORDS = (
+    'ciao raga stasera poker chi viene io ci sono birra partita carte fiches tombino bollore '
+    'dai no sì ok boh vabbè domani sabato casa mia tua piatto buio rilancio all-in scala colore '
+    'full doppia coppia regà oh bella ragazzi grande mitico che schifo ahahah madonna pizza '
+    'alle nove dieci porto io le patatine chi ha vinto ieri notte torneo buy-in'
+).split()
+EMOJI = ['😂', '🤣', '👍', '🔥', '🃏', '🍺', '😅', '🙏', '💪', '😎']
+
+# Segnaposto e messaggi di sistema di ciascun dialetto
+PLACEHOLDERS = {
+    'us': {'media': '<Media omitted>', 'deleted': '<This message was deleted>',
+           'added': '{a} added {b}', 'left': '{a} left', 'changed': '{a} changed the group description',
+           'encrypted': 'Messages and calls are end-to-end encrypted. No one outside of this chat, '
+                        'not even WhatsApp, can read or listen to them. Tap to learn more.'},
+    'it': {'media': '<Media omessi>', 'deleted': '<Questo messaggio è stato eliminato>',
+           'added': '{a} ha aggiunto {b}', 'left': '{a} è uscito', 'changed': '{a} ha cambiato la descrizione del gruppo',
+           'encrypted': 'I messaggi e le chiamate sono protetti con la crittografia end-to-end. Nessuno al di '
+                        'fuori di questa chat, nemmeno WhatsApp, può leggerli o ascoltarli.'},
+    'ios': {'media': '‎image omitted', 'deleted': '‎<Questo messaggio è stato eliminato>',
+            'added': '‎{a} ha aggiunto {b}', 'left': '‎{a} è uscito',
+            'changed': '‎{a} ha cambiato la descrizione del gruppo',
+            'encrypted': '‎I messaggi e le chiamate sono protetti con la crittografia end-to-end.'},
+}
+GROUP_NAME = 'Poker del giovedì'
+
+FORMATS = sorted(PLACEHOLDERS)
+
+
+def parse_count(value):
+    """'10k' -> 10000, '1M' -> 1000000."""
+    value = value.strip()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(value[-1:].lower(), 1)
+    return int(float(value[:-1] if scale > 1 else value) * scale)
+
+
+def authors():
+    """(nomi come compaiono nell'export, pesi)."""
+    variants = {}
+    for alias, name in NAME_MAP.items():
+        variants.setdefault(name, []).append(alias)
+    names, weights = [], []
+    for name, weight in MEMBER_WEIGHTS.items():
+        aliases = variants.get(name, [name])
+        for alias in aliases:
+            names.append(alias)
+            weights.append(weight / len(aliases))
+    for name, weight in OTHER_AUTHORS.items():
+        names.append(name)
+        weights.append(weight)
+    return names, weights
+
+
+def header(fmt, t):
+    """Intestazione di una riga nel formato del dialetto."""
+    if fmt == 'us':
+        hour = t.hour % 12 or 12
+        return f"{t.month}/{t.day}/{t.strftime('%y')}, {hour}:{t.minute:02d} {'AM' if t.hour < 12 else 'PM'} - "
+    if fmt == 'it':
+        return f"{t.strftime('%d/%m/%y, %H:%M')} - "
+    return f"[{t.strftime('%d/%m/%y, %H:%M:%S')}] "
+
+
+def line(fmt, t, author, text):
+    if fmt == 'ios' and text.startswith('‎'):
+        # Negli export iOS le righe degli allegati iniziano con un LRM
+        return f"‎{header(fmt, t)}{author}: {text}"
+    return f"{header(fmt, t)}{author}: {text}"
+
+
+def system_line(fmt, t, text):
+    # iOS attribuisce i messaggi di sistema al gruppo
+    if fmt == 'ios':
+        return f"{header(fmt, t)}{GROUP_NAME}: {text}"
+    return f"{header(fmt, t)}{text}"
+
+
+def sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(1, 14))
+    text = ' '.join(words)
+    if rng.random() < 0.2:
+        text += ' ' + rng.choice(EMOJI)
+    if rng.random() < 0.15:
+        text = text[0].upper() + text[1:] + rng.choice(['?', '!', '...'])
+    return text
+
+
+def generate(n, fmt='us', seed=1, first_year=2013, last_year=2026):
+    """Righe di un export con circa `n` messaggi degli utenti (generatore).
+
+    I timestamp avanzano con intervalli esponenziali pesati per ora e giorno
+    della settimana, in modo da coprire all'incirca `first_year`-`last_year`.
+    """
+    rng = random.Random(seed)
+    texts = PLACEHOLDERS[fmt]
+    names, weights = authors()
+    start = datetime(first_year, 1, 1, 9, 0)
+    span = (datetime(last_year, 12, 31, 23, 0) - start).total_seconds()
+    mean_gap = span / max(n, 1)
+    peak = max(HOUR_WEIGHTS) * max(WEEKDAY_WEIGHTS)
+    # Frazione media di tempo "attivo": corregge l'intervallo per restare nel periodo
+    activity = sum(h * d for h in HOUR_WEIGHTS for d in WEEKDAY_WEIGHTS) / (24 * 7 * peak)
+
+    t = start
+    yield system_line(fmt, t, texts['encrypted'])
+    yield system_line(fmt, t, texts['added'].format(a=names[0], b=names[1]))
+
+    for _ in range(n):
+        # Nelle ore morte i messaggi si diradano
+        while True:
+            t += timedelta(seconds=rng.expovariate(1 / (mean_gap * activity)))
+            if rng.random() * peak < HOUR_WEIGHTS[t.hour] * WEEKDAY_WEIGHTS[t.weekday()]:
+                break
+        t = t.replace(microsecond=0)
+        author = rng.choices(names, weights)[0]
+
+        r = rng.random()
+        if r < 0.01:
+            other = rng.choice(names)
+            kind = rng.choice(['added', 'left', 'changed'])
+            yield system_line(fmt, t, texts[kind].format(a=author, b=other))
+            continue
+        if r < 0.05:
+            yield line(fmt, t, author, texts['media'])
+        elif r < 0.06:
+            yield line(fmt, t, author, texts['deleted'])
+        else:
+            yield line(fmt, t, author, sentence(rng))
+            # Messaggi su più righe, a volte con una riga vuota in mezzo
+            if r > 0.97:
+                for _ in range(rng.randint(1, 3)):
+                    if rng.random() < 0.2:
+                        yield ''
+                    yield sentence(rng)
+
+
+def write_export(path_or_file, n, fmt='us', seed=1, first_year=2013, last_year=2026, chunk_size=10_000):
+    """Scrive l'export in un file (percorso o file aperto in testo); restituisce le righe scritte."""
+    own = not hasattr(path_or_file, 'write')
+    f = open(path_or_file, 'w', encoding='utf-8', newline='\n') if own else path_or_file
+    try:
+        count = 0
+        chunk = []
+        for text in generate(n, fmt, seed, first_year, last_year):
+            chunk.append(text)
+            if len(chunk) >= chunk_size:
+                f.write('\n'.join(chunk) + '\n')
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            f.write('\n'.join(chunk) + '\n')
+            count += len(chunk)
+        return count
+    finally:
+        if own:
+            f.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera un export WhatsApp sintetico.')
+    parser.add_argument('messages', type=parse_count, help='numero di messaggi (es. 10k, 1M)')
+    parser.add_argument('--format', choices=FORMATS, default='us', help='dialetto (default: us)')
+    parser.add_argument('--seed', type=int, default=1, help='seed del generatore (default: 1)')
+    parser.add_argument('--from', dest='first_year', type=int, default=2013, help='primo anno (default: 2013)')
+    parser.add_argument('--to', dest='last_year', type=int, default=2026, help='ultimo anno (default: 2026)')
+    parser.add_argument('-o', '--output', help='file di output (default: stdout)')
+    args = parser.parse_args()
+
+    if args.last_year < args.first_year:
+        parser.error('--to deve essere successivo a --from')
+
+    lines = write_export(args.output or sys.stdout, args.messages, args.format, args.seed,
+                         args.first_year, args.last_year)
+    if args.output:
+        print(f"Scritte {lines} righe in {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
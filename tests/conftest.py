@@ -0,0 +1,64 @@
+"""
+Fixture comuni: export WhatsApp sintetico e parser lanciato in cartelle
+temporanee, così i test non toccano data/.
+"""
+
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+import parse_whatsapp  # noqa: E402
+from synth_export import write_export  # noqa: E402
+
+# Inizio di un messaggio nel dialetto us di synth_export
+HEADER = re.compile(r'\d{1,2}/\d{1,2}/\d{2}, \d{1,2}:\d{2}\s?[AP]M - ')
+
+
+@pytest.fixture(scope='session')
+def synth_export(tmp_path_factory):
+    """Export sintetico di 3000 messaggi dal 2019 al 2022."""
+    path = tmp_path_factory.mktemp('export') / 'chat.txt'
+    write_export(path, 3000, first_year=2019, last_year=2022)
+    return path
+
+
+@pytest.fixture
+def split_export(synth_export):
+    """Righe dell'export e funzione che trova il primo inizio di messaggio da una frazione del file."""
+    lines = synth_export.read_text(encoding='utf-8').splitlines(keepends=True)
+
+    def boundary(fraction):
+        i = int(len(lines) * fraction)
+        while not HEADER.match(lines[i]):
+            i += 1
+        return i
+
+    return lines, boundary
+
+
+@pytest.fixture
+def run_parse(monkeypatch):
+    """parse_whatsapp.main() con gli argomenti dati e data/ in `data_dir` (output riproducibile)."""
+    def run(data_dir, *args):
+        data_dir.mkdir(parents=True, exist_ok=True)
+        monkeypatch.setattr(parse_whatsapp, 'DATA_DIR', data_dir)
+        monkeypatch.setattr(sys, 'argv', ['parse_whatsapp.py', *map(str, args), '--reproducible'])
+        parse_whatsapp.main()
+        return data_dir
+    return run
+
+
+@pytest.fixture
+def read_tree():
+    """{percorso relativo: contenuto} dei file di una cartella di dati, checkpoint escluso."""
+    def read(data_dir):
+        return {
+            path.relative_to(data_dir).as_posix(): path.read_bytes()
+            for path in sorted(data_dir.rglob('*'))
+            if path.is_file() and path.name != parse_whatsapp.CHECKPOINT_FILE
+        }
+    return read
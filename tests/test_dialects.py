@@ -0,0 +1,37 @@
+"""Ordine giorno/mese degli export 24h quando le prime righe non lo decidono."""
+
+from datetime import datetime
+
+import pytest
+
+from parse_whatsapp import DIALECT_SAMPLE_LINES, parse_chat_file
+
+
+def ambiguous_lines():
+    """Più di DIALECT_SAMPLE_LINES intestazioni 24h con giorno e mese entrambi ≤ 12."""
+    lines = []
+    for first in range(1, 13):
+        for second in range(1, 13):
+            for hour in range(18, 22):
+                lines.append(f'{first:02d}/{second:02d}/21, {hour}:00 - Cosimo: ciao')
+    assert len(lines) > DIALECT_SAMPLE_LINES
+    return lines
+
+
+@pytest.mark.parametrize('settling, expected', [
+    # Un 13 nella prima posizione decide giorno/mese per tutto il file
+    ('13/12/21, 21:00 - Cosimo: ok', datetime(2021, 3, 5, 18)),
+    # Un 13 nella seconda decide mese/giorno
+    ('12/13/21, 21:00 - Cosimo: ok', datetime(2021, 5, 3, 18)),
+    # Nessuna data decisiva: mese/giorno come il parsing storico
+    (None, datetime(2021, 5, 3, 18)),
+])
+def test_date_order_settled_after_sample(tmp_path, settling, expected):
+    lines = ambiguous_lines() + ([settling] if settling else [])
+    path = tmp_path / 'chat.txt'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+    messages = parse_chat_file(path)
+    assert len(messages) == len(lines)
+    # 05/03/21 18:00 è nelle prime righe del campione
+    assert messages[(5 - 1) * 48 + (3 - 1) * 4].timestamp == expected
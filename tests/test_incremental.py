@@ -0,0 +1,14 @@
+"""Build incrementale dal checkpoint contro il build completo."""
+
+
+def test_incremental_equals_full(tmp_path, synth_export, split_export, run_parse, read_tree):
+    full = run_parse(tmp_path / 'full', synth_export)
+
+    lines, boundary = split_export
+    chat = tmp_path / 'chat.txt'
+    chat.write_text(''.join(lines[:boundary(0.8)]), encoding='utf-8')
+    incremental = run_parse(tmp_path / 'incremental', chat)
+    chat.write_text(''.join(lines), encoding='utf-8')
+    run_parse(incremental, chat, '--incremental')
+
+    assert read_tree(incremental) == read_tree(full)
@@ -0,0 +1,23 @@
+"""Settimane per anno ISO: stesso risultato con l'archivio e dai file raw."""
+
+from list_weeks_with_messages import count_weeks_from_index, count_weeks_from_raw
+from message_archive import load_week_index
+
+
+def test_raw_fallback_matches_index(tmp_path, monkeypatch, synth_export, run_parse):
+    data_dir = run_parse(tmp_path / 'data', synth_export)
+    monkeypatch.chdir(tmp_path)
+
+    # L'export va dal 2019 al 2022: il 2020 ha la W53 che finisce il 3 gennaio
+    # 2021, il 2021 inizia il 4 gennaio e finisce il 2 gennaio 2022
+    for year in (2019, 2020, 2021, 2022):
+        by_index = count_weeks_from_index(load_week_index(data_dir / 'archive', year))
+        by_raw = count_weeks_from_raw(year)
+        assert dict(by_raw[0]) == by_index[0]
+        assert by_raw[1] == by_index[1]
+    assert 53 in count_weeks_from_raw(2020)[0]
+
+    # Senza i file per anno si legge raw_messages_all.json
+    for path in data_dir.glob('raw_messages_20*.json'):
+        path.unlink()
+    assert dict(count_weeks_from_raw(2021)[0]) == count_weeks_from_index(load_week_index(data_dir / 'archive', 2021))[0]
@@ -0,0 +1,29 @@
+"""Unione di export sovrapposti della stessa chat."""
+
+from datetime import datetime
+
+from parse_whatsapp import Message, merge_exports
+
+
+def test_overlapping_exports_equal_single_export(tmp_path, synth_export, split_export, run_parse, read_tree):
+    full = run_parse(tmp_path / 'full', synth_export)
+
+    lines, boundary = split_export
+    first, second = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    first.write_text(''.join(lines[:boundary(0.7)]), encoding='utf-8')
+    second.write_text(''.join(lines[boundary(0.4):]), encoding='utf-8')
+    merged = run_parse(tmp_path / 'merged', first, second)
+
+    assert read_tree(merged) == read_tree(full)
+
+
+def test_merge_keeps_repeated_messages_of_one_export():
+    def stream(*minutes):
+        return [Message(datetime(2021, 3, 1, 21, minute), 'Cosimo Nenciòni', 'ok', '3/1/21', f'9:{minute:02d} PM')
+                for minute in minutes]
+
+    stats = {}
+    merged = list(merge_exports([stream(0, 0, 5), stream(0, 5, 30)], stats=stats))
+    # Lo stesso messaggio scritto due volte resta doppio; i doppioni tra export no
+    assert [msg.timestamp.minute for msg in merged] == [0, 0, 5, 30]
+    assert stats['duplicates'] == 2
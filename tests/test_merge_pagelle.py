@@ -0,0 +1,64 @@
+"""Merge delle pagelle: l'aggiornamento dalla cache dà lo stesso risultato di un merge da zero."""
+
+import json
+from datetime import date
+
+import merge_pagelle
+from build_outputs import dump_json
+
+
+def test_cached_merge_equals_full_merge(tmp_path, monkeypatch, synth_export, run_parse):
+    data_dir = run_parse(tmp_path / 'data', synth_export)
+    with open(data_dir / 'pagelle' / '2021.json', 'r', encoding='utf-8') as f:
+        weeks = json.load(f)['weeks']
+
+    # Una settimana per file, come le scrive l'agente
+    pagelle_dir = tmp_path / 'pagelle'
+    (pagelle_dir / '2021').mkdir(parents=True)
+    for week in weeks:
+        number = date.fromisoformat(week['startDate']).isocalendar()[1]
+        dump_json(pagelle_dir / '2021' / f'week-{number:02d}.json', week)
+    monkeypatch.setattr(merge_pagelle, 'PAGELLE_DIR', pagelle_dir)
+    monkeypatch.setattr(merge_pagelle, 'CACHE_DIR', tmp_path / 'cache')
+
+    merge_pagelle.merge_year(2021)
+    first = sorted((pagelle_dir / '2021').glob('week-*.json'))[0]
+    week = json.loads(first.read_text(encoding='utf-8'))
+    # Voto diverso e file più lungo: la cache non può scambiarlo per quello di prima
+    week['pagelle'][0]['voto'] = 4.0 if week['pagelle'][0]['voto'] != 4.0 else 9.5
+    week['pagelle'][0]['highlights'] = ['rigenerata'] + week['pagelle'][0].get('highlights', [])
+    dump_json(first, week)
+    (pagelle_dir / '2021' / 'week-10.json').unlink()
+
+    cached, reread, changed = merge_pagelle.merge_year(2021)
+    assert (reread, changed) == (1, 2)
+    assert cached == merge_pagelle.merge_year(2021, use_cache=False)[0]
+
+
+def test_missing_voto_only_defaults_in_legacy_files(tmp_path, monkeypatch):
+    pagelle_dir = tmp_path / 'pagelle'
+    (pagelle_dir / '2025').mkdir(parents=True)
+    monkeypatch.setattr(merge_pagelle, 'PAGELLE_DIR', pagelle_dir)
+
+    def pagella(name, voto=None):
+        p = {'name': name, 'messaggi': 10, 'highlights': []}
+        if voto is not None:
+            p['voto'] = voto
+        return p
+
+    # Agente: la pagella senza voto resta senza e non entra nella media
+    dump_json(pagelle_dir / '2025' / 'week-02.json', {
+        'startDate': '2025-01-06', 'pagelle': [pagella('Cosimo', 6.0), pagella('Giacomo')],
+    })
+    # Parziale del 2025: senza voto vale 7 d'ufficio
+    dump_json(pagelle_dir / '2025_weeks_1.json', [{
+        'weekStart': '2024-12-30', 'grades': {'Cosimo': {'messaggi': 5}, 'Giacomo': {'voto': 5.0, 'messaggi': 5}},
+    }])
+
+    output, _, _ = merge_pagelle.merge_year(2025, use_cache=False)
+    agent_week = output['weeks'][1]
+    assert [p['voto'] for p in agent_week['pagelle']] == [6.0, None]
+    cumulative = {c['name']: c for c in output['cumulative']}
+    assert cumulative['Cosimo Nenciòni']['mediaVoto'] == 6.5
+    assert cumulative['Giacomo Dolfi']['mediaVoto'] == 5.0
+    assert cumulative['Giacomo Dolfi']['settimaneAttive'] == 1
@@ -0,0 +1,22 @@
+"""Indice settimanale dell'archivio dei messaggi."""
+
+from message_archive import iter_week, load_week_index, resolve_week, week_counts
+
+
+def test_week_index(tmp_path, synth_export, run_parse):
+    archive = run_parse(tmp_path / 'data', synth_export) / 'archive'
+
+    index = load_week_index(archive, 2021)
+    assert index
+    for week, entry in index.items():
+        messages = list(iter_week(archive, week, entry))
+        count, members = week_counts(entry)
+        assert len(messages) == count
+        assert sum(members.values()) == count
+        assert all(msg['timestamp'][:10] >= week for msg in messages)
+        assert resolve_week(archive, entry['isoWeek']) == (week, entry)
+
+    assert load_week_index(archive, 2030) == {}
+    assert load_week_index(tmp_path / 'missing', 2021) is None
+    assert resolve_week(archive, '2021-W60') is None
+    assert resolve_week(archive, '2021-Wxx') is None
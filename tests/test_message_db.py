@@ -0,0 +1,38 @@
+"""Database SQLite dei messaggi: ricerca per settimana e validazione di --week."""
+
+import pytest
+
+from message_archive import load_week_index, week_counts
+from message_db import connect, search, week_start_for
+
+
+def test_week_search_matches_archive(tmp_path, synth_export, run_parse):
+    db = tmp_path / 'messages.db'
+    data_dir = run_parse(tmp_path / 'data', synth_export, '--sqlite', db)
+
+    conn = connect(db)
+    try:
+        for week, entry in load_week_index(data_dir / 'archive', 2020).items():
+            by_monday = search(conn, week=week)
+            count, members = week_counts(entry)
+            assert len(by_monday) == count
+            assert [dict(row) for row in search(conn, week=entry['isoWeek'])] == [dict(row) for row in by_monday]
+            for name, n in members.items():
+                assert len(search(conn, author=name, week=week)) == n
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('key, monday', [
+    ('2020-W53', '2020-12-28'),
+    ('2021-W01', '2021-01-04'),
+    ('2021-01-04', '2021-01-04'),
+])
+def test_week_start_for(key, monday):
+    assert week_start_for(key) == monday
+
+
+@pytest.mark.parametrize('key', ['2024-W60', '2024-Wxx', '2024-W00', '2021-W53', '2024-13-01', 'ieri'])
+def test_week_start_for_invalid(key):
+    with pytest.raises(ValueError):
+        week_start_for(key)
@@ -0,0 +1,35 @@
+"""Blocchi per i prompt: budget rispettato e niente riscritto se i messaggi non cambiano."""
+
+import pytest
+
+from pack_prompts import export_messages, pack_year
+
+
+@pytest.mark.parametrize('by', ['settimana', 'segmento'])
+def test_second_run_rewrites_nothing(tmp_path, synth_export, by):
+    messages = export_messages(synth_export, [2021])[2021]
+    out_dir = tmp_path / 'prompts'
+
+    index, changed = pack_year(2021, messages, out_dir, budget=2000, by=by)
+    assert len(index['chunks']) > 1
+    assert changed == [chunk['file'] for chunk in index['chunks']]
+    assert all(chunk['tokens'] <= 2000 for chunk in index['chunks'])
+    assert sum(chunk['messages'] for chunk in index['chunks']) == len(messages)
+
+    files = {path.name: path.stat().st_mtime_ns for path in out_dir.iterdir()}
+    again, changed = pack_year(2021, messages, out_dir, budget=2000, by=by)
+    assert changed is None
+    assert again == index
+    assert {path.name: path.stat().st_mtime_ns for path in out_dir.iterdir()} == files
+
+
+def test_new_messages_rewrite_only_last_chunks(tmp_path, synth_export):
+    messages = export_messages(synth_export, [2021])[2021]
+    out_dir = tmp_path / 'prompts'
+
+    before, _ = pack_year(2021, messages[:-50], out_dir, budget=2000)
+    after, changed = pack_year(2021, messages, out_dir, budget=2000)
+    kept = [chunk['file'] for chunk in after['chunks'] if chunk['file'] not in changed]
+    assert changed and kept
+    assert all(chunk in before['chunks'] for chunk in after['chunks'] if chunk['file'] in kept)
+    assert min(changed) > max(kept)
@@ -0,0 +1,55 @@
+"""Cache delle pagelle dell'agente: settimane valide, nuove, riusate e da rigenerare."""
+
+import json
+
+import pytest
+
+import pagelle_cache
+from build_outputs import dump_json
+
+
+@pytest.fixture
+def cache_dirs(tmp_path, monkeypatch, synth_export, run_parse):
+    """Archivio dell'export sintetico e cartelle di pagelle e cache in tmp_path."""
+    data_dir = run_parse(tmp_path / 'data', synth_export)
+    monkeypatch.setattr(pagelle_cache, 'ARCHIVE_DIR', data_dir / 'archive')
+    monkeypatch.setattr(pagelle_cache, 'PAGELLE_DIR', tmp_path / 'pagelle')
+    monkeypatch.setattr(pagelle_cache, 'STORE_DIR', tmp_path / 'store')
+    (tmp_path / 'pagelle' / '2021').mkdir(parents=True)
+    return tmp_path
+
+
+def write_week(week, theme):
+    dump_json(pagelle_cache.week_path(2021, week), {'weekNumber': week, 'theme': theme, 'pagelle': []})
+
+
+def test_second_run_reports_weeks_valid(cache_dirs):
+    for week in (1, 2, 3):
+        write_week(week, f'settimana {week}')
+
+    first = pagelle_cache.check_year(2021, prompt='1')
+    assert first['nuove'] == [1, 2, 3]
+    assert 1 not in first['da rigenerare']
+
+    second = pagelle_cache.check_year(2021, prompt='1')
+    assert second['valide'] == [1, 2, 3]
+    assert not second['nuove'] and not second['riusate']
+    assert second['da rigenerare'] == first['da rigenerare']
+
+
+def test_restores_and_invalidates(cache_dirs):
+    write_week(1, 'originale')
+    pagelle_cache.check_year(2021, prompt='1')
+
+    # Un file cancellato torna dalla cache
+    path = pagelle_cache.week_path(2021, 1)
+    payload = path.read_bytes()
+    path.unlink()
+    assert pagelle_cache.check_year(2021, prompt='1')['riusate'] == [1]
+    assert path.read_bytes() == payload
+
+    # Con un prompt nuovo la settimana va rigenerata; --dry-run non tocca il registro
+    status = pagelle_cache.check_year(2021, dry_run=True, prompt='2')
+    assert 1 in status['da rigenerare']
+    ledger = json.loads((cache_dirs / 'pagelle' / '2021' / pagelle_cache.LEDGER_FILE).read_text(encoding='utf-8'))
+    assert ledger['promptVersion'] == '1'
@@ -0,0 +1,51 @@
+"""Strategia relative: riproduce i voti storici, con e senza numpy."""
+
+import json
+
+import pytest
+
+import pagelle_scoring
+from pagelle_scoring import load_weeks, relative_voto, score_counts
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+needs_numpy = pytest.mark.skipif(np is None, reason='numpy non installato')
+
+
+@needs_numpy
+def test_relative_reproduces_published_votes():
+    # data/pagelle/*.json sono stati generati dalla formula storica riga per riga
+    _, _, counts, published = load_weeks()
+    voti = score_counts(counts, 'relative')
+    active = counts > 0
+
+    assert active.any()
+    assert np.array_equal(voti[active], published[active])
+    assert np.isnan(voti[~active]).all()
+
+
+@needs_numpy
+def test_relative_without_numpy(monkeypatch):
+    _, _, counts, _ = load_weeks()
+    expected = score_counts(counts, 'relative')
+
+    monkeypatch.setattr(pagelle_scoring, 'np', None)
+    voti = score_counts(counts.astype(int).tolist())
+    assert voti == [[None if np.isnan(v) else v for v in row] for row in expected.tolist()]
+    with pytest.raises(ValueError):
+        score_counts([[1, 2]], 'zscore')
+
+
+def test_parser_votes_use_relative(tmp_path, synth_export, run_parse):
+    data_dir = run_parse(tmp_path / 'data', synth_export)
+    with open(data_dir / 'pagelle' / '2020.json', 'r', encoding='utf-8') as f:
+        weeks = json.load(f)['weeks']
+
+    assert weeks
+    for week in weeks:
+        top = max(p['messaggi'] for p in week['pagelle'])
+        for p in week['pagelle']:
+            assert p['voto'] == round(min(10, max(4, relative_voto(p['messaggi'], top))), 1)
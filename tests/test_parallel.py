@@ -0,0 +1,8 @@
+"""Anni generati nel pool di processi contro la build seriale."""
+
+
+def test_parallel_equals_serial(tmp_path, synth_export, run_parse, read_tree):
+    serial = run_parse(tmp_path / 'j1', synth_export, '-j1')
+    parallel = run_parse(tmp_path / 'j3', synth_export, '-j3')
+
+    assert read_tree(parallel) == read_tree(serial)
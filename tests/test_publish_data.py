@@ -0,0 +1,35 @@
+"""Sito pubblicato: solo i dati che le pagine scaricano, con le versioni nelle pagine."""
+
+import json
+import re
+
+import publish_data
+from build_outputs import dump_json
+
+
+def test_publishes_only_page_data(tmp_path, monkeypatch, synth_export, run_parse):
+    data_dir = run_parse(tmp_path / 'data', synth_export, '--sqlite', tmp_path / 'data' / 'messages.db')
+    # File degli agenti e riepiloghi, che il parser non scrive
+    (data_dir / 'pagelle' / '2021').mkdir()
+    dump_json(data_dir / 'pagelle' / '2021' / 'week-01.json', {'weekNumber': 1, 'pagelle': []})
+    (data_dir / 'summaries').mkdir()
+    dump_json(data_dir / 'summaries' / '2021.json', {'year': 2021, 'messages': []})
+    monkeypatch.setattr(publish_data, 'DATA_DIR', data_dir)
+
+    out_dir = tmp_path / 'dist'
+    publish_data.publish(out_dir)
+
+    published = {path.relative_to(out_dir / 'data').as_posix() for path in (out_dir / 'data').rglob('*')
+                 if path.is_file() and path.suffix not in ('.gz', '.br')}
+    private = re.compile(r'raw_messages|archive/|summaries/|activity-cube|parse_checkpoint|messages\.db'
+                         r'|pagelle/\d{4}/')
+    assert not [name for name in published if private.search(name)]
+    assert {'stats.json', 'pagelle/2021.json', 'pagelle/shards/2021/index.json', 'bundles/best-of.json'} <= published
+    assert all(publish_data.PUBLIC_FILES.fullmatch(name) or name.startswith('bundles/')
+               or name in ('build-manifest.json', 'versions.json') for name in published)
+
+    # Le pagine hanno le versioni dei dati prima di main.js
+    versions = json.loads((out_dir / 'data' / 'versions.json').read_text(encoding='utf-8'))['files']
+    html = (out_dir / 'index.html').read_text(encoding='utf-8')
+    inline = re.search(r'window\.DATA_VERSIONS = (\{.*?\});</script>\s*<script src="js/main\.js">', html)
+    assert inline and json.loads(inline.group(1)) == versions